@@ -27,7 +27,10 @@ import sys
 import random
 import argparse
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "files"))
+from fastwalk import scan_tree  # noqa: E402
 
 
 class Colors:
@@ -82,7 +85,7 @@ class Logger:
         print()
 
 
-AUDIO_EXTENSIONS = ['*.m4a', '*.mp3', '*.flac', '*.wav', '*.ogg']
+AUDIO_EXTENSIONS = ['.m4a', '.mp3', '.flac', '.wav', '.ogg']
 
 
 def sanitize_name(text: str) -> str:
@@ -105,10 +108,14 @@ def order_files(files: List[Path], shuffle: bool) -> List[Path]:
 
 
 def find_audio_files(directory: Path) -> List[Path]:
-    audio_files = []
-    for extension in AUDIO_EXTENSIONS:
-        audio_files.extend(directory.glob(extension))
-    return audio_files
+    for _, _, files in scan_tree(directory, extensions=AUDIO_EXTENSIONS, recursive=False):
+        return audio_paths(files)
+    return []
+
+
+def audio_paths(entries: List[os.DirEntry]) -> List[Path]:
+    # Hidden files are left out, as glob("*.mp3") did
+    return [Path(entry.path) for entry in entries if not entry.name.startswith('.')]
 
 
 def build_directory_index(root_dir: Path, directories: List[Path]) -> Dict[Path, List[int]]:
@@ -163,8 +170,10 @@ def write_playlist_file(playlist_path: Path, audio_files: List[Path]) -> None:
             f.write(f"{audio_file}\n")
 
 
-def process_directory(root_dir: Path, current_dir: Path, shuffle: bool, index_map: Dict[Path, List[int]]) -> bool:
-    audio_files = find_audio_files(current_dir)
+def process_directory(root_dir: Path, current_dir: Path, shuffle: bool, index_map: Dict[Path, List[int]],
+                      audio_files: Optional[List[Path]] = None) -> bool:
+    if audio_files is None:
+        audio_files = find_audio_files(current_dir)
     
     if not audio_files:
         Logger.dim(f"⊘ No audio files in {current_dir.name}")
@@ -205,14 +214,15 @@ def create_playlists(directory: Path, recursive: bool, shuffle: bool) -> None:
     )
     
     directories_to_process = []
+    audio_by_directory: Dict[Path, List[Path]] = {}
     
-    if recursive:
-        for root, dirs, files in os.walk(directory):
-            dirs[:] = [d for d in dirs if not should_skip_directory(d)]
-            dirs.sort(key=str.lower)
-            directories_to_process.append(Path(root))
-    else:
-        directories_to_process.append(directory)
+    # One listing per directory yields both the subdirectories to visit and the audio files in it
+    for root, dirs, files in scan_tree(directory, extensions=AUDIO_EXTENSIONS, recursive=recursive,
+                                       skip_dir=should_skip_directory, sort_key=lambda entry: entry.name.lower(),
+                                       workers=None):
+        current_dir = Path(root)
+        directories_to_process.append(current_dir)
+        audio_by_directory[current_dir] = audio_paths(files)
     
     index_map = build_directory_index(directory, directories_to_process)
     
@@ -224,7 +234,7 @@ def create_playlists(directory: Path, recursive: bool, shuffle: bool) -> None:
         progress_bar = f"[{idx}/{total}]"
         print(f"{Colors.DIM}{progress_bar}{Colors.RESET}", end=" ")
         
-        if process_directory(directory, current_dir, shuffle, index_map):
+        if process_directory(directory, current_dir, shuffle, index_map, audio_by_directory[current_dir]):
             created_count += 1
         else:
             skipped_count += 1
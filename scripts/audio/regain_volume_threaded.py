@@ -1,13 +1,20 @@
 import os
 import sys
+import shutil
 import signal
 from pydub import AudioSegment
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "files"))
+from fastwalk import walk_files  # noqa: E402
 
 # Global flag to signal threads to stop
 stop_flag = False
 
+# Files whose gain is within this many dB of the target are not re-encoded
+DEFAULT_TOLERANCE_DB = 0.5
+
 def calculate_average_amplitude(audio):
     raw_data = np.array(audio.get_array_of_samples())
     return np.mean(np.abs(raw_data))
@@ -19,67 +26,146 @@ def calculate_max_amplitude(audio):
 def calculate_required_gain(current_avg, target_avg=8000):
     return 20 * np.log10(target_avg / current_avg)
 
-def amplify_audio(file_path, target_avg=8000, bitrate="256k"):
+def regained_path(file_path):
+    """Output location: the 'regained' subfolder next to the file, with the original file name"""
+    return os.path.join(os.path.dirname(file_path), "regained", os.path.basename(file_path))
+
+def analyze_audio(file_path, target_avg=8000):
+    """
+    Stage 1, run in a worker process: decode the file and work out the gain it needs.
+    Returns a small dict so only numbers, not audio, travel back to the main process.
+    """
+    audio = AudioSegment.from_file(file_path)
+    raw_data = np.abs(np.array(audio.get_array_of_samples()))
+
+    # Calculate the current average and max amplitude
+    current_avg = float(np.mean(raw_data)) if raw_data.size else 0.0
+    current_max = float(np.max(raw_data)) if raw_data.size else 0.0
+    if current_avg == 0 or current_max == 0:
+        return {'current_avg': current_avg, 'current_max': current_max, 'gain_db': 0.0, 'silent': True}
+
+    # Calculate the required gain in dB
+    required_gain_db = float(calculate_required_gain(current_avg, target_avg))
+
+    # Ensure we do not exceed the max amplitude
+    max_possible_gain = 20 * np.log10(32767 / current_max)  # 32767 is the max amplitude for 16-bit audio
+    if required_gain_db > max_possible_gain:
+        required_gain_db = float(max_possible_gain)
+
+    return {'current_avg': current_avg, 'current_max': current_max, 'gain_db': required_gain_db, 'silent': False}
+
+def encode_audio(file_path, gain_db, bitrate="256k"):
+    """Stage 2, run in a worker process: apply the gain and export the MP3 to the 'regained' subfolder"""
+    audio = AudioSegment.from_file(file_path)
+    amplified_audio = audio + gain_db
+
+    new_file_path = regained_path(file_path)
+    os.makedirs(os.path.dirname(new_file_path), exist_ok=True)
+    amplified_audio.export(new_file_path, format="mp3", bitrate=bitrate)
+    return new_file_path
+
+def keep_original(file_path):
+    """A file already at the target level is copied to the 'regained' subfolder as it is, without re-encoding"""
+    new_file_path = regained_path(file_path)
+    os.makedirs(os.path.dirname(new_file_path), exist_ok=True)
+    shutil.copy2(file_path, new_file_path)
+    return new_file_path
+
+def needs_encode(analysis, tolerance_db=DEFAULT_TOLERANCE_DB):
+    return not analysis['silent'] and abs(analysis['gain_db']) > tolerance_db
+
+def kept_reason(analysis, tolerance_db=DEFAULT_TOLERANCE_DB):
+    """Why a file that is not re-encoded is left as it is"""
+    if analysis['silent']:
+        return "Silent, no gain can be computed"
+    return f"Within {tolerance_db} dB of the target"
+
+def print_analysis(file_path, analysis):
+    print(f"File: {file_path}")
+    print(f"Current average amplitude: {analysis['current_avg']:.2f}")
+    print(f"Current max amplitude: {analysis['current_max']:.2f}")
+    print(f"Required gain: {analysis['gain_db']:.2f} dB")
+
+def amplify_audio(file_path, target_avg=8000, bitrate="256k", tolerance_db=DEFAULT_TOLERANCE_DB):
     global stop_flag
     if stop_flag:
         return
     try:
-        # Load the audio file
-        audio = AudioSegment.from_file(file_path)
-        
-        # Calculate the current average and max amplitude
-        current_avg = calculate_average_amplitude(audio)
-        current_max = calculate_max_amplitude(audio)
-        
-        # Calculate the required gain in dB
-        required_gain_db = calculate_required_gain(current_avg, target_avg)
-        
-        # Ensure we do not exceed the max amplitude
-        max_possible_gain = 20 * np.log10(32767 / current_max)  # 32767 is the max amplitude for 16-bit audio
-        if required_gain_db > max_possible_gain:
-            required_gain_db = max_possible_gain
-        
-        # Amplify the audio
-        amplified_audio = audio + required_gain_db
-        
-        # Create the 'regained' subfolder if it doesn't exist
-        regained_folder = os.path.join(os.path.dirname(file_path), "regained")
-        os.makedirs(regained_folder, exist_ok=True)
-        
-        # Save the amplified audio to the 'regained' subfolder with the original file name
-        new_file_path = os.path.join(regained_folder, os.path.basename(file_path))
-        amplified_audio.export(new_file_path, format="mp3", bitrate=bitrate)
-        
-        print(f"File: {file_path}")
-        print(f"Current average amplitude: {current_avg:.2f}")
-        print(f"Current max amplitude: {current_max:.2f}")
-        print(f"Required gain: {required_gain_db:.2f} dB")
-        print(f"Amplified file saved to: {new_file_path}")
+        analysis = analyze_audio(file_path, target_avg)
+        print_analysis(file_path, analysis)
+        if needs_encode(analysis, tolerance_db):
+            new_file_path = encode_audio(file_path, analysis['gain_db'], bitrate)
+            print(f"Amplified file saved to: {new_file_path}")
+        else:
+            new_file_path = keep_original(file_path)
+            print(f"{kept_reason(analysis, tolerance_db)}, copied as is to: {new_file_path}")
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
 
-def process_folder(folder_path, target_avg=8000, bitrate="256k", max_workers=4):
+def ignore_sigint():
+    # Worker processes leave Ctrl+C to the main process, which stops handing out work
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def process_folder(folder_path, target_avg=8000, bitrate="256k", max_workers=None, encode_workers=None,
+                   tolerance_db=DEFAULT_TOLERANCE_DB):
+    """
+    Two pipelined stages on separate process pools: every file is analyzed (decode + numpy amplitude checks)
+    on max_workers processes, and as soon as a result comes in, files whose gain differs from the target by
+    more than tolerance_db are queued for re-encoding on encode_workers processes. The others, and silent
+    files (which no gain can fix), are copied to 'regained' unchanged, so a library that is mostly at the right
+    level costs little more than one decode per file.
+    """
     global stop_flag
-    files_to_process = []
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            if file.endswith(".mp3"):
-                file_path = os.path.join(root, file)
-                files_to_process.append(file_path)
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(amplify_audio, file_path, target_avg, bitrate) for file_path in files_to_process]
+    max_workers = max_workers or os.cpu_count() or 1
+    encode_workers = encode_workers or max(1, max_workers // 2)
+
+    # Earlier output in 'regained' folders is not processed again
+    files_to_process = [entry.path for entry in walk_files(folder_path, extensions={'.mp3'}, skip_dir={'regained'})]
+    counts = {'encoded': 0, 'kept': 0, 'silent': 0, 'failed': 0}
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=ignore_sigint) as analyzer, \
+            ProcessPoolExecutor(max_workers=encode_workers, initializer=ignore_sigint) as encoder:
+        pending = {analyzer.submit(analyze_audio, file_path, target_avg): ('analyze', file_path)
+                   for file_path in files_to_process}
         try:
-            for future in as_completed(futures):
-                if stop_flag:
-                    break
-                future.result()  # This will raise any exceptions that occurred during processing
+            while pending and not stop_flag:
+                done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, file_path = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Error processing {file_path}: {e}")
+                        counts['failed'] += 1
+                        continue
+
+                    if stage == 'encode':
+                        print(f"Amplified file saved to: {result}")
+                        counts['encoded'] += 1
+                        continue
+
+                    print_analysis(file_path, result)
+                    if needs_encode(result, tolerance_db):
+                        future = encoder.submit(encode_audio, file_path, result['gain_db'], bitrate)
+                        pending[future] = ('encode', file_path)
+                        continue
+                    try:
+                        new_file_path = keep_original(file_path)
+                        print(f"{kept_reason(result, tolerance_db)}, copied as is to: {new_file_path}")
+                        counts['silent' if result['silent'] else 'kept'] += 1
+                    except OSError as e:
+                        print(f"Error processing {file_path}: {e}")
+                        counts['failed'] += 1
         except KeyboardInterrupt:
             stop_flag = True
+        if stop_flag:
             print("\nProcess interrupted by user. Shutting down...")
-            for future in futures:
+            for future in pending:
                 future.cancel()
 
+    print(f"\nRe-encoded {counts['encoded']}, within {tolerance_db} dB and copied {counts['kept']}, "
+          f"silent and copied {counts['silent']}, failed {counts['failed']} of {len(files_to_process)} files")
+
 def signal_handler(sig, frame):
     global stop_flag
     print("\nCtrl+C received. Stopping...")
@@ -88,19 +174,25 @@ def signal_handler(sig, frame):
 if __name__ == "__main__":
     signal.signal(signal.SIGINT, signal_handler)
 
-    if len(sys.argv) not in [2, 3, 4, 5]:
-        print("Usage: python script.py <file_or_folder_path> [target_avg] [bitrate] [max_workers]")
+    flags = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) not in [1, 2, 3, 4]:
+        print("Usage: python script.py <file_or_folder_path> [target_avg] [bitrate] [max_workers]"
+              " [--encode-workers=N] [--tolerance=DB]")
         sys.exit(1)
 
-    path = sys.argv[1]
-    target_avg = 8000 if len(sys.argv) < 3 else float(sys.argv[2])
-    bitrate = "256k" if len(sys.argv) < 4 else sys.argv[3]
-    max_workers = 4 if len(sys.argv) < 5 else int(sys.argv[4])
+    path = args[0]
+    target_avg = 8000 if len(args) < 2 else float(args[1])
+    bitrate = "256k" if len(args) < 3 else args[2]
+    max_workers = None if len(args) < 4 else int(args[3])
+    encode_workers = next((int(flag.split('=', 1)[1]) for flag in flags if flag.startswith('--encode-workers=')), None)
+    tolerance_db = next((float(flag.split('=', 1)[1]) for flag in flags if flag.startswith('--tolerance=')),
+                        DEFAULT_TOLERANCE_DB)
 
     if os.path.isfile(path):
-        amplify_audio(path, target_avg, bitrate)
+        amplify_audio(path, target_avg, bitrate, tolerance_db)
     elif os.path.isdir(path):
-        process_folder(path, target_avg, bitrate, max_workers)
+        process_folder(path, target_avg, bitrate, max_workers, encode_workers, tolerance_db)
     else:
         print(f"The path '{path}' is neither a file nor a folder.")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -0,0 +1,630 @@
+"""
+Copy Engine
+
+Tree copying shared by folders/copy_dir.py and folders/copy_dir_skip_exist_files.py.
+
+- The source tree is walked once (fastwalk), and files are handed to a thread pool as they are found, so
+  copying starts right away and many small files are in flight at once instead of one at a time.
+- The pool is sized from the storage on both ends: several threads for SSDs and network shares, where
+  per-file latency dominates, and few for spinning disks, where parallel copies only add seeks.
+- File data is copied by the kernel with os.copy_file_range (which can also use reflinks or server-side
+  copies) or os.sendfile, so it never passes through Python buffers. Where neither is supported the engine
+  falls back to a plain read/write loop. Timestamps and permission bits are copied as shutil.copy2 does.
+- Progress is reported in bytes, shared by all workers.
+- Files above RESUME_ABOVE are copied in chunks, each flushed and recorded in a progress file next to the
+  partial target, so an interrupted copy of a huge file resumes from the last verified chunk. The target is
+  preallocated with posix_fallocate where supported.
+- copy_tree_dedup() links files whose content is already in the target instead of copying them again: an
+  FICLONE reflink (btrfs, XFS) or a hardlink. Only files whose size occurs more than once across both trees
+  are hashed, and hashes are kept in the shared scan cache, so reruns over a large target stay cheap.
+- A verified copy hashes the data while copying it (like tee), so the checksum of every file costs no extra
+  read. An optional read-back check of the written file runs on a second pool alongside later copies.
+
+Usage:
+    stats = copy_tree(source_dir, target_dir)
+    print(stats.files, stats.bytes, stats.errors)
+
+    # Custom selection of files: run_jobs() keeps the pool, error collection and progress
+    for (src, dst), copied, error in run_jobs(lambda job: copy_file(*job, progress), jobs, workers, progress):
+        ...
+"""
+
+import collections
+import errno
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from fastwalk import scan_tree, storage_kind, walk_files
+from hash_engine import CHUNK_SIZE, HASH_METHODS, hash_file, ordered_map
+from scan_cache import ScanCache, stat_key
+
+COPY_CHUNK = 16 * 1024 * 1024  # Bytes per copy_file_range/sendfile call, also the progress granularity
+BUFFER_SIZE = 1024 * 1024  # Read/write fallback
+PROGRESS_SECONDS = 0.25
+RESUME_ABOVE = 1024 * 1024 * 1024  # Files from this size are copied resumably, in RESUME_CHUNK steps
+RESUME_CHUNK = 64 * 1024 * 1024
+PARTIAL_SUFFIX = '.partial'  # Resumable copies are written to <target>.partial until complete...
+PROGRESS_SUFFIX = '.partial.json'  # ...with their progress record next to it
+
+# Copy threads by the kind of storage on the slower end
+STORAGE_WORKERS = {'network': 16, 'ssd': 8, 'unknown': 4, 'rotational': 2}
+
+# Errors from FICLONE or os.link meaning this filesystem or pair of files cannot share data
+UNLINKABLE_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL, errno.EMLINK, errno.EPERM,
+                     errno.ENOTTY, errno.EBADF}
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+FICLONE = 0x40049409  # ioctl from <linux/fs.h>: share the extents of one file with another
+DEDUP_MODES = ('reflink', 'hardlink')
+
+# copy_file_range/sendfile errors that mean "not supported here", not "copy failed"
+UNSUPPORTED_ERRNOS = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF,
+                      errno.ETXTBSY, errno.EPERM}
+
+
+# Set when a run is interrupted, so resumable copies stop at their next chunk instead of finishing
+_cancel = threading.Event()
+
+
+class CopyCancelled(Exception):
+    """A resumable copy stopped early because the run was interrupted"""
+
+
+def copy_workers(source_dir: str, target_dir: str) -> int:
+    """Copy threads suited to the storage of both trees; the end needing fewer threads wins"""
+    target = target_dir
+    while not os.path.exists(target) and os.path.dirname(target) != target:
+        target = os.path.dirname(target)
+    return min(STORAGE_WORKERS[storage_kind(source_dir)], STORAGE_WORKERS[storage_kind(target)])
+
+
+class Progress:
+    """Copied bytes and files, updated by the copy threads and printed at most every PROGRESS_SECONDS"""
+
+    def __init__(self, stream=sys.stdout):
+        self.lock = threading.Lock()
+        self.stream = stream
+        self.started = time.monotonic()
+        self.printed = 0.0
+        self.bytes = 0
+        self.files = 0
+        self.total_bytes = 0
+        self.total_files = 0
+        self.scanning = True
+
+    def found(self, size: int) -> None:
+        with self.lock:
+            self.total_bytes += size
+            self.total_files += 1
+
+    def add(self, count: int) -> None:
+        with self.lock:
+            self.bytes += count
+            self._print()
+
+    def file_done(self) -> None:
+        with self.lock:
+            self.files += 1
+            self._print()
+
+    def _print(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self.printed < PROGRESS_SECONDS:
+            return
+        self.printed = now
+        mib = 1024 * 1024
+        rate = self.bytes / mib / max(now - self.started, 1e-6)
+        more = '+' if self.scanning else ''
+        print(f"Copied {self.bytes / mib:.1f}/{self.total_bytes / mib:.1f}{more} MiB, "
+              f"{self.files}/{self.total_files}{more} files, {rate:.1f} MiB/s   ", end='\r', file=self.stream)
+
+    def finish(self) -> None:
+        with self.lock:
+            self.scanning = False
+            self._print(force=True)
+        print(file=self.stream)
+
+
+def _kernel_copy(src_fd: int, dst_fd: int, offset: int, size: int, progress: Optional[Progress]) -> int:
+    """Copy from offset up to size with copy_file_range, then sendfile; returns the offset reached"""
+    for method in ('copy_file_range', 'sendfile'):
+        if offset >= size or not hasattr(os, method):
+            continue
+        try:
+            while offset < size:
+                count = min(COPY_CHUNK, size - offset)
+                if method == 'copy_file_range':
+                    copied = os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+                else:
+                    os.lseek(dst_fd, offset, os.SEEK_SET)
+                    copied = os.sendfile(dst_fd, src_fd, offset, count)
+                if not copied:
+                    break  # Some filesystems report 0 instead of an error; finish another way
+                offset += copied
+                if progress:
+                    progress.add(copied)
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_ERRNOS:
+                raise
+    return offset
+
+
+def _write_all(fd: int, view: memoryview) -> None:
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _unshare(dst: str) -> None:
+    """Remove dst if it is one of several hardlinks, so writing it does not change the other names too"""
+    try:
+        if os.lstat(dst).st_nlink > 1:
+            os.unlink(dst)
+    except FileNotFoundError:
+        pass
+
+
+def copy_file(src: str, dst: str, progress: Optional[Progress] = None, hasher=None, sync: bool = False,
+              resume_above: Optional[int] = RESUME_ABOVE) -> int:
+    """
+    Copy content, timestamps and permission bits of src to dst (like shutil.copy2); returns the bytes copied.
+    With a hashlib hasher, the data goes through Python instead of the kernel and every block read is also fed
+    to the hasher, so the copy yields the source digest without a second read. sync=True fsyncs dst.
+    Files of resume_above bytes or more go through copy_file_resumable() (None turns that off). A dst that is
+    hardlinked to other files (e.g. by a dedup copy) is replaced instead of being written in place.
+    """
+    if resume_above is not None and os.stat(src).st_size >= resume_above:
+        return copy_file_resumable(src, dst, progress, hasher)
+
+    _unshare(dst)
+    with open(src, 'rb', buffering=0) as fsrc, open(dst, 'wb', buffering=0) as fdst:
+        src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+        size = os.fstat(src_fd).st_size
+        if hasher is None:
+            offset = _kernel_copy(src_fd, dst_fd, 0, size, progress)
+        else:
+            offset = 0
+            if hasattr(os, 'posix_fadvise'):
+                try:
+                    os.posix_fadvise(src_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                except OSError:
+                    pass
+
+        # Read/write for whatever the kernel could not copy, and anything appended meanwhile
+        fsrc.seek(offset)
+        os.lseek(dst_fd, offset, os.SEEK_SET)
+        buffer = bytearray(BUFFER_SIZE if hasher is None else CHUNK_SIZE)
+        view = memoryview(buffer)
+        while True:
+            read = fsrc.readinto(buffer)
+            if not read:
+                break
+            block = view[:read]
+            if hasher is not None:
+                hasher.update(block)
+            _write_all(dst_fd, block)
+            offset += read
+            if progress:
+                progress.add(read)
+        os.ftruncate(dst_fd, offset)
+        if sync:
+            os.fsync(dst_fd)
+
+    shutil.copystat(src, dst)
+    return offset
+
+
+def _copy_range(src_fd: int, dst_fd: int, start: int, end: int, progress: Optional[Progress], hasher) -> None:
+    """Copy bytes start..end between files at the same offsets, in the kernel unless they must be hashed"""
+    offset = start if hasher is not None else _kernel_copy(src_fd, dst_fd, start, end, progress)
+    while offset < end:
+        block = os.pread(src_fd, min(CHUNK_SIZE, end - offset), offset)
+        if not block:
+            raise OSError(errno.EIO, f"Source ended early at byte {offset}")
+        if hasher is not None:
+            hasher.update(block)
+        view = memoryview(block)
+        position = offset
+        while view:
+            written = os.pwrite(dst_fd, view, position)
+            view = view[written:]
+            position += written
+        offset += len(block)
+        if progress:
+            progress.add(len(block))
+
+
+def _same_range(src_fd: int, dst_fd: int, start: int, end: int) -> bool:
+    """Whether both files hold the same bytes from start to end"""
+    offset = start
+    while offset < end:
+        count = min(CHUNK_SIZE, end - offset)
+        if os.pread(src_fd, count, offset) != os.pread(dst_fd, count, offset):
+            return False
+        offset += count
+    return True
+
+
+def _write_record(path: str, record: dict) -> None:
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def copy_file_resumable(src: str, dst: str, progress: Optional[Progress] = None, hasher=None,
+                        chunk_size: int = RESUME_CHUNK) -> int:
+    """
+    Copy a large file so that an interrupted copy continues where it stopped. Data is written to
+    dst + PARTIAL_SUFFIX in chunk_size steps. After each chunk the partial file is flushed to disk and the
+    offset saved in a progress record next to it. A later call for the same, unchanged source checks the last
+    recorded chunk against the source and goes on from there; dst only appears, by rename, once complete.
+    A new partial file is preallocated with posix_fallocate where supported, to keep it in one piece.
+    With a hasher, the part copied earlier is read again to bring the digest up to date.
+    """
+    partial_path = dst + PARTIAL_SUFFIX
+    record_path = dst + PROGRESS_SUFFIX
+    source_stat = os.stat(src)
+    size = source_stat.st_size
+    identity = {'source': os.path.abspath(src), 'size': size, 'mtime_ns': source_stat.st_mtime_ns,
+                'chunk_size': chunk_size}
+
+    offset = 0
+    try:
+        with open(record_path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        if all(record.get(key) == value for key, value in identity.items()) and os.path.exists(partial_path):
+            offset = min(record['offset'], os.path.getsize(partial_path))
+    except (OSError, ValueError):
+        pass
+
+    src_fd = os.open(src, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        flags = os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0) | (0 if offset else os.O_TRUNC)
+        dst_fd = os.open(partial_path, flags)
+        try:
+            if offset:
+                # Step back past any recorded chunk that did not make it to the disk intact
+                check_fd = os.open(partial_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+                try:
+                    while offset and not _same_range(src_fd, check_fd, max(0, offset - chunk_size), offset):
+                        offset = max(0, offset - chunk_size)
+                finally:
+                    os.close(check_fd)
+            elif size and hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(dst_fd, 0, size)
+                except OSError:
+                    pass  # Not supported by this filesystem; the file just grows as it is written
+            if hasattr(os, 'posix_fadvise'):
+                try:
+                    os.posix_fadvise(src_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                except OSError:
+                    pass
+
+            if offset and hasher is not None:
+                for start in range(0, offset, CHUNK_SIZE):
+                    hasher.update(os.pread(src_fd, min(CHUNK_SIZE, offset - start), start))
+            if offset and progress:
+                progress.add(offset)
+
+            while offset < size:
+                if _cancel.is_set():
+                    raise CopyCancelled(f"Copy of '{src}' interrupted at byte {offset}")
+                end = min(offset + chunk_size, size)
+                _copy_range(src_fd, dst_fd, offset, end, progress, hasher)
+                os.fsync(dst_fd)
+                offset = end
+                _write_record(record_path, dict(identity, offset=offset))
+
+            os.ftruncate(dst_fd, size)
+            os.fsync(dst_fd)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+    shutil.copystat(src, partial_path)
+    os.replace(partial_path, dst)
+    try:
+        os.remove(record_path)
+    except FileNotFoundError:
+        pass
+    return size
+
+
+def readback_digest(path: str, method: str) -> str:
+    """Digest of a written file, read back from the disk rather than the page cache where the OS allows"""
+    with open(path, 'rb', buffering=0) as f:
+        if hasattr(os, 'posix_fadvise'):
+            try:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)  # Only drops pages already synced
+            except OSError:
+                pass
+    return hash_file(path, (method,))[method]
+
+
+def run_jobs(function: Callable[[T], R], jobs: Iterable[T], workers: int,
+             progress: Progress) -> Iterator[Tuple[T, Optional[R], Optional[str]]]:
+    """
+    Run function(job) on a thread pool of `workers` and yield (job, result, error message or None) in job
+    order; an OSError fails only its own job. Each job counts as one file in progress.
+    """
+    def guarded(job):
+        try:
+            return function(job), None
+        except OSError as e:
+            return None, e.strerror or str(e)
+
+    _cancel.clear()
+    # Whether the run is interrupted here (Ctrl+C while waiting for a copy) or by the caller, queued copies are
+    # dropped and resumable copies in flight save their place and stop before the pool is shut down
+    results = ordered_map(guarded, jobs, workers=workers, on_abort=_cancel.set)
+    try:
+        for job, (result, error) in results:
+            progress.file_done()
+            yield job, result, error
+    except BaseException:
+        _cancel.set()
+        raise
+    finally:
+        results.close()
+        progress.finish()
+
+
+class CopyStats:
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.skipped = 0
+        self.linked = 0  # Files reflinked or hardlinked by copy_tree_dedup()
+        self.errors: List[Tuple[str, str]] = []  # (source path, message)
+        self.digests: List[Tuple[str, str]] = []  # (target path, digest) of verified copies, in walk order
+        self.mismatches: List[Tuple[str, str]] = []  # (target path, message) from the read-back check
+
+
+def _make_linked_dirs(dirs: List[os.DirEntry], target_path: str) -> None:
+    """Symlinked folders are not followed, but each gets an empty folder in the target, as with os.walk copies"""
+    for entry in dirs:
+        if entry.is_symlink():
+            os.makedirs(os.path.join(target_path, entry.name), exist_ok=True)
+
+
+def copy_tree(source_dir: str, target_dir: str, workers: Optional[int] = None,
+              select: Optional[Callable[[os.DirEntry, str], bool]] = None,
+              progress: Optional[Progress] = None, verify: Optional[str] = None,
+              readback: bool = False, resume_above: Optional[int] = RESUME_ABOVE) -> CopyStats:
+    """
+    Copy every file of source_dir to the same place under target_dir, creating folders as needed.
+    select(entry, target_path) can turn down files (counted as skipped). workers=None sizes the pool with
+    copy_workers(). Errors are collected in the returned stats instead of stopping the copy.
+
+    verify names a hash method: each file is hashed while it is copied and its digest stored in stats.digests.
+    With readback, each finished copy is also fsync'ed, read back and compared with that digest on a second
+    pool, while later files are still being copied. Files of resume_above bytes or more are copied resumably
+    (see copy_file_resumable()).
+    """
+    stats = CopyStats()
+    progress = progress or Progress()
+    workers = workers or copy_workers(source_dir, target_dir)
+    os.makedirs(target_dir, exist_ok=True)
+
+    def jobs():
+        for dirpath, dirs, files in scan_tree(source_dir, workers=None):
+            relative_dir = os.path.relpath(dirpath, source_dir)
+            target_path = os.path.normpath(os.path.join(target_dir, relative_dir))
+            os.makedirs(target_path, exist_ok=True)
+            _make_linked_dirs(dirs, target_path)
+            for entry in files:
+                file_target = os.path.join(target_path, entry.name)
+                if select is not None and not select(entry, file_target):
+                    stats.skipped += 1
+                    continue
+                try:
+                    size = entry.stat().st_size
+                except OSError:
+                    size = 0
+                progress.found(size)
+                yield entry.path, file_target
+
+    def copy_job(job):
+        if not verify:
+            return copy_file(job[0], job[1], progress, resume_above=resume_above), None
+        hasher = HASH_METHODS[verify]()
+        copied = copy_file(job[0], job[1], progress, hasher=hasher, sync=readback, resume_above=resume_above)
+        return copied, hasher.hexdigest()
+
+    def check(target_path, digest):
+        try:
+            found = readback_digest(target_path, verify)
+        except OSError as e:
+            return f"cannot read back: {e.strerror}"
+        return None if found == digest else f"read back {verify} {found}, copied {digest}"
+
+    checker = ThreadPoolExecutor(max_workers=max(1, workers // 2)) if readback and verify else None
+    checks = []
+    try:
+        for (src, dst), result, error in run_jobs(copy_job, jobs(), workers, progress):
+            if error is None:
+                copied, digest = result
+                stats.files += 1
+                stats.bytes += copied
+                if digest is not None:
+                    stats.digests.append((dst, digest))
+                    if checker:
+                        checks.append((dst, checker.submit(check, dst, digest)))
+            else:
+                stats.errors.append((src, error))
+    finally:
+        if checker:
+            if _cancel.is_set():
+                for _, future in checks:
+                    future.cancel()
+            checker.shutdown(wait=True)
+    for dst, future in checks:
+        if future.result():
+            stats.mismatches.append((dst, future.result()))
+    return stats
+
+
+def reflink_file(existing: str, dst: str) -> None:
+    """Make dst a copy-on-write clone of existing (FICLONE); raises OSError where not supported"""
+    import fcntl  # Unix only
+    with open(existing, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+def copy_tree_dedup(source_dir: str, target_dir: str, mode: str = 'reflink', workers: Optional[int] = None,
+                    progress: Optional[Progress] = None, method: str = 'sha256', use_cache: bool = True,
+                    resume_above: Optional[int] = RESUME_ABOVE) -> CopyStats:
+    """
+    Copy source_dir to target_dir like copy_tree(), but a file whose content is already in the target (or was
+    copied earlier in this run) becomes a reflink (mode='reflink') or hardlink (mode='hardlink') of that copy.
+    Where the link cannot be made (other filesystem, no reflink support) the file is copied normally.
+    Targets that already hold the right content are left alone. Files whose size occurs only once across both
+    trees cannot have a twin and are copied without being hashed. stats.skipped counts the files already in
+    place, stats.linked the links made.
+
+    Hardlinked files share one inode, so they also share permissions and timestamps, and editing one edits all.
+    """
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode '{mode}'; choose from {', '.join(DEDUP_MODES)}")
+    stats = CopyStats()
+    progress = progress or Progress()
+    workers = workers or copy_workers(source_dir, target_dir)
+    os.makedirs(target_dir, exist_ok=True)
+
+    # One walk of each tree: the files to copy, and what the target already holds
+    sources = []  # (source path, target path, stat)
+    for dirpath, dirs, files in scan_tree(source_dir, workers=None):
+        target_path = os.path.normpath(os.path.join(target_dir, os.path.relpath(dirpath, source_dir)))
+        os.makedirs(target_path, exist_ok=True)
+        _make_linked_dirs(dirs, target_path)
+        for entry in files:
+            try:
+                sources.append((entry.path, os.path.join(target_path, entry.name), entry.stat()))
+            except OSError as e:
+                stats.errors.append((entry.path, e.strerror or str(e)))
+    existing = []  # (target path, stat)
+    for entry in walk_files(target_dir, workers=None):
+        if not entry.name.endswith((PARTIAL_SUFFIX, PROGRESS_SUFFIX)):
+            try:
+                existing.append((entry.path, entry.stat()))
+            except OSError:
+                pass
+
+    size_counts = collections.Counter(st.st_size for _, _, st in sources)
+    size_counts.update(st.st_size for _, st in existing)
+    source_sizes = {st.st_size for _, _, st in sources}
+    to_hash = [(src, st) for src, _, st in sources if size_counts[st.st_size] > 1]
+    to_hash += [(path, st) for path, st in existing if st.st_size in source_sizes and size_counts[st.st_size] > 1]
+
+    # Hash what could have a twin; cache reads and writes stay on this thread
+    digests = {}
+    cache = ScanCache() if use_cache else None
+    try:
+        def lookup():
+            for path, st in to_hash:
+                key = stat_key(path, st)
+                cached = cache.get(key, method) if cache else None
+                if cached:
+                    digests[path] = cached
+                else:
+                    yield path, key
+
+        for (path, key), (digest, error) in ordered_map(
+                lambda item: _guarded_hash(item[0], method), lookup(), workers=workers):
+            if digest:
+                digests[path] = digest
+                if cache:
+                    cache.put(key, path, method, digest)
+    finally:
+        if cache:
+            cache.close()
+
+    # Content already in the target. Files about to be overwritten cannot serve as link sources, but targets
+    # that already match their source stay as they are and can
+    unchanged = {dst for src, dst, _ in sources if src in digests and digests.get(dst) == digests[src]}
+    destinations = {dst for _, dst, _ in sources} - unchanged
+    index = {digests[path]: path for path, _ in existing if path in digests and path not in destinations}
+    done_events = {}  # Target path -> set once the copy to it has finished
+    failed_copies = set()  # Targets whose copy failed; they hold partial content and must not be linked to
+
+    def jobs():
+        for src, dst, st in sources:
+            digest = digests.get(src)
+            if dst in unchanged:
+                stats.skipped += 1
+                continue
+            progress.found(st.st_size)
+            if digest is not None and digest in index:
+                yield 'link', src, dst, index[digest]
+            else:
+                if digest is not None:
+                    index[digest] = dst
+                    done_events[dst] = threading.Event()
+                yield 'copy', src, dst, None
+
+    def remove_target(dst):
+        # Never write into an existing target in place: it may be a hardlink shared with other files
+        if os.path.lexists(dst):
+            os.unlink(dst)
+
+    def dedup_job(job):
+        kind, src, dst, linked_from = job
+        try:
+            if kind == 'link':
+                event = done_events.get(linked_from)
+                if event:
+                    event.wait()  # The first copy of this content was submitted earlier and is running
+                if linked_from not in failed_copies and os.path.exists(linked_from):
+                    remove_target(dst)
+                    try:
+                        if mode == 'hardlink':
+                            os.link(linked_from, dst)
+                        else:
+                            reflink_file(linked_from, dst)
+                            shutil.copystat(src, dst)
+                        size = os.stat(dst).st_size
+                        progress.add(size)
+                        return 'linked', size
+                    except (OSError, ImportError) as e:
+                        if isinstance(e, OSError) and e.errno not in UNLINKABLE_ERRNOS:
+                            raise
+            remove_target(dst)
+            return 'copied', copy_file(src, dst, progress, resume_above=resume_above)
+        except BaseException:
+            if kind == 'copy':
+                failed_copies.add(dst)
+            raise
+        finally:
+            if kind == 'copy' and dst in done_events:
+                done_events[dst].set()
+
+    for (_, src, _, _), result, error in run_jobs(dedup_job, jobs(), workers, progress):
+        if error is not None:
+            stats.errors.append((src, error))
+            continue
+        outcome, size = result
+        if outcome == 'linked':
+            stats.linked += 1
+        else:
+            stats.files += 1
+            stats.bytes += size
+    return stats
+
+
+def _guarded_hash(path: str, method: str) -> Tuple[Optional[str], Optional[str]]:
+    try:
+        return hash_file(path, (method,))[method], None
+    except OSError as e:
+        return None, e.strerror or str(e)
@@ -5,6 +5,22 @@ Duplicate File Finder
 This script analyzes files in a directory to find potential duplicates based on filename similarity
 using fuzzy string matching. It generates a detailed report of potential duplicates with similarity scores.
 
+Candidate pairs come from an index over the rarest characters or bigrams of base names that only yields
+pairs able to reach the threshold, so large folders are not compared all-pairs. --exact scores every pair
+instead; both modes produce the same report. Above a threshold of 2/3 long names must share many bigrams,
+which prunes most: on dupe_finder_bench.py scale (threshold 0.8, 5k names) the index scores 0.92M of the
+2.26M nearby-length pairs. Names drawn from a small vocabulary still leave a share of all pairs, though,
+so for listings of 100k+ names --approximate indexes each name under a few rare trigrams only: about
+20x fewer pairs scored there (0.72M against 14.6M at 20k names), at a recall of 97-98% instead of 98.5-99%.
+
+With --content, files are compared by content instead: they are grouped by size, then by a hash of their
+first and last 64 KiB, and only files that still collide are hashed in full.
+Hashes are kept in the shared scan cache (see scan_cache.py), so reruns over an unchanged tree skip the reads.
+
+With --images, JPEG/PNG/WebP and other images are compared by a perceptual hash (dHash or pHash) of a
+small grayscale thumbnail, so resized and re-encoded copies are found whatever their names. These hashes
+are cached as well.
+
 Usage:
     python dupe_finder.py [options] <directory> [directory2]
 
@@ -15,23 +31,226 @@ Options:
     --interactive           Run in interactive mode
     --limit INT             Limit results to top N potential duplicates
     --case-insensitive      Make filename matching case-insensitive
+    --exact                 Score every nearby-length pair instead of using the candidate index
+    --approximate           Index names by a few rare trigrams only: much faster on huge listings, may miss pairs
+    --workers INT           Score pairs in N processes (default: 1)
+    --content               Find files with identical content instead of similar names
+    --readers INT           Threads reading files in --content mode (default: 4)
+    --images                Find visually similar images by perceptual hash (requires Pillow)
+    --image-hash NAME       Perceptual hash for --images: dhash or phash (default: dhash)
+    --max-distance INT      Max Hamming distance between image hashes (0-64, default: 8)
+    --no-cache              Do not read or write the scan cache in --content and --images modes
+    --rebuild-cache         Ignore cached hashes and re-read every file, refreshing the cache
+    --normalize             Report files with equal normalized names (case, "(1)", " - Copy", "_final",
+                            resolution tags...) right away and fuzzy-match only the rest
+    --normalize-rules FILE  Use the regex rules in FILE for --normalize ("pattern" or "pattern => replacement")
+    --group                 Merge overlapping pairs into groups and report one entry per group
+    --format NAME           Report format: text, jsonl or csv (default: text). jsonl/csv need --report and
+                            are written while searching unless --limit is set
     --help                  Show this help message
 
 Examples:
     python dupe_finder.py --threshold 0.65 --recursive "D:\Photos"
     python dupe_finder.py "D:\Folder1" "D:\Folder2"  # Cross-folder comparison
+    python dupe_finder.py --images --workers 8 --recursive "D:\Photos"
 """
 
 import os
 import sys
 import argparse
+import csv
+import heapq
+import json
 import time
 from pathlib import Path
-from typing import List, Dict, Tuple, Set, Optional
+from typing import List, Dict, Iterator, Tuple, Set, Optional
 from dataclasses import dataclass
 from fuzzysearch import find_near_matches
 import difflib
+import hashlib
+import math
 import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastwalk import walk_files
+from scan_cache import ScanCache, StatKey, stat_key
+
+try:
+    from PIL import Image
+except ImportError:  # Only needed for --images
+    Image = None
+
+PARTIAL_HASH_BYTES = 64 * 1024  # Bytes read from each end of a file in the partial-hash stage
+HASH_READ_BYTES = 1024 * 1024  # Read size when hashing whole files
+NEARBY_LENGTH = 2  # Names are only compared with names at most this many characters longer or shorter
+APPROXIMATE_GRAM = 3  # --approximate indexes each name under its APPROXIMATE_TOKENS rarest trigrams
+APPROXIMATE_TOKENS = 4
+
+# Filters applied by DuplicateFinder.score_pair, cheapest first
+TIER_LENGTH = 0
+TIER_QUICK_RATIO = 1
+TIER_RATIO = 2
+TIER_NAMES = ("length ratio", "quick_ratio", "full ratio")
+
+# --normalize rules as (regex, replacement), applied to the casefolded base name until it stops changing
+DEFAULT_NORMALIZE_RULES = [
+    (r'^copy of\s+', ''),                                        # "Copy of report"
+    (r'\s*-\s*copy(\s*\(\d+\))?$', ''),                          # "report - Copy", "report - Copy (2)"
+    (r'\s*\(\d+\)$', ''),                                         # "report (1)"
+    (r'[\s_.-]+(final|copy|edited|backup|old)$', ''),            # "report_final", "report.old"
+    (r'[\s_.-]*(\d{3,4}p|[248]k|\d{3,4}x\d{3,4}|@[23]x)$', ''),   # "clip_1080p", "icon@2x", "shot 1920x1080"
+    (r'[\s_.-]+', ' '),                                          # Treat separators alike
+]
+
+
+def load_normalize_rules(path: str) -> List[Tuple[str, str]]:
+    """
+    Read normalization rules from a text file: one regex per line, optionally followed by " => replacement"
+    (matches are removed otherwise). Blank lines and lines starting with # are ignored.
+    """
+    rules = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            pattern, _, replacement = line.partition(' => ')
+            rules.append((pattern, replacement))
+    return rules
+
+
+def normalize_name(name: str, rules: List[Tuple["re.Pattern", str]]) -> str:
+    """Canonical key of a base name: casefolded, with the rules applied until nothing changes"""
+    key = name.casefold()
+    previous = None
+    while key != previous:
+        previous = key
+        for pattern, replacement in rules:
+            key = pattern.sub(replacement, key)
+    return key.strip()
+
+
+def hash_file_content(path: str, partial: bool = False) -> str:
+    """
+    SHA-256 of a file's content. With partial=True only the first and last PARTIAL_HASH_BYTES are hashed,
+    which already covers the whole file when it is no larger than two such blocks.
+    """
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        if partial:
+            size = os.fstat(f.fileno()).st_size
+            hasher.update(f.read(PARTIAL_HASH_BYTES))
+            if size > 2 * PARTIAL_HASH_BYTES:
+                f.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+            hasher.update(f.read(PARTIAL_HASH_BYTES))
+        else:
+            for chunk in iter(lambda: f.read(HASH_READ_BYTES), b''):
+                hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif', '.tif', '.tiff'}
+HASH_BITS = 64
+PHASH_SIZE = 32  # pHash takes the low frequencies of a DCT over a 32x32 thumbnail
+_DCT_COS = [[math.cos(math.pi * (2 * x + 1) * u / (2 * PHASH_SIZE)) for x in range(PHASH_SIZE)]
+            for u in range(8)]
+
+
+def _load_thumbnail(path: str, size: Tuple[int, int]):
+    """
+    Decode an image as a grayscale thumbnail of the given size. draft() lets JPEG decode at 1/2-1/8 scale
+    and reduce() shrinks other formats by an integer factor before the final resize.
+    """
+    with Image.open(path) as img:
+        img.draft('L', (size[0] * 4, size[1] * 4))
+        img = img.convert('L')
+        factor = min(img.width // (size[0] * 4), img.height // (size[1] * 4))
+        if factor > 1:
+            img = img.reduce(factor)
+        return img.resize(size, Image.BILINEAR)
+
+
+def image_dhash(path: str) -> int:
+    """64-bit difference hash: whether each pixel of a 9x8 thumbnail is brighter than its right neighbour"""
+    pixels = _load_thumbnail(path, (9, 8)).tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def image_phash(path: str) -> int:
+    """64-bit perceptual hash: sign of the 8x8 lowest DCT frequencies of a 32x32 thumbnail against their median"""
+    pixels = _load_thumbnail(path, (PHASH_SIZE, PHASH_SIZE)).tobytes()
+    rows = [pixels[y * PHASH_SIZE:(y + 1) * PHASH_SIZE] for y in range(PHASH_SIZE)]
+    # Separable DCT, computing only the 8 lowest frequencies in each direction
+    row_freqs = [[sum(c * p for c, p in zip(cos_u, row)) for cos_u in _DCT_COS] for row in rows]
+    coefficients = [sum(_DCT_COS[v][y] * row_freqs[y][u] for y in range(PHASH_SIZE))
+                    for v in range(8) for u in range(8)]
+    median = sorted(coefficients[1:])[31]  # The DC term only carries overall brightness
+    value = 0
+    for coefficient in coefficients:
+        value = (value << 1) | (coefficient > median)
+    return value
+
+
+IMAGE_HASHES = {
+    'dhash': image_dhash,
+    'phash': image_phash,
+}
+
+
+def _hash_image(job: Tuple[str, str]) -> Optional[int]:
+    """Pool entry point: hash one image, or None if it cannot be decoded"""
+    path, method = job
+    try:
+        return IMAGE_HASHES[method](path)
+    except Exception as e:
+        print(f"Skipping undecodable image: {path} ({e})")
+        return None
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes with Hamming distance. Children are keyed by their distance to the
+    parent, so by the triangle inequality a radius-k query only descends into children keyed d-k..d+k.
+    """
+    
+    def __init__(self):
+        self.root: Optional[list] = None  # Nodes are [hash, ids, {distance: child}]
+    
+    def add(self, value: int, entry_id: int) -> None:
+        """Insert an entry's hash, sharing the node of an identical hash"""
+        if self.root is None:
+            self.root = [value, [entry_id], {}]
+            return
+        node = self.root
+        while True:
+            distance = bin(node[0] ^ value).count('1')
+            if distance == 0:
+                node[1].append(entry_id)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [entry_id], {}]
+                return
+            node = child
+    
+    def query(self, value: int, max_distance: int) -> List[Tuple[int, int]]:
+        """(entry id, distance) of every stored hash within max_distance of value"""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = bin(node[0] ^ value).count('1')
+            if distance <= max_distance:
+                found.extend((entry_id, distance) for entry_id in node[1])
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return found
+
 
 @dataclass
 class FilePair:
@@ -39,28 +258,302 @@ class FilePair:
     file1: str
     file2: str
     similarity: float
-    match_details: str
+    match_details: Optional[str] = None  # Filled in once the pair is known to make the report
 
     def __str__(self) -> str:
         return f"{self.file1} ↔ {self.file2} (Similarity: {self.similarity:.2%})"
 
 
+class NameIndex:
+    """
+    Inverted index over base names used to generate candidate pairs (prefix filtering).
+
+    SequenceMatcher.ratio() is 2*M/T for M matched characters and T = len(a) + len(b), so a pair reaching
+    threshold t has M >= t*T/2. Two bounds follow on what such names share:
+    - characters: at least M, counting repeats;
+    - bigrams: the M characters form B matching blocks, a block of L characters holds L-1 bigrams found in
+      both names, and consecutive blocks are separated by at least one unmatched character (B-1 <= T-2M),
+      so the names share at least M - B >= 3M - T - 1 >= (1.5t - 1)*T - 1 bigrams. This bound grows with
+      the names, so above t = 2/3 long names must share many bigrams, which prunes far more than characters.
+    Tokens are numbered by occurrence so repeats count separately. If two names share at least c tokens, the
+    rarest n - c + 1 of each name's n tokens hold one they both share. Each name is indexed under the rarest
+    tokens of the kind expected to yield fewer candidates, with T taken at its shortest possible partner.
+    Names indexed by characters are also looked up by characters from every query, so mixed pairs are found.
+    Every pair that can reach the threshold is kept; the rest are skipped unscored.
+    
+    With approximate=True each name is only indexed under its APPROXIMATE_TOKENS rarest trigrams that some
+    other name has too. Candidate lists stay short on huge listings, but pairs whose edits hit those trigrams
+    are missed.
+    """
+    
+    def __init__(self, threshold: float, case_insensitive: bool = False, length_difference: int = NEARBY_LENGTH,
+                 approximate: bool = False):
+        self.threshold = threshold
+        self.case_insensitive = case_insensitive
+        self.approximate = approximate
+        self.length_difference = length_difference  # Partners are at most this many characters longer or shorter
+        self.token_rank: Dict[Tuple[str, int], int] = {}
+        self.token_frequency: Counter = Counter()
+        self.bigram_postings: Dict[Tuple[str, int], List[int]] = {}  # Names indexed by bigrams
+        self.char_only_postings: Dict[Tuple[str, int], List[int]] = {}  # Names indexed by characters
+        self.postings: Dict[Tuple[str, int], List[int]] = {}  # Every name, by characters
+    
+    def tokens(self, name: str, size: int = 1) -> List[Tuple[str, int]]:
+        """Split a name into (character or bigram, occurrence) tokens so repeats count separately"""
+        if self.case_insensitive:
+            name = name.lower()
+        seen: Dict[str, int] = {}
+        tokens = []
+        for start in range(len(name) - size + 1):
+            gram = name[start:start + size]
+            occurrence = seen.get(gram, 0)
+            seen[gram] = occurrence + 1
+            tokens.append((gram, occurrence))
+        return tokens
+    
+    def build_token_order(self, names) -> None:
+        """Rank tokens from rarest to most common across every name that will be indexed or queried"""
+        frequency: Counter = Counter()
+        for name in names:
+            if self.approximate:
+                frequency.update(self._approximate_tokens(name))
+                continue
+            frequency.update(self.tokens(name))
+            frequency.update(self.tokens(name, 2))
+        ordered = sorted(frequency, key=lambda token: (frequency[token], token))
+        self.token_rank = {token: rank for rank, token in enumerate(ordered)}
+        self.token_frequency = frequency
+    
+    def _rarest(self, tokens: List[Tuple[str, int]], min_overlap: float) -> List[Tuple[str, int]]:
+        """Prefix of the tokens for a pair sharing at least min_overlap; tokens no other name has cannot be shared"""
+        shareable = [token for token in tokens if self.token_frequency[token] > 1]
+        shareable.sort(key=self.token_rank.__getitem__)
+        return shareable[:len(shareable) - max(1, math.ceil(min_overlap - 1e-9)) + 1]
+    
+    def _approximate_tokens(self, name: str) -> List[Tuple[str, int]]:
+        return self.tokens(name, APPROXIMATE_GRAM) if len(name) >= APPROXIMATE_GRAM else self.tokens(name)
+    
+    def prefix(self, name: str) -> Tuple[Optional[List[Tuple[str, int]]], List[Tuple[str, int]]]:
+        """
+        (bigram prefix or None, character prefix): the rarest tokens one of which any name reaching the
+        threshold must share. The bigram prefix is only given where it beats the character prefix.
+        """
+        if self.threshold > 1:
+            return None, []
+        if self.approximate:
+            return self._rarest(self._approximate_tokens(name), 0)[:APPROXIMATE_TOKENS], []
+        t = self.threshold
+        chars = self.tokens(name)
+        # Lower-casing never shortens a name, so a partner is at least len(name) - length_difference long
+        shortest_partner = max(len(name) - self.length_difference, len(chars) * t / (2 - t))
+        shortest_total = len(chars) + shortest_partner
+        char_prefix = self._rarest(chars, t * shortest_total / 2)
+        
+        min_bigrams = (1.5 * t - 1) * shortest_total - 1
+        if min_bigrams <= 0:
+            return None, char_prefix
+        bigram_prefix = self._rarest(self.tokens(name, 2), min_bigrams)
+        frequency = self.token_frequency
+        if sum(frequency[token] for token in bigram_prefix) >= sum(frequency[token] for token in char_prefix):
+            return None, char_prefix
+        return bigram_prefix, char_prefix
+    
+    def add(self, entry_id: int, prefix: Tuple[Optional[List[Tuple[str, int]]], List[Tuple[str, int]]]) -> None:
+        """Index an entry under its prefix tokens"""
+        bigram_prefix, char_prefix = prefix
+        indexes = [(self.postings, char_prefix)]
+        if bigram_prefix is not None:
+            indexes.append((self.bigram_postings, bigram_prefix))
+        else:
+            indexes.append((self.char_only_postings, char_prefix))
+        for postings, tokens in indexes:
+            for token in tokens:
+                if token not in postings:
+                    postings[token] = []
+                postings[token].append(entry_id)
+    
+    def candidates(self, prefix: Tuple[Optional[List[Tuple[str, int]]], List[Tuple[str, int]]]) -> Set[int]:
+        """Ids of indexed entries sharing a prefix token of the kind both are indexed by"""
+        bigram_prefix, char_prefix = prefix
+        if bigram_prefix is None:
+            lookups = [(self.postings, char_prefix)]
+        else:
+            lookups = [(self.bigram_postings, bigram_prefix), (self.char_only_postings, char_prefix)]
+        found: Set[int] = set()
+        for postings, tokens in lookups:
+            for token in tokens:
+                found.update(postings.get(token, ()))
+        return found
+
+
+@dataclass
+class DuplicateGroup:
+    """Files linked by duplicate pairs into one connected component"""
+    representative: str
+    members: List[str]  # Representative first, then the rest in scan order
+    best_similarity: Dict[str, float]  # Highest similarity of any pair each member was found in
+
+    def __str__(self) -> str:
+        return f"{self.representative} + {len(self.members) - 1} more"
+
+
+class DisjointSet:
+    """Union-find over file paths with path compression and union by size"""
+    
+    def __init__(self):
+        self.parent: Dict[str, str] = {}
+        self.size: Dict[str, int] = {}
+    
+    def find(self, item: str) -> str:
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+            return item
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+    
+    def union(self, item1: str, item2: str) -> None:
+        root1, root2 = self.find(item1), self.find(item2)
+        if root1 == root2:
+            return
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+        self.parent[root2] = root1
+        self.size[root1] += self.size[root2]
+    
+    def components(self) -> Dict[str, List[str]]:
+        """Members of each component, keyed by its root"""
+        groups: Dict[str, List[str]] = {}
+        for item in self.parent:
+            root = self.find(item)
+            if root not in groups:
+                groups[root] = []
+            groups[root].append(item)
+        return groups
+
+
+class TopPairs:
+    """
+    Keeps the `limit` best pairs seen so far in a min-heap, so memory stays bounded however many pairs pass
+    the threshold. Pairs rank by similarity, then by the order they were found in (earlier wins ties).
+    """
+    
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.heap: List[Tuple[float, Tuple[int, ...], FilePair]] = []
+    
+    def push(self, order: Tuple[int, ...], pair: FilePair) -> None:
+        # The heap root is the pair to drop next: lowest similarity, and the latest found among equals
+        item = (pair.similarity, tuple(-part for part in order), pair)
+        if len(self.heap) < self.limit:
+            heapq.heappush(self.heap, item)
+        elif item[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, item)
+    
+    def sorted_pairs(self) -> List[Tuple[Tuple[int, ...], FilePair]]:
+        """Kept pairs, best first, with the order they were found in"""
+        items = sorted(self.heap, key=lambda item: (-item[0], tuple(-part for part in item[1])))
+        return [(tuple(-part for part in negated), pair) for _, negated, pair in items]
+
+
+REPORT_FORMATS = ("text", "jsonl", "csv")
+REPORT_FIELDS = ("file1", "file2", "similarity", "match_details", "size1", "size2")
+GROUP_REPORT_FIELDS = ("group", "file", "representative", "best_similarity", "size")
+
+
+class ReportWriter:
+    """Writes pairs to a JSONL or CSV report one at a time, so results can be streamed as they are found"""
+    
+    def __init__(self, output_file: str, report_format: str, grouped: bool = False):
+        self.report_format = report_format
+        self.count = 0
+        self.file = open(output_file, 'w', encoding='utf-8', newline='')
+        self.csv_writer = None
+        if report_format == "csv":
+            self.csv_writer = csv.writer(self.file)
+            self.csv_writer.writerow(GROUP_REPORT_FIELDS if grouped else REPORT_FIELDS)
+    
+    def write(self, pair: FilePair, size1: int, size2: int) -> None:
+        row = (pair.file1, pair.file2, round(pair.similarity, 6), pair.match_details, size1, size2)
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(row)
+        else:
+            self.file.write(json.dumps(dict(zip(REPORT_FIELDS, row)), ensure_ascii=False) + "\n")
+        self.count += 1
+    
+    def write_group(self, group: DuplicateGroup, sizes: Dict[str, int]) -> None:
+        """One JSON object per group, or one CSV row per member"""
+        self.count += 1
+        rows = [(self.count, member, member == group.representative,
+                 round(group.best_similarity[member], 6), sizes[member]) for member in group.members]
+        if self.csv_writer is not None:
+            self.csv_writer.writerows(rows)
+            return
+        self.file.write(json.dumps({
+            "group": self.count,
+            "representative": group.representative,
+            "members": [dict(zip(GROUP_REPORT_FIELDS[1:], row[1:])) for row in rows],
+        }, ensure_ascii=False) + "\n")
+    
+    def close(self) -> None:
+        self.file.close()
+
+
 class DuplicateFinder:
     """Main class for finding potential duplicate files based on filename similarity"""
     
     def __init__(self, directory: str, threshold: float = 0.6, recursive: bool = False, 
                  limit: Optional[int] = None, directory2: Optional[str] = None, 
-                 case_insensitive: bool = False):
+                 case_insensitive: bool = False, exact: bool = False, workers: int = 1,
+                 content: bool = False, readers: int = 4, images: bool = False,
+                 image_hash: str = 'dhash', max_distance: int = 8, cache: Optional[ScanCache] = None,
+                 report_format: str = "text", group: bool = False,
+                 normalize_rules: Optional[List[Tuple[str, str]]] = None, approximate: bool = False):
         self.directory = os.path.abspath(directory)
         self.directory2 = os.path.abspath(directory2) if directory2 else None
         self.threshold = threshold
         self.recursive = recursive
         self.limit = limit
         self.case_insensitive = case_insensitive
+        self.exact = exact
+        self.approximate = approximate and not exact
+        self.workers = max(1, workers)
+        self.content = content
+        self.readers = max(1, readers)
+        self.images = images
+        self.image_hash = image_hash
+        self.max_distance = max_distance
+        self.cache = cache
+        self.report_format = report_format
+        self.group = group
+        self.normalize_rules = [(re.compile(pattern), replacement) for pattern, replacement in normalize_rules] \
+            if normalize_rules is not None else None
+        self.groups: List[DuplicateGroup] = []
+        self.found_count = 0
+        self.pairs_scored = 0  # Name pairs that went through score_pair in the last search
+        self._stat_keys: Dict[str, StatKey] = {}
+        self._sizes: Dict[str, int] = {}
+        self._hits: List[Tuple[Tuple[int, ...], FilePair]] = []
+        self._top: Optional[TopPairs] = None
+        self._stream: Optional[ReportWriter] = None
+        self._linked: Optional[DisjointSet] = None
+        self._best_similarity: Dict[str, float] = {}
+        self._degree: Dict[str, int] = {}
         self.files: List[str] = []
         self.files2: List[str] = []
         self.potential_duplicates: List[FilePair] = []
         self.cross_folder_mode = directory2 is not None
+    
+    def __getstate__(self) -> dict:
+        # Pool processes get a copy of the finder; open files and database handles stay in the parent
+        state = self.__dict__.copy()
+        state['cache'] = None
+        state['_stream'] = None
+        return state
         
     def scan_directory(self) -> None:
         """Scan the directory and collect all filenames"""
@@ -71,49 +564,67 @@ class DuplicateFinder:
             print(f"Scanning directory: {self.directory}")
         start_time = time.time()
         
-        if self.recursive:
-            for root, _, files in os.walk(self.directory):
-                for file in files:
-                    self.files.append(os.path.join(root, file))
-        else:
-            self.files = [os.path.join(self.directory, f) for f in os.listdir(self.directory) 
-                         if os.path.isfile(os.path.join(self.directory, f))]
-        
+        self.files = self._list_files(self.directory)
         if self.cross_folder_mode:
-            if self.recursive:
-                for root, _, files in os.walk(self.directory2):
-                    for file in files:
-                        self.files2.append(os.path.join(root, file))
-            else:
-                self.files2 = [os.path.join(self.directory2, f) for f in os.listdir(self.directory2) 
-                             if os.path.isfile(os.path.join(self.directory2, f))]
+            self.files2 = self._list_files(self.directory2)
             print(f"Found {len(self.files)} files in folder 1 and {len(self.files2)} files in folder 2 in {time.time() - start_time:.2f} seconds")
         else:
             print(f"Found {len(self.files)} files in {time.time() - start_time:.2f} seconds")
     
+    def _list_files(self, directory: str) -> List[str]:
+        """File paths under directory in os.walk order; only images are listed in --images mode"""
+        extensions = IMAGE_EXTENSIONS if self.images else None
+        if self.recursive:
+            return [entry.path for entry in walk_files(directory, extensions=extensions, workers=None)]
+        # Top level only: regular files, as os.path.isfile would keep
+        return [entry.path for entry in walk_files(directory, extensions=extensions, recursive=False)
+                if entry.is_file()]
+
     def get_base_filename(self, path: str) -> str:
         """Extract the base filename without extension"""
         return os.path.splitext(os.path.basename(path))[0]
     
     def calculate_similarity(self, str1: str, str2: str) -> Tuple[float, str]:
         """Calculate similarity between two strings and provide match details"""
-        if self.case_insensitive:
-            str1 = str1.lower()
-            str2 = str2.lower()
-        
-        similarity = difflib.SequenceMatcher(None, str1, str2).ratio()
+        similarity, _ = self.score_pair(str1, str2)
+        if similarity is None:
+            similarity = difflib.SequenceMatcher(None, *self._comparable(str1, str2)).ratio()
+        return similarity, self.describe_match(str1, str2)
+    
+    def score_pair(self, str1: str, str2: str) -> Tuple[Optional[float], int]:
+        """
+        Similarity of two names through a tier of filters, each an upper bound on SequenceMatcher.ratio():
+        the length ratio (what real_quick_ratio() computes, checked before building a matcher), then
+        quick_ratio() over shared characters, and only then the full ratio(). Returns (None, tier) when a
+        bound already falls below the threshold, otherwise (ratio, tier of the full ratio).
+        """
+        str1, str2 = self._comparable(str1, str2)
+        total = len(str1) + len(str2)
+        if total and 2.0 * min(len(str1), len(str2)) / total < self.threshold:
+            return None, TIER_LENGTH
         
+        matcher = difflib.SequenceMatcher(None, str1, str2)
+        if matcher.quick_ratio() < self.threshold:
+            return None, TIER_QUICK_RATIO
+        return matcher.ratio(), TIER_RATIO
+    
+    def describe_match(self, str1: str, str2: str) -> str:
+        """Fuzzy-match summary shown in the report; only computed for reported pairs since it is the slow part"""
         # Use fuzzysearch to find specific matches
+        str1, str2 = self._comparable(str1, str2)
         max_l_dist = min(3, max(1, min(len(str1), len(str2)) // 10))  # Adaptive distance
         matches = find_near_matches(str1.lower(), str2.lower(), max_l_dist=max_l_dist)
         
         # Generate match details
         if matches:
-            match_details = f"Found {len(matches)} fuzzy matches with max distance {max_l_dist}"
-        else:
-            match_details = "No specific fuzzy matches found"
-            
-        return similarity, match_details
+            return f"Found {len(matches)} fuzzy matches with max distance {max_l_dist}"
+        return "No specific fuzzy matches found"
+    
+    def _comparable(self, str1: str, str2: str) -> Tuple[str, str]:
+        """Names as they are compared, honouring case_insensitive"""
+        if self.case_insensitive:
+            return str1.lower(), str2.lower()
+        return str1, str2
     
     def find_duplicates(self) -> None:
         """Find potential duplicate files based on filename similarity"""
@@ -122,100 +633,497 @@ class DuplicateFinder:
         else:
             print(f"Analyzing {len(self.files)} files for potential duplicates...")
         start_time = time.time()
+        self.found_count = 0
+        self.pairs_scored = 0
+        self._hits = []
+        self._top = TopPairs(self.limit) if self.limit and not self.group else None
+        self._linked = DisjointSet() if self.group else None
+        self._best_similarity = {}
+        self._degree = {}
         
-        if self.cross_folder_mode:
+        if self.content:
+            self._find_content_duplicates()
+        elif self.images:
+            self._find_image_duplicates()
+        elif self.cross_folder_mode:
             self._find_cross_folder_duplicates()
         else:
             self._find_same_folder_duplicates()
         
-        self.potential_duplicates.sort(key=lambda x: x.similarity, reverse=True)
+        if self._linked is not None:
+            self._build_groups()
+            print(f"Found {len(self.groups)} duplicate groups covering {sum(len(g.members) for g in self.groups)} "
+                  f"files ({self.found_count} pairs) in {time.time() - start_time:.2f} seconds")
+            return
         
-        if self.limit and len(self.potential_duplicates) > self.limit:
-            self.potential_duplicates = self.potential_duplicates[:self.limit]
-            
-        print(f"Found {len(self.potential_duplicates)} potential duplicates in {time.time() - start_time:.2f} seconds")
+        # Best first; equally similar pairs keep the order they were found in
+        if self._top is not None:
+            ranked = self._top.sorted_pairs()
+        else:
+            ranked = sorted(self._hits, key=lambda hit: (-hit[1].similarity, hit[0]))
+        self._hits = []
+        self.potential_duplicates = [pair for _, pair in ranked]
+        
+        for pair in self.potential_duplicates:
+            self._describe(pair)
+        
+        found = self.found_count if self._stream is not None else len(self.potential_duplicates)
+        print(f"Found {found} potential duplicates in {time.time() - start_time:.2f} seconds")
     
-    def _find_same_folder_duplicates(self) -> None:
-        """Find duplicates within the same folder"""
+    def _collect(self, order: Tuple[int, ...], pair: FilePair) -> None:
+        """
+        Take a pair above the threshold. `order` is its position in the scan and breaks ties in similarity.
+        With --limit only the best pairs are kept; when streaming a JSONL/CSV report the pair is written out
+        right away instead of being kept.
+        """
+        self.found_count += 1
+        if self._linked is not None:
+            self._link(pair)
+        elif self._top is not None:
+            self._top.push(order, pair)
+        elif self._stream is not None:
+            self._write_pair(self._stream, pair)
+        else:
+            self._hits.append((order, pair))
+    
+    def _link(self, pair: FilePair) -> None:
+        """Merge a pair into the groups; only per-file state is kept, never the pair itself"""
+        self._linked.union(pair.file1, pair.file2)
+        for file_path in (pair.file1, pair.file2):
+            self._best_similarity[file_path] = max(pair.similarity, self._best_similarity.get(file_path, 0.0))
+            self._degree[file_path] = self._degree.get(file_path, 0) + 1
+    
+    def _build_groups(self) -> None:
+        """
+        Turn the connected components into groups. The representative is the member found in the most pairs
+        (earliest scanned on ties). Groups are ordered largest first, then by best similarity.
+        """
+        scan_order = {file_path: i for i, file_path in enumerate(self.files + self.files2)}
+        groups = []
+        for members in self._linked.components().values():
+            members.sort(key=lambda member: scan_order.get(member, len(scan_order)))
+            representative = max(members, key=lambda member: (self._degree[member], -scan_order.get(member, 0)))
+            members.remove(representative)
+            groups.append(DuplicateGroup(
+                representative, [representative] + members,
+                {member: self._best_similarity[member] for member in [representative] + members},
+            ))
+        groups.sort(key=lambda group: (-len(group.members), -max(group.best_similarity.values()),
+                                       scan_order.get(group.representative, 0)))
+        self.groups = groups[:self.limit] if self.limit else groups
+        self._linked = None
+    
+    def _describe(self, pair: FilePair) -> None:
+        """Fill in the match details of a name-based pair that is going into the report"""
+        if pair.match_details is None:
+            pair.match_details = self.describe_match(
+                self.get_base_filename(pair.file1), self.get_base_filename(pair.file2)
+            )
+    
+    def _file_size(self, path: str) -> int:
+        """File size, stat'ed at most once per run"""
+        if path not in self._sizes:
+            key = self._stat_keys.get(path)
+            self._sizes[path] = key[2] if key is not None else os.path.getsize(path)
+        return self._sizes[path]
+    
+    def _write_pair(self, writer: ReportWriter, pair: FilePair) -> None:
+        self._describe(pair)
+        writer.write(pair, self._file_size(pair.file1), self._file_size(pair.file2))
+    
+    def _group_by_length(self, files: List[str]) -> Dict[int, List[str]]:
+        """Bucket files by the length of their base filename, preserving scan order"""
         files_by_length: Dict[int, List[str]] = {}
-        for file_path in self.files:
+        for file_path in files:
             base_name = self.get_base_filename(file_path)
             length = len(base_name)
             if length not in files_by_length:
                 files_by_length[length] = []
             files_by_length[length].append(file_path)
-        
-        compared_pairs: Set[Tuple[str, str]] = set()
-        
-        for length, files in files_by_length.items():
-            for nearby_length in range(max(1, length - 2), length + 3):
-                if nearby_length not in files_by_length:
-                    continue
-                    
-                for file1 in files:
-                    base_name1 = self.get_base_filename(file1)
-                    
-                    for file2 in files_by_length[nearby_length]:
-                        if file1 == file2:
-                            continue
-                            
-                        pair = tuple(sorted([file1, file2]))
-                        if pair in compared_pairs:
-                            continue
-                        compared_pairs.add(pair)
-                        
-                        base_name2 = self.get_base_filename(file2)
-                        similarity, match_details = self.calculate_similarity(base_name1, base_name2)
-                        
-                        if similarity >= self.threshold:
-                            self.potential_duplicates.append(
-                                FilePair(file1, file2, similarity, match_details)
-                            )
+        return files_by_length
+    
+    def _nearby_lengths(self, length: int) -> range:
+        """Name lengths a file of the given length is compared against"""
+        return range(max(1, length - NEARBY_LENGTH), length + NEARBY_LENGTH + 1)
+    
+    def _find_same_folder_duplicates(self) -> None:
+        """Find duplicates within the same folder"""
+        files, _ = self._find_normalized_duplicates()
+        entries = self._index_entries(self._group_by_length(files))
+        self._prepare_candidates(entries, entries)
+        self._score_entries()
     
     def _find_cross_folder_duplicates(self) -> None:
         """Find duplicates across two different folders"""
-        files1_by_length: Dict[int, List[str]] = {}
-        for file_path in self.files:
-            base_name = self.get_base_filename(file_path)
-            length = len(base_name)
-            if length not in files1_by_length:
-                files1_by_length[length] = []
-            files1_by_length[length].append(file_path)
+        files1, files2 = self._find_normalized_duplicates()
+        entries1 = self._index_entries(self._group_by_length(files1))
+        entries2 = self._index_entries(self._group_by_length(files2))
+        self._prepare_candidates(entries1, entries2)
+        self._score_entries()
+    
+    def _find_normalized_duplicates(self) -> Tuple[List[str], List[str]]:
+        """
+        With normalization rules, report files whose canonical names are equal straight away, found with one
+        dict lookup per file. Returns the files of folder 1 and 2 left for fuzzy matching: ungrouped files plus
+        the first member of each group per folder, so groups can still be linked to near-misses.
+        """
+        if self.normalize_rules is None:
+            return self.files, self.files2
         
-        files2_by_length: Dict[int, List[str]] = {}
-        for file_path in self.files2:
-            base_name = self.get_base_filename(file_path)
-            length = len(base_name)
-            if length not in files2_by_length:
-                files2_by_length[length] = []
-            files2_by_length[length].append(file_path)
+        tagged_files = [(file_path, 1) for file_path in self.files] + [(file_path, 2) for file_path in self.files2]
+        files_by_key: Dict[str, List[Tuple[str, int]]] = {}
+        for file_path, folder in tagged_files:
+            key = normalize_name(self.get_base_filename(file_path), self.normalize_rules)
+            if not key:
+                continue
+            if key not in files_by_key:
+                files_by_key[key] = []
+            files_by_key[key].append((file_path, folder))
+        
+        found = 0
+        set_aside: Set[str] = set()
+        for key, members in files_by_key.items():
+            if not self._can_pair(members):
+                continue
+            details = f"Same normalized name '{key}'"
+            for i, (file1, folder1) in enumerate(members):
+                for file2, folder2 in members[i + 1:]:
+                    if self.cross_folder_mode and folder1 == folder2:
+                        continue
+                    pair = (file2, file1) if folder1 > folder2 else (file1, file2)
+                    # Ordered ahead of every fuzzy match of the same similarity
+                    self._collect((-1, found, 0, 0), FilePair(*pair, 1.0, details))
+                    found += 1
+            kept_folders: Set[int] = set()
+            for file_path, folder in members:
+                if folder in kept_folders:
+                    set_aside.add(file_path)
+                kept_folders.add(folder)
+        
+        print(f"Normalized names: {found} pairs reported, {len(set_aside)} files skip fuzzy matching")
+        return ([file_path for file_path in self.files if file_path not in set_aside],
+                [file_path for file_path in self.files2 if file_path not in set_aside])
+    
+    def _prepare_candidates(self, entries1: List[Tuple[str, str, int, int]],
+                            entries2: List[Tuple[str, str, int, int]]) -> None:
+        """Index the entries of folder 2 (or the only folder) so each entry of folder 1 can look up its candidates"""
+        self._entries1 = entries1
+        self._entries2 = entries2
+        self._ids_by_length: Dict[int, List[int]] = {}
+        self._name_index: Optional[NameIndex] = None
+        
+        if self.exact or self.threshold <= 0:
+            for entry_id, (_, name, _, _) in enumerate(entries2):
+                if len(name) not in self._ids_by_length:
+                    self._ids_by_length[len(name)] = []
+                self._ids_by_length[len(name)].append(entry_id)
+            return
+        
+        names = [entry[1] for entry in entries1]
+        if entries2 is not entries1:
+            names.extend(entry[1] for entry in entries2)
+        self._name_index = NameIndex(self.threshold, self.case_insensitive, NEARBY_LENGTH, self.approximate)
+        self._name_index.build_token_order(names)
+        for entry_id, (_, name, _, _) in enumerate(entries2):
+            self._name_index.add(entry_id, self._name_index.prefix(name))
+    
+    def _candidate_ids(self, name: str):
+        """Ids of folder 2 entries worth scoring against a name; every nearby-length entry in exact mode"""
+        if self._name_index is not None:
+            return self._name_index.candidates(self._name_index.prefix(name))
+        
+        candidate_ids: List[int] = []
+        for length in range(max(0, len(name) - NEARBY_LENGTH), len(name) + NEARBY_LENGTH + 1):
+            candidate_ids.extend(self._ids_by_length.get(length, ()))
+        return candidate_ids
+    
+    def _score_entries(self) -> None:
+        """Score every entry of folder 1 against its candidates, in a process pool when workers > 1"""
+        # Hits are keyed by the exhaustive scan's order, so ties in similarity are reported identically
+        if self.workers > 1 and len(self._entries1) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(self,)) as executor:
+                for shard_hits, shard_scored in executor.map(_score_shard, self._shards()):
+                    self.pairs_scored += shard_scored
+                    for key, pair in shard_hits:
+                        self._collect(key, pair)
+        else:
+            for key, pair in self._score_range(0, len(self._entries1)):
+                self._collect(key, pair)
+    
+    def _shards(self) -> List[Tuple[int, int]]:
+        """Split folder 1 entries into (start, stop) ranges along length buckets, cutting large buckets up"""
+        shard_size = max(1, math.ceil(len(self._entries1) / (self.workers * 8)))
+        shards = []
+        start = 0
+        for stop in range(1, len(self._entries1) + 1):
+            bucket_ends = stop == len(self._entries1) or self._entries1[stop][2] != self._entries1[start][2]
+            if bucket_ends or stop - start >= shard_size:
+                shards.append((start, stop))
+                start = stop
+        return shards
+    
+    def _score_range(self, start: int, stop: int) -> Iterator[Tuple[Tuple[int, int, int, int], FilePair]]:
+        """
+        Score folder 1 entries start..stop-1 against their candidates and yield the hits above the threshold,
+        each keyed by the position at which the exhaustive nearby-length scan would have reported it.
+        """
+        for entry_id in range(start, stop):
+            file_path, name, length_rank, position = self._entries1[entry_id]
+            
+            for other_id in self._candidate_ids(name):
+                other_path, other_name, other_rank, other_position = self._entries2[other_id]
+                
+                if self.cross_folder_mode:
+                    if len(other_name) not in self._nearby_lengths(len(name)):
+                        continue
+                    key = (length_rank, len(other_name), position, other_position)
+                    file1, file2, name1, name2 = file_path, other_path, name, other_name
+                else:
+                    # Within one folder a pair is only scored from its later entry, so nothing is compared twice
+                    if other_id >= entry_id:
+                        continue
+                    order = self._pair_order(
+                        (len(name), length_rank, position),
+                        (len(other_name), other_rank, other_position),
+                    )
+                    if order is None:
+                        continue
+                    key, swapped = order
+                    if swapped:
+                        file1, file2, name1, name2 = other_path, file_path, other_name, name
+                    else:
+                        file1, file2, name1, name2 = file_path, other_path, name, other_name
+                
+                self.pairs_scored += 1
+                similarity, _ = self.score_pair(name1, name2)
+                if similarity is not None and similarity >= self.threshold:
+                    yield key, FilePair(file1, file2, similarity)
+    
+    def _find_content_duplicates(self) -> None:
+        """
+        Find files with identical content. Files are grouped by size first, then by a hash of their first and
+        last PARTIAL_HASH_BYTES, and only files still colliding after that are read in full.
+        """
+        # Tag each file with its folder (1 or 2) so cross-folder mode only reports pairs across the folders
+        tagged_files = [(file_path, 1) for file_path in self.files] + [(file_path, 2) for file_path in self.files2]
+        
+        files_by_size: Dict[int, List[Tuple[str, int]]] = {}
+        size_of: Dict[str, int] = {}
+        for file_path, folder in tagged_files:
+            try:
+                st = os.stat(file_path)
+            except OSError as e:
+                print(f"Skipping unreadable file: {file_path} ({e})")
+                continue
+            size = st.st_size
+            self._stat_keys[file_path] = stat_key(file_path, st)
+            if size == 0:
+                continue
+            size_of[file_path] = size
+            if size not in files_by_size:
+                files_by_size[size] = []
+            files_by_size[size].append((file_path, folder))
+        
+        size_groups = [group for group in files_by_size.values() if self._can_pair(group)]
+        partial_groups = self._split_by_hash(size_groups, partial=True)
+        
+        # Files no larger than the two partial blocks were hashed whole already
+        small_groups = [group for group in partial_groups
+                        if size_of[group[0][0][0]] <= 2 * PARTIAL_HASH_BYTES]
+        large_groups = [[member for member, _ in group] for group in partial_groups
+                        if size_of[group[0][0][0]] > 2 * PARTIAL_HASH_BYTES]
+        full_groups = small_groups + self._split_by_hash(large_groups, partial=False)
+        
+        print(f"Content stages: {len(tagged_files)} files stat'ed, "
+              f"{sum(len(group) for group in size_groups)} partially hashed, "
+              f"{sum(len(group) for group in large_groups)} fully hashed"
+              + (f", {self.cache.hits} hashes read from cache" if self.cache else ""))
+        
+        # Report groups in scan order, and pairs within a group in scan order
+        found = 0
+        scan_order = {file_path: i for i, (file_path, _) in enumerate(tagged_files)}
+        full_groups.sort(key=lambda group: min(scan_order[member[0]] for member, _ in group))
+        for group in full_groups:
+            details = f"Identical content (SHA-256 {group[0][1][:16]})"
+            members = sorted((member for member, _ in group), key=lambda member: scan_order[member[0]])
+            for i, (file1, folder1) in enumerate(members):
+                for file2, folder2 in members[i + 1:]:
+                    if self.cross_folder_mode and folder1 == folder2:
+                        continue
+                    pair = (file2, file1) if folder1 > folder2 else (file1, file2)
+                    self._collect((found,), FilePair(*pair, 1.0, details))
+                    found += 1
+    
+    def _find_image_duplicates(self) -> None:
+        """
+        Find visually similar images by perceptual hash. Images are decoded in a process pool and their hashes
+        stored in a BK-tree, so each lookup only visits hashes that can lie within max_distance.
+        """
+        images1 = [path for path in self.files if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS]
+        images2 = [path for path in self.files2 if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS]
+        hashes1 = self._hash_images(images1)
+        hashes2 = self._hash_images(images2) if self.cross_folder_mode else hashes1
+        
+        tree = BKTree()
+        found = 0
+        if self.cross_folder_mode:
+            for entry_id, value in enumerate(hashes2):
+                if value is not None:
+                    tree.add(value, entry_id)
+        
+        for entry_id, value in enumerate(hashes1):
+            if value is None:
+                continue
+            # Within one folder each image is looked up before it is added, so every pair is found once
+            for other_id, distance in sorted(tree.query(value, self.max_distance)):
+                file1, file2 = (images1[entry_id], images2[other_id]) if self.cross_folder_mode \
+                    else (images1[other_id], images1[entry_id])
+                self._collect((found,), FilePair(
+                    file1, file2, 1 - distance / HASH_BITS,
+                    f"{self.image_hash} Hamming distance {distance} of {HASH_BITS} bits"
+                ))
+                found += 1
+            if not self.cross_folder_mode:
+                tree.add(value, entry_id)
+    
+    def _hash_images(self, paths: List[str]) -> List[Optional[int]]:
+        """Perceptual hashes of the images, decoded in a process pool when workers > 1"""
+        if Image is None:
+            raise RuntimeError("Image mode requires Pillow: pip install Pillow")
+        hashes: List[Optional[int]] = []
+        jobs = []
+        for path in paths:
+            cached = self._cache_get(path, self.image_hash)
+            hashes.append(int(cached, 16) if cached is not None else None)
+            if cached is None:
+                jobs.append((len(hashes) - 1, (path, self.image_hash)))
+        
+        if self.workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                decoded = list(executor.map(_hash_image, [job for _, job in jobs], chunksize=64))
+        else:
+            decoded = [_hash_image(job) for _, job in jobs]
+        
+        for (position, (path, _)), value in zip(jobs, decoded):
+            hashes[position] = value
+            if value is not None:
+                self._cache_put(path, self.image_hash, format(value, '016x'))
+        return hashes
+    
+    def _can_pair(self, group: List[Tuple[str, int]]) -> bool:
+        """Whether a group of (path, folder) members can still contain a reportable pair"""
+        if self.cross_folder_mode:
+            return len({folder for _, folder in group}) == 2
+        return len(group) > 1
+    
+    def _split_by_hash(self, groups: List[List[Tuple[str, int]]],
+                       partial: bool) -> List[List[Tuple[Tuple[str, int], str]]]:
+        """Hash every member of the groups on a pool of reader threads and split each group by digest"""
+        kind = 'sha256-partial' if partial else 'sha256'
+        digest_of: Dict[Tuple[str, int], Optional[str]] = {}
+        to_read = []
+        for member in (member for group in groups for member in group):
+            digest_of[member] = self._cache_get(member[0], kind)
+            if digest_of[member] is None:
+                to_read.append(member)
+        
+        with ThreadPoolExecutor(max_workers=self.readers) as executor:
+            digests = list(executor.map(lambda member: self._try_hash(member[0], partial), to_read))
+        for member, digest in zip(to_read, digests):
+            digest_of[member] = digest
+            if digest is not None:
+                self._cache_put(member[0], kind, digest)
         
-        for length1, files1 in files1_by_length.items():
-            for nearby_length in range(max(1, length1 - 2), length1 + 3):
-                if nearby_length not in files2_by_length:
+        split_groups = []
+        for group in groups:
+            by_digest: Dict[str, List[Tuple[Tuple[str, int], str]]] = {}
+            for member in group:
+                digest = digest_of[member]
+                if digest is None:
                     continue
-                    
-                for file1 in files1:
-                    base_name1 = self.get_base_filename(file1)
-                    
-                    for file2 in files2_by_length[nearby_length]:
-                        base_name2 = self.get_base_filename(file2)
-                        similarity, match_details = self.calculate_similarity(base_name1, base_name2)
-                        
-                        if similarity >= self.threshold:
-                            self.potential_duplicates.append(
-                                FilePair(file1, file2, similarity, match_details)
-                            )
+                if digest not in by_digest:
+                    by_digest[digest] = []
+                by_digest[digest].append((member, digest))
+            split_groups.extend(sub_group for sub_group in by_digest.values()
+                                if self._can_pair([member for member, _ in sub_group]))
+        return split_groups
+    
+    def _cache_get(self, file_path: str, kind: str) -> Optional[str]:
+        """Cached value for a file, if a cache is in use and the file is unchanged"""
+        if self.cache is None:
+            return None
+        if file_path not in self._stat_keys:
+            try:
+                self._stat_keys[file_path] = stat_key(file_path)
+            except OSError:
+                return None
+        return self.cache.get(self._stat_keys[file_path], kind)
+    
+    def _cache_put(self, file_path: str, kind: str, value: str) -> None:
+        """Remember a value computed for a file"""
+        if self.cache is not None and file_path in self._stat_keys:
+            self.cache.put(self._stat_keys[file_path], file_path, kind, value)
+    
+    def _try_hash(self, file_path: str, partial: bool) -> Optional[str]:
+        """Hash a file, or return None and warn if it cannot be read"""
+        try:
+            return hash_file_content(file_path, partial)
+        except OSError as e:
+            print(f"Skipping unreadable file: {file_path} ({e})")
+            return None
+    
+    def _index_entries(self, files_by_length: Dict[int, List[str]]) -> List[Tuple[str, str, int, int]]:
+        """Flatten length buckets into (path, base name, bucket rank, position in bucket) entries"""
+        entries = []
+        for length_rank, files in enumerate(files_by_length.values()):
+            for position, file_path in enumerate(files):
+                entries.append((file_path, self.get_base_filename(file_path), length_rank, position))
+        return entries
+    
+    def _pair_order(self, first: Tuple[int, int, int],
+                    second: Tuple[int, int, int]) -> Optional[Tuple[Tuple[int, int, int, int], bool]]:
+        """
+        Return the position at which the exhaustive same-folder scan would first score this pair,
+        and whether it lists the second file first. None if that scan never compares them.
+        Each argument is (name length, length bucket rank, position in bucket).
+        """
+        length1, rank1, position1 = first
+        length2, rank2, position2 = second
+        orders = []
+        if length2 in self._nearby_lengths(length1):
+            orders.append(((rank1, length2, position1, position2), False))
+        if length1 in self._nearby_lengths(length2):
+            orders.append(((rank2, length1, position2, position1), True))
+        return min(orders) if orders else None
     
     def generate_report(self, output_file: Optional[str] = None) -> str:
-        """Generate a detailed report of potential duplicates"""
-        if not self.potential_duplicates:
+        """
+        Generate a detailed report of potential duplicates. Text reports are written to output_file line by
+        line; JSONL/CSV reports are written with ReportWriter, or were already streamed during the search.
+        """
+        if self.report_format != "text":
+            return self._generate_structured_report(output_file)
+        
+        if not self.potential_duplicates and not self.groups:
             report = "No potential duplicates found."
             return report
-            
-        report = ["=== Duplicate File Finder Report ==="]
+        
+        # Save to file if requested
+        if output_file:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                for i, line in enumerate(self._report_lines()):
+                    f.write(line if i == 0 else "\n" + line)
+            print(f"Report saved to {output_file}")
+            return f"Report saved to {output_file}"
+        
+        return "\n".join(self._report_lines())
+    
+    def _report_lines(self) -> Iterator[str]:
+        """Lines of the text report"""
+        yield "=== Duplicate File Finder Report ==="
         if self.cross_folder_mode:
-            report.extend([
+            yield from [
                 f"Directory 1: {self.directory}",
                 f"Directory 2: {self.directory2}",
                 f"Mode: Cross-folder comparison",
@@ -223,50 +1131,103 @@ class DuplicateFinder:
                 f"Recursive: {self.recursive}",
                 f"Case-insensitive: {self.case_insensitive}",
                 f"Total files scanned: {len(self.files)} (folder 1) + {len(self.files2)} (folder 2)",
-                f"Potential duplicates found: {len(self.potential_duplicates)}",
-            ])
+                self._found_line(),
+            ]
         else:
-            report.extend([
+            yield from [
                 f"Directory: {self.directory}",
                 f"Threshold: {self.threshold:.2%}",
                 f"Recursive: {self.recursive}",
                 f"Case-insensitive: {self.case_insensitive}",
                 f"Total files scanned: {len(self.files)}",
-                f"Potential duplicates found: {len(self.potential_duplicates)}",
-            ])
-        report.append("\n=== Potential Duplicates (sorted by similarity) ===")
+                self._found_line(),
+            ]
+        if self.content:
+            yield "Compared by: file content (size, partial hash, full hash)"
+        elif self.images:
+            yield f"Compared by: image {self.image_hash}, max Hamming distance {self.max_distance}"
+        if self.group:
+            yield from self._group_report_lines()
+            return
+        yield "\n=== Potential Duplicates (sorted by similarity) ==="
         
         for i, pair in enumerate(self.potential_duplicates, 1):
-            report.append(f"\n{i}. Similarity: {pair.similarity:.2%}")
-            report.append(f"   File 1: {pair.file1}")
-            report.append(f"   File 2: {pair.file2}")
-            report.append(f"   Match details: {pair.match_details}")
+            yield f"\n{i}. Similarity: {pair.similarity:.2%}"
+            yield f"   File 1: {pair.file1}"
+            yield f"   File 2: {pair.file2}"
+            yield f"   Match details: {pair.match_details}"
             
             # Add file metadata for comparison
-            file1_size = os.path.getsize(pair.file1)
-            file2_size = os.path.getsize(pair.file2)
-            report.append(f"   Size: {file1_size} bytes vs {file2_size} bytes")
+            file1_size = self._file_size(pair.file1)
+            file2_size = self._file_size(pair.file2)
+            yield f"   Size: {file1_size} bytes vs {file2_size} bytes"
             
             # Calculate size difference percentage
             if max(file1_size, file2_size) > 0:  # Avoid division by zero
                 size_diff = abs(file1_size - file2_size) / max(file1_size, file2_size)
-                report.append(f"   Size difference: {size_diff:.2%}")
-        
-        report_text = "\n".join(report)
-        
-        # Save to file if requested
-        if output_file:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(report_text)
-            print(f"Report saved to {output_file}")
-            
-        return report_text
+                yield f"   Size difference: {size_diff:.2%}"
+    
+    def _found_line(self) -> str:
+        if self.group:
+            return f"Duplicate groups found: {len(self.groups)}"
+        return f"Potential duplicates found: {len(self.potential_duplicates)}"
+    
+    def _group_report_lines(self) -> Iterator[str]:
+        """Text report body for --group: one block per group"""
+        yield "\n=== Duplicate Groups (largest first) ==="
+        for i, group in enumerate(self.groups, 1):
+            yield f"\n{i}. Group of {len(group.members)} files " \
+                  f"(best similarity: {max(group.best_similarity.values()):.2%})"
+            for member in group.members:
+                label = "Representative" if member == group.representative else "Member"
+                yield f"   {label}: {member} (best similarity: {group.best_similarity[member]:.2%}, " \
+                      f"{self._file_size(member)} bytes)"
+    
+    def _generate_structured_report(self, output_file: Optional[str]) -> str:
+        """Finish a JSONL/CSV report: close the stream, or write the ranked pairs kept for --limit"""
+        if self._stream is not None:
+            writer, self._stream = self._stream, None
+        elif self.group:
+            writer = ReportWriter(output_file, self.report_format, grouped=True)
+            for group in self.groups:
+                writer.write_group(group, {member: self._file_size(member) for member in group.members})
+        else:
+            writer = ReportWriter(output_file, self.report_format)
+            for pair in self.potential_duplicates:
+                self._write_pair(writer, pair)
+        writer.close()
+        print(f"Report saved to {output_file}")
+        return f"Wrote {writer.count} {'duplicate groups' if self.group else 'potential duplicates'} to {output_file}"
     
     def run(self, output_file: Optional[str] = None) -> str:
         """Run the complete duplicate finding process"""
         self.scan_directory()
-        self.find_duplicates()
-        return self.generate_report(output_file)
+        # Without --limit nothing needs ranking, so JSONL/CSV pairs are written out as soon as they are found
+        if self.report_format != "text" and not self.limit and not self.group:
+            self._stream = ReportWriter(output_file, self.report_format)
+        try:
+            self.find_duplicates()
+            return self.generate_report(output_file)
+        finally:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+
+
+_worker_finder: Optional[DuplicateFinder] = None
+
+
+def _init_worker(finder: DuplicateFinder) -> None:
+    """Give each pool process its own copy of the prepared finder"""
+    global _worker_finder
+    _worker_finder = finder
+
+
+def _score_shard(shard: Tuple[int, int]) -> Tuple[List[Tuple[Tuple[int, int, int, int], FilePair]], int]:
+    """Score one shard of entries in a pool process; returns the hits and the number of pairs scored"""
+    _worker_finder.pairs_scored = 0
+    hits = list(_worker_finder._score_range(*shard))
+    return hits, _worker_finder.pairs_scored
 
 
 def interactive_mode() -> None:
@@ -317,6 +1278,33 @@ def main() -> None:
     parser.add_argument("--report", help="Save report to file")
     parser.add_argument("--interactive", action="store_true", help="Run in interactive mode")
     parser.add_argument("--limit", type=int, help="Limit results to top N potential duplicates")
+    parser.add_argument("--exact", action="store_true",
+                        help="Score every nearby-length pair instead of using the candidate index (slow, same report)")
+    parser.add_argument("--approximate", action="store_true",
+                        help="Index names by a few rare trigrams only: much faster on huge listings, may miss pairs")
+    parser.add_argument("--workers", type=int, default=1, help="Score pairs in N processes (default: 1)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--content", action="store_true",
+                      help="Find files with identical content instead of similar names")
+    mode.add_argument("--images", action="store_true",
+                      help="Find visually similar images by perceptual hash (requires Pillow)")
+    parser.add_argument("--readers", type=int, default=4, help="Threads reading files in --content mode (default: 4)")
+    parser.add_argument("--image-hash", choices=sorted(IMAGE_HASHES), default="dhash",
+                        help="Perceptual hash for --images (default: dhash)")
+    parser.add_argument("--max-distance", type=int, default=8,
+                        help="Max Hamming distance between image hashes (0-64, default: 8)")
+    parser.add_argument("--normalize", action="store_true",
+                        help="Report files with equal normalized names right away and fuzzy-match only the rest")
+    parser.add_argument("--normalize-rules",
+                        help="File of regex rules for --normalize, one per line: pattern [=> replacement]")
+    parser.add_argument("--group", action="store_true",
+                        help="Merge overlapping pairs into groups and report one entry per group (--limit counts groups)")
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="text",
+                        help="Report format (default: text); jsonl and csv are streamed to --report unless --limit is set")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or write the scan cache in --content and --images modes")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="Ignore cached hashes and re-read every file, refreshing the cache")
     
     args = parser.parse_args()
     
@@ -336,16 +1324,41 @@ def main() -> None:
         print(f"Error: '{args.directory2}' is not a valid directory")
         return
     
+    if args.format != "text" and not args.report:
+        parser.error(f"--format {args.format} requires --report")
+    
+    normalize_rules = None
+    if args.normalize_rules:
+        normalize_rules = load_normalize_rules(args.normalize_rules)
+    elif args.normalize:
+        normalize_rules = DEFAULT_NORMALIZE_RULES
+    
     finder = DuplicateFinder(
         args.directory,
         args.threshold,
         args.recursive,
         args.limit,
         args.directory2,
-        args.case_insensitive
+        args.case_insensitive,
+        args.exact,
+        args.workers,
+        args.content,
+        args.readers,
+        args.images,
+        args.image_hash,
+        args.max_distance,
+        report_format=args.format,
+        group=args.group,
+        normalize_rules=normalize_rules,
+        approximate=args.approximate
     )
     
-    report = finder.run(args.report)
+    if (args.content or args.images) and not args.no_cache:
+        with ScanCache(rebuild=args.rebuild_cache) as cache:
+            finder.cache = cache
+            report = finder.run(args.report)
+    else:
+        report = finder.run(args.report)
     
     if not args.report:
         print("\n" + report)
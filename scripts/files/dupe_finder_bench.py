@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Duplicate File Finder Benchmark
+
+tiers: measures how many candidate pairs each tier of DuplicateFinder.score_pair rejects on a synthetic but
+realistic filename corpus (camera exports, screenshots, downloads with "(1)" suffixes, "Copy of" files, music
+tracks, dated documents), and how long scoring takes compared to running ratio() and fuzzysearch on every pair.
+
+scale: runs DuplicateFinder in same-folder and cross-folder mode over deterministic synthetic listings
+(1k, 10k, 100k and 1M names by default) with a controlled duplicate rate and number of edits per duplicate,
+and reports wall time, pairs scored per second, peak RSS and precision/recall against the known duplicates.
+Each case runs in its own process so peak RSS is measured per case.
+
+Usage:
+    python dupe_finder_bench.py tiers [--files 2000] [--threshold 0.6] [--seed 1]
+    python dupe_finder_bench.py scale [--sizes 1000,10000,100000,1000000] [--modes same,cross]
+                                      [--dup-rate 0.1] [--edits 1] [--threshold 0.8] [--workers 1]
+                                      [--exact | --approximate]
+                                      [--timeout 3600] [--seed 1]
+"""
+
+import argparse
+import contextlib
+import difflib
+import io
+import json
+import random
+import string
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fuzzysearch import find_near_matches
+
+from dupe_finder import DuplicateFinder, TIER_NAMES, TIER_RATIO
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is reported as n/a there
+    resource = None
+
+ARTISTS = ["Daft Punk", "Boards of Canada", "Aphex Twin", "Burial", "Massive Attack", "Portishead"]
+WORDS = ["invoice", "report", "budget", "notes", "draft", "summary", "contract", "scan", "resume", "slides"]
+
+
+def realistic_names(count: int, seed: int) -> List[str]:
+    """Deterministic base names resembling a mixed personal archive, including typical near-duplicates"""
+    rng = random.Random(seed)
+    makers = [
+        lambda: f"IMG_{rng.randint(0, 9999):04d}",
+        lambda: f"DSC{rng.randint(0, 99999):05d}",
+        lambda: f"PXL_2023{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}_{rng.randint(0, 235959999):09d}",
+        lambda: f"Screenshot 2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} at "
+                f"{rng.randint(0, 23)}.{rng.randint(0, 59):02d}.{rng.randint(0, 59):02d}",
+        lambda: f"{rng.randint(1, 14):02d} - {rng.choice(ARTISTS)} - Track {rng.randint(1, 99)}",
+        lambda: f"{rng.choice(WORDS)}_{rng.randint(2015, 2024)}_{rng.randint(1, 12):02d}",
+        lambda: f"{rng.choice(WORDS)} {rng.choice(WORDS)} v{rng.randint(1, 9)}",
+    ]
+    variants = [
+        lambda name: name,
+        lambda name: f"{name} (1)",
+        lambda name: f"{name} - Copy",
+        lambda name: f"Copy of {name}",
+        lambda name: f"{name}_final",
+        lambda name: name.lower(),
+    ]
+
+    names = []
+    while len(names) < count:
+        name = rng.choice(makers)()
+        names.append(name)
+        if rng.random() < 0.15:
+            names.append(rng.choice(variants[1:])(name))
+    return names[:count]
+
+
+def legacy_score(str1: str, str2: str) -> float:
+    """Scoring as it was before the tiers: full ratio plus fuzzysearch for every pair"""
+    similarity = difflib.SequenceMatcher(None, str1, str2).ratio()
+    max_l_dist = min(3, max(1, min(len(str1), len(str2)) // 10))
+    find_near_matches(str1.lower(), str2.lower(), max_l_dist=max_l_dist)
+    return similarity
+
+
+def run_tiers(args: argparse.Namespace) -> None:
+    """Pruning rate of each score_pair tier over every nearby-length pair of a realistic corpus"""
+    names = realistic_names(args.files, args.seed)
+    finder = DuplicateFinder(".", args.threshold)
+
+    # Every pair the exhaustive nearby-length scan would score
+    pairs = [(a, b) for i, a in enumerate(names) for b in names[i + 1:] if abs(len(a) - len(b)) <= 2]
+    print(f"Corpus: {len(names)} names, {len(pairs)} nearby-length pairs, threshold {args.threshold:.2f}")
+
+    rejected = [0] * len(TIER_NAMES)
+    hits = 0
+    start = time.perf_counter()
+    for a, b in pairs:
+        similarity, tier = finder.score_pair(a, b)
+        if similarity is None:
+            rejected[tier] += 1
+        elif similarity >= args.threshold:
+            hits += 1
+        else:
+            rejected[TIER_RATIO] += 1
+    tiered_time = time.perf_counter() - start
+
+    remaining = len(pairs)
+    print(f"\n{'Tier':<14}{'Rejected':>12}{'Share':>10}{'Left':>12}")
+    for tier, tier_name in enumerate(TIER_NAMES):
+        remaining -= rejected[tier]
+        share = rejected[tier] / len(pairs) if pairs else 0
+        print(f"{tier_name:<14}{rejected[tier]:>12}{share:>10.1%}{remaining:>12}")
+    print(f"Pairs above threshold: {hits}")
+
+    sample = pairs[:min(len(pairs), 5000)]
+    start = time.perf_counter()
+    for a, b in sample:
+        legacy_score(a, b)
+    legacy_time = (time.perf_counter() - start) * len(pairs) / max(1, len(sample))
+
+    print(f"\nTiered scoring: {tiered_time:.2f}s ({len(pairs) / max(tiered_time, 1e-9):,.0f} pairs/s)")
+    print(f"Ratio + fuzzysearch on every pair (extrapolated from {len(sample)}): {legacy_time:.2f}s")
+
+
+SYLLABLES = ["ka", "ro", "mi", "te", "su", "na", "lo", "vi", "de", "pa", "zu", "ne", "qui", "bar", "fen", "dor"]
+
+
+def mutate(name: str, edits: int, rng: random.Random) -> str:
+    """Apply the given number of random substitutions, insertions and deletions"""
+    chars = list(name)
+    alphabet = string.ascii_lowercase + string.digits
+    for _ in range(edits):
+        operation = rng.choice(("substitute", "insert", "delete") if len(chars) > 1 else ("substitute", "insert"))
+        position = rng.randrange(len(chars))
+        if operation == "substitute":
+            chars[position] = rng.choice([c for c in alphabet if c != chars[position]])
+        elif operation == "insert":
+            chars.insert(position, rng.choice(alphabet))
+        else:
+            del chars[position]
+    return "".join(chars)
+
+
+def synthetic_listing(size: int, dup_rate: float, edits: int, seed: int) -> Tuple[List[str], List[int]]:
+    """
+    Deterministic file paths and the duplicate family of each: a share (1 - dup_rate) of originals, the rest
+    copies of a random original with `edits` character edits. Files of one family are true duplicates.
+    """
+    rng = random.Random(f"{seed}-{size}-{dup_rate}-{edits}")
+    originals = max(1, round(size * (1 - dup_rate)))
+    paths, families = [], []
+    for i in range(size):
+        if i < originals:
+            name = "_".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                            for _ in range(rng.randint(1, 3)))
+            if rng.random() < 0.5:
+                name += f"_{rng.randint(0, 9999)}"
+            family = i
+        else:
+            family = rng.randrange(originals)
+            name = mutate(paths[family].rsplit("/", 1)[1][:-4], edits, rng)
+        paths.append(f"/synthetic/{i % 997}/{i}/{name}.jpg")
+        families.append(family)
+    return paths, families
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process and its finished children, in MiB"""
+    if resource is None:
+        return None
+    usage = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def run_case(args: argparse.Namespace) -> None:
+    """Run one (size, mode) case and print its measurements as JSON"""
+    paths, families = synthetic_listing(args.size, args.dup_rate, args.edits, args.seed)
+    family_of = dict(zip(paths, families))
+
+    finder = DuplicateFinder("/synthetic", args.threshold, exact=args.exact, workers=args.workers,
+                             approximate=args.approximate,
+                             directory2="/synthetic2" if args.mode == "cross" else None)
+    if args.mode == "cross":
+        # Originals on one side, their edited copies on the other
+        finder.files = [path for i, (path, family) in enumerate(zip(paths, families)) if family == i]
+        finder.files2 = [path for i, (path, family) in enumerate(zip(paths, families)) if family != i]
+        expected = len(finder.files2)
+    else:
+        finder.files = paths
+        family_sizes: Dict[int, int] = {}
+        for family in families:
+            family_sizes[family] = family_sizes.get(family, 0) + 1
+        expected = sum(count * (count - 1) // 2 for count in family_sizes.values())
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        finder.find_duplicates()
+    elapsed = time.perf_counter() - start
+
+    reported = len(finder.potential_duplicates)
+    correct = sum(family_of[pair.file1] == family_of[pair.file2] for pair in finder.potential_duplicates)
+    print(json.dumps({
+        "size": args.size,
+        "mode": args.mode,
+        "seconds": elapsed,
+        "pairs_scored": finder.pairs_scored,
+        "peak_rss_mb": peak_rss_mb(),
+        "reported": reported,
+        "precision": correct / reported if reported else 1.0,
+        "recall": correct / expected if expected else 1.0,
+    }))
+
+
+def run_scale(args: argparse.Namespace) -> None:
+    """Run every (size, mode) case in a fresh process and print a table"""
+    scoring = "exact" if args.exact else "approximate" if args.approximate else "indexed"
+    print(f"Duplicate rate {args.dup_rate:.0%}, {args.edits} edit(s) per duplicate, threshold {args.threshold:.2f}, "
+          f"{scoring} scoring, {args.workers} worker(s)\n")
+    print(f"{'Names':>9} {'Mode':<6}{'Time (s)':>10}{'Scored':>14}{'Pairs/s':>12}{'Peak RSS':>11}"
+          f"{'Reported':>10}{'Precision':>11}{'Recall':>8}")
+    for size in (int(size) for size in args.sizes.split(",")):
+        for mode in args.modes.split(","):
+            command = [sys.executable, __file__, "case", "--size", str(size), "--mode", mode,
+                       "--dup-rate", str(args.dup_rate), "--edits", str(args.edits),
+                       "--threshold", str(args.threshold), "--workers", str(args.workers), "--seed", str(args.seed)]
+            if args.exact:
+                command.append("--exact")
+            if args.approximate:
+                command.append("--approximate")
+            try:
+                output = subprocess.run(command, capture_output=True, text=True, timeout=args.timeout, check=True)
+            except subprocess.TimeoutExpired:
+                print(f"{size:>9} {mode:<6}{'timed out after ' + str(args.timeout) + 's':>40}")
+                continue
+            except subprocess.CalledProcessError as e:
+                print(f"{size:>9} {mode:<6} failed: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+                continue
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            rss = f"{result['peak_rss_mb']:.0f} MiB" if result["peak_rss_mb"] is not None else "n/a"
+            rate = result["pairs_scored"] / max(result["seconds"], 1e-9)
+            print(f"{size:>9} {mode:<6}{result['seconds']:>10.2f}{result['pairs_scored']:>14,}{rate:>12,.0f}"
+                  f"{rss:>11}{result['reported']:>10,}{result['precision']:>11.1%}{result['recall']:>8.1%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks for dupe_finder.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    tiers = commands.add_parser("tiers", help="Pruning rate of the tiered similarity filters")
+    tiers.add_argument("--files", type=int, default=2000, help="Number of synthetic file names (default: 2000)")
+    tiers.add_argument("--threshold", type=float, default=0.6, help="Similarity threshold (default: 0.6)")
+    tiers.add_argument("--seed", type=int, default=1, help="Corpus seed (default: 1)")
+
+    for name, help_text in (("scale", "Scaling over synthetic listings of growing size"),
+                            ("case", "Run a single scale case (used internally by scale)")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--dup-rate", type=float, default=0.1, help="Share of names that are duplicates (default: 0.1)")
+        command.add_argument("--edits", type=int, default=1, help="Character edits per duplicate (default: 1)")
+        command.add_argument("--threshold", type=float, default=0.8, help="Similarity threshold (default: 0.8)")
+        command.add_argument("--workers", type=int, default=1, help="DuplicateFinder workers (default: 1)")
+        command.add_argument("--exact", action="store_true", help="Score every nearby-length pair")
+        command.add_argument("--approximate", action="store_true", help="Use the approximate candidate index")
+        command.add_argument("--seed", type=int, default=1, help="Listing seed (default: 1)")
+    scale, case = commands.choices["scale"], commands.choices["case"]
+    scale.add_argument("--sizes", default="1000,10000,100000,1000000", help="Comma-separated listing sizes")
+    scale.add_argument("--modes", default="same,cross", help="Comma-separated modes: same, cross")
+    scale.add_argument("--timeout", type=int, default=3600, help="Seconds allowed per case (default: 3600)")
+    case.add_argument("--size", type=int, required=True)
+    case.add_argument("--mode", choices=("same", "cross"), required=True)
+
+    args = parser.parse_args()
+    {"tiers": run_tiers, "scale": run_scale, "case": run_case}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
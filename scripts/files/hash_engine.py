@@ -0,0 +1,162 @@
+"""
+Hash Engine
+
+File content hashing shared by hashnamer.py and the other file scripts. hashlib releases the GIL while
+digesting large buffers, so a thread pool reads and hashes several files at once and a scan is bound by the
+disk rather than by one CPU core.
+
+Each file is read once, in CHUNK_SIZE blocks into a reused buffer (or through mmap), with
+posix_fadvise(SEQUENTIAL) where the platform has it, and every requested digest is updated from the same
+buffer, so asking for md5 and sha256 together costs one read pass.
+
+A Throttle shared by all workers caps the combined read rate, so long audits can run next to other I/O.
+
+Usage:
+    digests = hash_file(path, ('sha256', 'blake2b'))     # {'sha256': '...', 'blake2b': '...'}
+    for path, digests in ordered_map(lambda p: hash_file(p, ('md5',)), paths, workers=8):
+        ...
+"""
+
+import collections
+import hashlib
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple, TypeVar
+
+# Digest constructors by method name
+HASH_METHODS: Dict[str, Callable[[], "hashlib._Hash"]] = {
+    'md5': hashlib.md5,
+    'sha1': hashlib.sha1,
+    'sha256': hashlib.sha256,
+    'sha512': hashlib.sha512,
+    'blake2b': hashlib.blake2b,
+}
+
+MIN_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+CHUNK_SIZE = 4 * 1024 * 1024  # Default read size, large enough to keep NVMe queues busy
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def parse_methods(value: str) -> Tuple[str, ...]:
+    """Comma-separated method names, validated against HASH_METHODS"""
+    methods = tuple(method.strip().lower() for method in value.split(',') if method.strip())
+    unknown = [method for method in methods if method not in HASH_METHODS]
+    if unknown or not methods:
+        raise ValueError(f"Unknown hash method(s) {', '.join(unknown) or value!r}; "
+                         f"choose from {', '.join(HASH_METHODS)}")
+    return methods
+
+
+class Throttle:
+    """Token bucket limiting the bytes per second read by all threads sharing it"""
+
+    def __init__(self, bytes_per_second: float, burst_seconds: float = 0.5):
+        self.rate = bytes_per_second
+        self.capacity = bytes_per_second * burst_seconds  # Larger reads run into debt and wait it off
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, count: int) -> None:
+        """Account for `count` bytes, sleeping until the rate allows them"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= count
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+def _advise_sequential(fd: int) -> None:
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass  # Advisory only; some filesystems reject it
+
+
+def hash_file(path: str, methods: Sequence[str] = ('md5',), chunk_size: int = CHUNK_SIZE,
+              use_mmap: bool = False, throttle: Optional[Throttle] = None) -> Dict[str, str]:
+    """Hex digests of a file's content for each method, computed in a single read pass"""
+    hashers = [HASH_METHODS[method]() for method in methods]
+    chunk_size = max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, chunk_size))
+
+    with open(path, 'rb', buffering=0) as f:
+        fd = f.fileno()
+        _advise_sequential(fd)
+        size = os.fstat(fd).st_size
+
+        if use_mmap and size > 0:
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mapped, 'madvise'):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, size, chunk_size):
+                        block = view[offset:offset + chunk_size]
+                        if throttle:
+                            throttle.consume(len(block))
+                        for hasher in hashers:
+                            hasher.update(block)
+                        block.release()
+                finally:
+                    view.release()
+        else:
+            buffer = bytearray(chunk_size)
+            view = memoryview(buffer)
+            while True:
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                if throttle:
+                    throttle.consume(read)
+                block = view[:read]
+                for hasher in hashers:
+                    hasher.update(block)
+
+    return {method: hasher.hexdigest() for method, hasher in zip(methods, hashers)}
+
+
+def ordered_map(function: Callable[[T], R], items: Iterable[T], workers: int = DEFAULT_WORKERS,
+                window: int = 0, on_abort: Optional[Callable[[], None]] = None) -> Iterator[Tuple[T, R]]:
+    """
+    Apply `function` to each item on a thread pool and yield (item, result) in input order. At most `window`
+    items (default: 4 per worker) are in flight, so `items` may be a lazy walk over a huge tree. `items` is
+    consumed on the calling thread. An exception raised by `function` is re-raised when its item is reached.
+
+    If the loop ends early (an exception such as KeyboardInterrupt, or the caller closing the generator),
+    queued items are cancelled and on_abort() is called before waiting for the running ones, so long-running
+    functions can be told to stop.
+    """
+    if workers <= 1:
+        for item in items:
+            yield item, function(item)
+        return
+
+    window = window or workers * 4
+    pending = collections.deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for item in items:
+                pending.append((item, executor.submit(function, item)))
+                if len(pending) >= window:
+                    done_item, future = pending.popleft()
+                    yield done_item, future.result()
+            while pending:
+                done_item, future = pending.popleft()
+                yield done_item, future.result()
+        except BaseException:
+            for _, future in pending:
+                future.cancel()
+            if on_abort:
+                on_abort()
+            raise
@@ -5,18 +5,57 @@
 # <directory_path>    : Path to the directory to process.
 # [delete_dupes]      : Optional. Set to 'true' to remove duplicate files (default: false).
 # [extensions]        : Optional. Comma-separated list of file extensions to process (e.g., 'jpg,png,gif'). Processes all files if omitted.
-# [method]            : Optional. Hash method to use: 'md5', 'sha256', or 'sha512' (default: 'md5').
+# [method]            : Optional. Hash method to use: 'md5', 'sha1', 'sha256', 'sha512' or 'blake2b' (default: 'md5').
+#                       Several comma-separated methods (e.g. 'sha256,blake2b') are computed in one read pass;
+#                       files are named after the first and all digests are stored in the scan cache.
 # [global_dupes]      : Optional. Set to 'true' to track duplicates globally across all subdirectories (default: false).
 # [trim_name]         : Optional. Length to trim the hash for the new file name (default: 64).
 #
+# Flags (anywhere on the command line):
+# --no-cache          : Do not use the shared scan cache (see scan_cache.py).
+# --rebuild-cache     : Ignore cached hashes and re-read every file, refreshing the cache.
+# --workers=N         : Threads hashing files in parallel (default: min(8, CPU count)).
+# --chunk-mib=N       : Read size in MiB, 1-8 (default: 4).
+# --mmap              : Hash through mmap instead of buffered reads.
+# --no-rename         : Keep file names; only skip or delete duplicates.
+# --dry-run           : Print what would be renamed or deleted without changing anything.
+# --journal[=PATH]    : Plan then apply: hash everything into an append-only journal first (default location
+#                       under ~/.cache/useful-scripts/journals), then apply renames and deletes in recorded batches.
+#                       Rerunning after an interruption resumes from the journal without re-reading file content.
+# --fresh             : Discard an unfinished journal instead of resuming it.
+#
+# With global_dupes, the tree is grouped by size first: files with a unique size cannot be duplicates, so they are
+# left out of duplicate tracking and, with --no-rename, never read at all.
+# File hashes are cached by (device, inode, size, mtime), so rerunning over an unchanged tree does not re-read it.
+#
+# Verification:
+# python hashnamer.py verify <directory_path> [method] [extensions] [--trim=N] [--workers=N] [--max-mbps=N] [--start=N] [--resume]
+#
+# Re-hashes every hash-named file and reports files whose digest does not start with their name. A file counts as
+# hash-named when its stem is hex and as long as the names rename gives with this method and trim_name (--trim=N,
+# default 64), so names like '2023.txt' or 'cafe.jpg' are left alone.
+# Progress and mismatches are streamed; --max-mbps caps the combined read rate in MiB/s, --start=N skips to a
+# position printed by an earlier run and --resume continues from the position saved by an interrupted run. Exits 1 on mismatches.
+#
 # Example:
 # python hashnamer.py /path/to/directory true jpg,png,gif md5 false 64
+# python hashnamer.py verify /path/to/directory md5 --max-mbps=200 --resume
 
+import collections
+import hashlib
+import json
 import os
 import sys
-import hashlib
 import random
 import string
+import time
+
+from fastwalk import scan_tree, walk_files
+from hash_engine import CHUNK_SIZE, DEFAULT_WORKERS, HASH_METHODS, Throttle, hash_file, ordered_map, parse_methods
+from scan_cache import ScanCache, default_cache_path, stat_key
+
+JOURNAL_BATCH = 1000  # Journal records per fsync, and operations applied per progress record
+PROGRESS_SECONDS = 5  # Interval between verification progress lines
 
 
 def generate_random_string(length):
@@ -26,103 +65,524 @@ def generate_random_string(length):
 
 def generate_file_hash_md5(file_path):
     """Generate MD5 hash from file content."""
-    hasher = hashlib.md5()
-    with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b''):
-            hasher.update(chunk)
-    return hasher.hexdigest()
+    return hash_file(file_path, ('md5',))['md5']
 
 
 def generate_file_hash_sha256(file_path):
     """Generate SHA-256 hash from file content."""
-    hasher = hashlib.sha256()
-    with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b''):
-            hasher.update(chunk)
-    return hasher.hexdigest()
+    return hash_file(file_path, ('sha256',))['sha256']
 
 
 def generate_file_hash_sha512(file_path):
     """Generate SHA-512 hash from file content."""
-    hasher = hashlib.sha512()
-    with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b''):
-            hasher.update(chunk)
-    return hasher.hexdigest()
+    return hash_file(file_path, ('sha512',))['sha512']
 
 
-def rename_files(directory, delete_dupes=False, extensions=None, method="md5", global_dupes=False, trim_name=64):
-    """Recursively rename files in a directory using hash-based names."""
-    if extensions is None:
-        extensions = []
+def hashed_files(directory, extensions, methods, global_dupes=False, rename=True, cache=None,
+                 workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE, use_mmap=False, known=None):
+    """
+    Yield (root, file_name, file_path, file_key, digests, may_be_dupe) for every file in os.walk order.
+    digests is None for skipped extensions and empty for unique-size files that need no hash; otherwise it
+    maps each method to its hex digest. Digests come from `known` ({(path, key): digests}), then the cache,
+    and are only computed when both miss, on `workers` threads in one read pass per file.
 
-    renamed_count = 0
-    dupe_count = 0
-    removed_dupes = 0
-    skipped_dupes = 0
-    skipped_files = 0
-    hash_to_file = {}
+    With `global_dupes` the tree is first listed and grouped by size: a file whose size no other file has
+    cannot be a duplicate, so it is left out of duplicate tracking and only hashed when it is renamed.
+    """
+    known = known or {}
 
-    for root, _, files in os.walk(directory):
-        if not global_dupes:
-            hash_to_file = {}  # Reset hash tracking for each directory
+    def walk():
+        """(root, file_name, file_path, stat result) in os.walk order; stat is None for skipped extensions"""
+        for root, _, files in scan_tree(directory, workers=None):
+            for entry in files:
+                file_ext = os.path.splitext(entry.name)[1].lower().lstrip('.')  # Remove leading dot
+                if file_ext not in extensions:
+                    yield root, entry.name, entry.path, None
+                else:
+                    yield root, entry.name, entry.path, entry.stat()
 
-        for file_name in files:
-            file_path = os.path.join(root, file_name)
-            file_ext = os.path.splitext(file_name)[1].lower().lstrip('.')  # Remove leading dot
-            if file_ext not in extensions:
-                print(f"Skipping file with unsupported extension: '{file_path}'")
-                skipped_files += 1
+    entries = walk()
+    size_counts = None
+    if global_dupes:
+        # Phase 1: list the whole tree and count files per size
+        entries = list(entries)
+        size_counts = collections.Counter(st.st_size for _, _, _, st in entries if st is not None)
+
+    def lookup(entries):
+        """Attach cache key, known digests and whether the file can have a duplicate; cache reads stay on this thread"""
+        for root, file_name, file_path, st in entries:
+            if st is None:
+                yield root, file_name, file_path, None, None, False
                 continue
+            file_key = stat_key(file_path, st)
+            may_be_dupe = size_counts is None or size_counts[st.st_size] > 1
+            cached = dict(known.get((file_path, file_key), {}))
+            if cache and (rename or may_be_dupe):
+                for m in methods:
+                    if cached.get(m) is None:
+                        cached[m] = cache.get(file_key, m)
+            yield root, file_name, file_path, file_key, cached, may_be_dupe
 
-            # Generate the hash for the file content
-            if method == "md5":
-                file_hash = generate_file_hash_md5(file_path)
-            elif method == "sha256":
-                file_hash = generate_file_hash_sha256(file_path)
-            elif method == "sha512":
-                file_hash = generate_file_hash_sha512(file_path)
-            else:
-                print(f"Unknown method '{method}'")
-                return
+    def digest(entry):
+        """Hash the methods the cache did not have, in one pass; runs on a worker thread"""
+        _, _, file_path, file_key, cached, may_be_dupe = entry
+        if file_key is None or not (rename or may_be_dupe):
+            return None
+        missing = [m for m in methods if cached.get(m) is None]
+        return hash_file(file_path, missing, chunk_size, use_mmap) if missing else {}
 
-            if file_hash in hash_to_file:
-                if delete_dupes:
-                    os.remove(file_path)
-                    removed_dupes += 1
-                    dupe_count += 1
-                    print(f"Deleted duplicate file: '{file_path}'")
-                else:
-                    dupe_count += 1
-                    skipped_dupes += 1
-                    print(f"Skipping duplicate file: '{file_path}'")
+    for entry, computed in ordered_map(digest, lookup(entries), workers):
+        root, file_name, file_path, file_key, cached, may_be_dupe = entry
+        if file_key is None:
+            yield root, file_name, file_path, None, None, False
+            continue
+        if computed is None:
+            yield root, file_name, file_path, file_key, {}, may_be_dupe
+            continue
+        if cache:
+            for m, value in computed.items():
+                cache.put(file_key, file_path, m, value)
+        digests = {m: computed.get(m) or cached[m] for m in methods}
+        yield root, file_name, file_path, file_key, digests, may_be_dupe
+
+
+def plan_operations(hashed, name_method, delete_dupes=False, global_dupes=False, trim_name=64, rename=True):
+    """
+    Decide what happens to each hashed file, in walk order. Yields one operation per file:
+    {'op': 'unsupported' | 'delete' | 'duplicate' | 'rename' | 'keep', 'src', 'dst', 'key', 'unique'}.
+    The first file with a given hash is kept (and renamed); later ones are duplicates.
+    """
+    hash_to_file = {}
+    current_root = None
+    for root, file_name, file_path, file_key, digests, may_be_dupe in hashed:
+        if not global_dupes and root != current_root:
+            hash_to_file = {}  # Reset hash tracking for each directory
+        current_root = root
+
+        operation = {'op': 'keep', 'src': file_path, 'dst': None, 'key': file_key, 'unique': not may_be_dupe}
+        if digests is None:
+            operation['op'] = 'unsupported'
+            operation['unique'] = False
+        elif digests:
+            file_hash = digests[name_method]
+            if may_be_dupe and file_hash in hash_to_file:
+                operation['op'] = 'delete' if delete_dupes else 'duplicate'
             else:
-                hash_to_file[file_hash] = file_path
-                new_file_name = file_hash[:trim_name]  # Trim hash for file name
-                new_file_name_with_ext = new_file_name + os.path.splitext(file_name)[1]  # Keep original extension
-                new_file_path = os.path.join(root, new_file_name_with_ext)
-                os.rename(file_path, new_file_path)
-                renamed_count += 1
-                print(f"Renamed '{file_path}' to '{new_file_path}'")
+                if may_be_dupe:
+                    hash_to_file[file_hash] = file_path
+                if rename:
+                    new_file_name = file_hash[:trim_name]  # Trim hash for file name
+                    new_file_name_with_ext = new_file_name + os.path.splitext(file_name)[1]  # Keep original extension
+                    operation['op'] = 'rename'
+                    operation['dst'] = os.path.join(root, new_file_name_with_ext)
+        yield operation
+
+
+def apply_operation(operation, stats, cache=None, dry_run=False, resumed=False):
+    """
+    Carry out one planned operation and count it in `stats`. With dry_run nothing is changed. With resumed,
+    an operation whose source is already gone is taken as applied before an interruption.
+    """
+    kind, file_path, new_file_path = operation['op'], operation['src'], operation['dst']
+    if operation['unique']:
+        stats['unique_sizes'] += 1
 
+    if kind == 'unsupported':
+        print(f"Skipping file with unsupported extension: '{file_path}'")
+        stats['skipped_files'] += 1
+    elif kind == 'duplicate':
+        print(f"Skipping duplicate file: '{file_path}'")
+        stats['dupes'] += 1
+        stats['skipped_dupes'] += 1
+    elif kind == 'delete':
+        if dry_run:
+            print(f"Would delete duplicate file: '{file_path}'")
+        elif resumed and not os.path.lexists(file_path):
+            print(f"Already deleted duplicate file: '{file_path}'")
+        else:
+            os.remove(file_path)
+            if cache and operation['key']:
+                cache.forget(tuple(operation['key']))
+            print(f"Deleted duplicate file: '{file_path}'")
+        stats['dupes'] += 1
+        stats['removed_dupes'] += 1
+    elif kind == 'rename':
+        if dry_run:
+            print(f"Would rename '{file_path}' to '{new_file_path}'")
+        elif resumed and not os.path.lexists(file_path) and os.path.lexists(new_file_path):
+            print(f"Already renamed '{file_path}' to '{new_file_path}'")
+        else:
+            os.rename(file_path, new_file_path)
+            if cache and operation['key']:
+                cache.moved(tuple(operation['key']), new_file_path)
+            print(f"Renamed '{file_path}' to '{new_file_path}'")
+        stats['renamed'] += 1
+
+
+def print_statistics(stats, global_dupes=False):
     print("\n--- Statistics ---")
-    print(f"Total files renamed: {renamed_count}")
-    print(f"Total files skipped: {skipped_files}")
-    print(f"Total duplicate files removed: {removed_dupes}")
-    print(f"Total duplicate files skipped: {skipped_dupes}")
+    print(f"Total files renamed: {stats['renamed']}")
+    print(f"Total files skipped: {stats['skipped_files']}")
+    print(f"Total duplicate files removed: {stats['removed_dupes']}")
+    print(f"Total duplicate files skipped: {stats['skipped_dupes']}")
+    if global_dupes:
+        print(f"Files with a unique size (no duplicate check): {stats['unique_sizes']}")
+
+
+def rename_files(directory, delete_dupes=False, extensions=None, method="md5", global_dupes=False, trim_name=64,
+                 cache=None, workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE, use_mmap=False, rename=True,
+                 dry_run=False):
+    """
+    Recursively rename files in a directory using hash-based names. Hashes are looked up in `cache` first.
+
+    `method` may list several comma-separated methods (e.g. 'sha256,blake2b'): files are named after the
+    first, and all of them are computed in the same read pass and stored in the cache. Files are hashed on
+    `workers` threads while results are applied in walk order.
+
+    With rename=False files keep their names and only duplicates are reported or deleted. With dry_run the
+    plan is printed and nothing is changed.
+    """
+    if extensions is None:
+        extensions = []
+    try:
+        methods = parse_methods(method)
+    except ValueError as e:
+        print(e)
+        return
+
+    stats = collections.Counter()
+    hashed = hashed_files(directory, extensions, methods, global_dupes, rename, cache, workers, chunk_size, use_mmap)
+    for operation in plan_operations(hashed, methods[0], delete_dupes, global_dupes, trim_name, rename):
+        apply_operation(operation, stats, cache, dry_run)
+    print_statistics(stats, global_dupes)
+
+
+def default_journal_path(directory):
+    """Journal location for a directory, next to the scan cache"""
+    digest = hashlib.sha1(os.path.abspath(directory).encode()).hexdigest()[:16]
+    return os.path.join(os.path.dirname(default_cache_path()), 'journals', f"hashnamer-{digest}.jsonl")
+
+
+class RenameJournal:
+    """
+    Append-only JSON-lines journal of one plan-then-apply run. Records, in order:
+        {"type": "header", "directory", "methods", "options"}
+        {"type": "hash", "path", "key", "digests"}          one per file hashed while planning
+        {"type": "op", "seq", ...operation}                 the whole plan, once hashing is complete
+        {"type": "planned", "count"}
+        {"type": "applied", "upto"}                         after each applied batch
+        {"type": "complete"}
+    Writes are fsync'ed per batch, so after a crash at most one batch of hashes is re-read and at most one
+    batch of operations is re-checked.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = []
+        self._valid_bytes = 0  # Length of the journal up to its last complete record
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        self.records.append(json.loads(line))
+                    except ValueError:
+                        break  # Torn last line from an interrupted write
+                    self._valid_bytes += len(line)
+        self._file = None
+
+    @property
+    def header(self):
+        return self.records[0] if self.records and self.records[0].get('type') == 'header' else None
+
+    def of_type(self, record_type):
+        return [record for record in self.records if record.get('type') == record_type]
+
+    def start(self, header):
+        """Discard any previous content and begin a new journal"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self.records = []
+        self.append(header)
+        self.sync()
+
+    def resume(self, header=None):
+        """
+        Keep appending to the existing journal, after dropping a torn last line. A header that differs from the
+        journaled one (other options for a plan not made yet) replaces it, keeping the hashes recorded so far.
+        """
+        if header is not None and header != self.header:
+            self.records = [header] + self.records[1:]
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for record in self.records:
+                    f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        else:
+            os.truncate(self.path, self._valid_bytes)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def append(self, record):
+        self.records.append(record)
+        self._file.write(json.dumps(record) + '\n')
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+def rename_files_journaled(directory, delete_dupes=False, extensions=None, method="md5", global_dupes=False,
+                           trim_name=64, cache=None, workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE, use_mmap=False,
+                           rename=True, dry_run=False, journal_path=None, fresh=False):
+    """
+    Plan-then-apply variant of rename_files. All hashes are computed into the journal first, the tree is only
+    changed once the complete plan is journaled, and applied operations are recorded per batch. A rerun with
+    the same options resumes from the journal without re-reading file content: an interrupted plan only
+    hashes files the journal does not have yet, an interrupted apply continues after the last batch.
+    With dry_run the plan is printed and the tree is left untouched.
+    """
+    if extensions is None:
+        extensions = []
+    try:
+        methods = parse_methods(method)
+    except ValueError as e:
+        print(e)
+        return
+    journal_path = journal_path or default_journal_path(directory)
+    header = {
+        'type': 'header',
+        'directory': os.path.abspath(directory),
+        'methods': list(methods),
+        'options': {'delete_dupes': delete_dupes, 'extensions': extensions, 'global_dupes': global_dupes,
+                    'trim_name': trim_name, 'rename': rename},
+    }
+
+    journal = RenameJournal(journal_path)
+    previous = journal.header
+    same_tree = previous and not fresh and not journal.of_type('complete') and \
+        previous['directory'] == header['directory'] and previous['methods'] == header['methods']
+    if same_tree and journal.of_type('planned') and previous['options'] != header['options']:
+        print(f"Journal '{journal_path}' holds an unfinished plan made with different options: "
+              f"{previous['options']}. Rerun with those options to finish it, or pass --fresh to discard it.")
+        return
+    resuming_plan = bool(same_tree and journal.of_type('planned'))
+    if same_tree:
+        # Hashes do not depend on the options, so a journal without a plan yet takes on the new ones
+        journal.resume(header)
+        print(f"Resuming from journal '{journal_path}'")
+    else:
+        journal.start(header)
+        print(f"Writing journal '{journal_path}'")
+
+    stats = collections.Counter()
+    try:
+        if journal.of_type('planned'):
+            operations = sorted(journal.of_type('op'), key=lambda record: record['seq'])
+            if dry_run:
+                for operation in operations:
+                    apply_operation(operation, stats, dry_run=True)
+                print_statistics(stats, global_dupes)
+                return
+        else:
+            known = {(record['path'], tuple(record['key'])): record['digests'] for record in journal.of_type('hash')}
+            if known:
+                print(f"{len(known)} file hash(es) recovered from the journal")
+
+            def journaled(hashed):
+                written = 0
+                for entry in hashed:
+                    file_path, file_key, digests = entry[2], entry[3], entry[4]
+                    if digests and (file_path, file_key) not in known:
+                        journal.append({'type': 'hash', 'path': file_path, 'key': list(file_key), 'digests': digests})
+                        written += 1
+                        if written % JOURNAL_BATCH == 0:
+                            journal.sync()
+                    yield entry
+                journal.sync()
+
+            hashed = hashed_files(directory, extensions, methods, global_dupes, rename, cache, workers, chunk_size,
+                                  use_mmap, known)
+            operations = []
+            for seq, operation in enumerate(plan_operations(journaled(hashed), methods[0], delete_dupes,
+                                                            global_dupes, trim_name, rename)):
+                operation['key'] = list(operation['key']) if operation['key'] else None
+                operations.append(dict(operation, type='op', seq=seq))
+
+            if dry_run:
+                for operation in operations:
+                    apply_operation(operation, stats, dry_run=True)
+                print_statistics(stats, global_dupes)
+                return
+            for operation in operations:
+                journal.append(operation)
+            journal.append({'type': 'planned', 'count': len(operations)})
+            journal.sync()
+
+        applied = max((record['upto'] for record in journal.of_type('applied')), default=0)
+        if applied:
+            print(f"Skipping {applied} operation(s) applied before the interruption")
+        for batch_start in range(applied, len(operations), JOURNAL_BATCH):
+            batch_end = min(batch_start + JOURNAL_BATCH, len(operations))
+            for operation in operations[batch_start:batch_end]:
+                # Operations of the batch that was running when the last run stopped may already be done, even
+                # when that was the first batch and no 'applied' record was written yet
+                apply_operation(operation, stats, cache, resumed=resuming_plan and batch_start == applied)
+            journal.append({'type': 'applied', 'upto': batch_end})
+            journal.sync()
+        journal.append({'type': 'complete'})
+    finally:
+        journal.close()
+    print_statistics(stats, global_dupes)
+
+
+def verify_files(directory, method="md5", extensions=None, workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE,
+                 use_mmap=False, max_mbps=None, start=0, progress_path=None, trim_name=64):
+    """
+    Re-hash hash-named files and check each digest starts with the file's name: the hex stem left by
+    rename_files with this method and trim_name, so only stems of that length count. max_mbps caps the
+    combined read rate in MiB/s. Files are taken in sorted walk order so `start` (a position reported by
+    an earlier run, or read from `progress_path`) skips what was already verified. Mismatches and progress
+    are printed as they are found. Returns the number of mismatched and unreadable files.
+    """
+    methods = parse_methods(method)[:1]
+    name_length = min(trim_name, len(HASH_METHODS[methods[0]]().hexdigest()))
+    throttle = Throttle(max_mbps * 1024 * 1024) if max_mbps else None
+    if progress_path and not start and os.path.exists(progress_path):
+        with open(progress_path, encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('directory') == os.path.abspath(directory) and saved.get('method') == methods[0]:
+            start = saved['position']
+            print(f"Resuming verification at position {start}")
+
+    def hash_named():
+        """(position, file_path, expected prefix) for every hash-named file, in a stable order"""
+        position = 0
+        sort_by_name = lambda entry: entry.name  # noqa: E731
+        for entry in walk_files(directory, extensions=extensions, sort_key=sort_by_name, workers=None):
+            stem = os.path.splitext(entry.name)[0]
+            if len(stem) != name_length or any(c not in string.hexdigits for c in stem):
+                continue
+            position += 1
+            if position > start:
+                yield position, entry.path, stem.lower()
+
+    def check(entry):
+        _, file_path, _ = entry
+        try:
+            return os.path.getsize(file_path), hash_file(file_path, methods, chunk_size, use_mmap, throttle)[methods[0]]
+        except OSError as e:
+            return 0, e
+
+    def save_progress(position):
+        if progress_path:
+            os.makedirs(os.path.dirname(os.path.abspath(progress_path)), exist_ok=True)
+            with open(progress_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'directory': os.path.abspath(directory), 'method': methods[0], 'position': position}, f)
+            os.replace(progress_path + '.tmp', progress_path)
+
+    stats = collections.Counter()
+    position = start
+    started = last_report = time.monotonic()
+    for (position, file_path, expected), (size, digest) in ordered_map(check, hash_named(), workers):
+        stats['bytes'] += size
+        if isinstance(digest, OSError):
+            stats['unreadable'] += 1
+            print(f"UNREADABLE {file_path}: {digest}")
+        elif len(expected) > len(digest) or not digest.startswith(expected):
+            stats['mismatched'] += 1
+            print(f"MISMATCH {file_path}: {methods[0]} is {digest}")
+        else:
+            stats['ok'] += 1
+
+        now = time.monotonic()
+        if now - last_report >= PROGRESS_SECONDS:
+            rate = stats['bytes'] / (1024 * 1024) / (now - started)
+            print(f"... position {position}: {stats['ok']} ok, {stats['mismatched']} mismatched, "
+                  f"{stats['bytes'] / (1024 ** 3):.2f} GiB at {rate:.1f} MiB/s", file=sys.stderr)
+            save_progress(position)
+            last_report = now
+
+    if progress_path and os.path.exists(progress_path):
+        os.remove(progress_path)  # Finished; the next --resume starts over
+    elapsed = max(time.monotonic() - started, 1e-9)
+    print("\n--- Verification ---")
+    print(f"Files verified: {stats['ok'] + stats['mismatched']} (from position {start} to {position})")
+    print(f"Mismatched: {stats['mismatched']}")
+    print(f"Unreadable: {stats['unreadable']}")
+    print(f"Read: {stats['bytes'] / (1024 ** 3):.2f} GiB at {stats['bytes'] / (1024 * 1024) / elapsed:.1f} MiB/s")
+    return stats['mismatched'] + stats['unreadable']
+
+
+def verify_main(argv, flags):
+    if len(argv) < 3:
+        print("Usage: python hashnamer.py verify <directory_path> [method] [extensions] [--trim=N] [--workers=N] "
+              "[--chunk-mib=N] [--mmap] [--max-mbps=MIB_PER_SECOND] [--start=N] [--resume]")
+        sys.exit(1)
+    directory = argv[2]
+    method = argv[3].lower() if len(argv) >= 4 else "md5"
+    extensions = argv[4].lower().split(',') if len(argv) >= 5 else []
+    if not os.path.isdir(directory):
+        print(f"Error: '{directory}' is not a valid directory.")
+        sys.exit(1)
+    try:
+        parse_methods(method)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    max_mbps = flag_value(flags, '--max-mbps', None)
+    progress_path = default_journal_path(directory)[:-len('.jsonl')] + '-verify.json'
+    failures = verify_files(
+        directory, method, extensions,
+        workers=int(flag_value(flags, '--workers', DEFAULT_WORKERS)),
+        chunk_size=int(flag_value(flags, '--chunk-mib', CHUNK_SIZE // (1024 * 1024))) * 1024 * 1024,
+        use_mmap='--mmap' in flags,
+        max_mbps=float(max_mbps) if max_mbps else None,
+        start=int(flag_value(flags, '--start', 0)),
+        progress_path=progress_path if '--resume' in flags else None,
+        trim_name=int(flag_value(flags, '--trim', 64)),
+    )
+    sys.exit(1 if failures else 0)
+
+
+def flag_value(flags, name, default):
+    """Value of a --name=value flag, or the default"""
+    for flag in flags:
+        if flag.startswith(name + '='):
+            return flag.split('=', 1)[1]
+    return default
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python hashnamer.py <directory_path> [delete_dupes] [extensions] [method] [global_dupes] [trim_name]")
+    flags = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+    argv = [sys.argv[0]] + [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(argv) >= 2 and argv[1] == 'verify':
+        verify_main(argv, flags)
+        return
+    if len(argv) < 2:
+        print("Usage: python hashnamer.py <directory_path> [delete_dupes] [extensions] [method] [global_dupes] [trim_name] [--no-cache] [--rebuild-cache] [--workers=N] [--chunk-mib=N] [--mmap] [--no-rename] [--dry-run] [--journal[=PATH]] [--fresh]")
         sys.exit(1)
 
-    directory = sys.argv[1]
-    delete_dupes = sys.argv[2].lower() == 'true' if len(sys.argv) >= 3 else False
-    extensions = sys.argv[3].lower().split(',') if len(sys.argv) >= 4 else []
-    method = sys.argv[4].lower() if len(sys.argv) >= 5 else "md5"
-    global_dupes = sys.argv[5].lower() == 'true' if len(sys.argv) >= 6 else False
-    trim_name = int(sys.argv[6]) if len(sys.argv) >= 7 else 64
+    directory = argv[1]
+    delete_dupes = argv[2].lower() == 'true' if len(argv) >= 3 else False
+    extensions = argv[3].lower().split(',') if len(argv) >= 4 else []
+    method = argv[4].lower() if len(argv) >= 5 else "md5"
+    global_dupes = argv[5].lower() == 'true' if len(argv) >= 6 else False
+    trim_name = int(argv[6]) if len(argv) >= 7 else 64
+    use_cache = '--no-cache' not in flags
+    rebuild_cache = '--rebuild-cache' in flags
+    workers = int(flag_value(flags, '--workers', DEFAULT_WORKERS))
+    chunk_size = int(flag_value(flags, '--chunk-mib', CHUNK_SIZE // (1024 * 1024))) * 1024 * 1024
+    use_mmap = '--mmap' in flags
+    rename = '--no-rename' not in flags
+    dry_run = '--dry-run' in flags
 
     if not os.path.isdir(directory):
         print(f"Error: '{directory}' is not a valid directory.")
@@ -135,10 +595,26 @@ Global duplicates: {global_dupes}
 Extensions: {extensions}
 Hash method: {method}
 Trim name length: {trim_name}
+Cache: {'rebuild' if rebuild_cache else use_cache}
+Rename: {rename}
+Dry run: {dry_run}
+Hashing: {workers} thread(s), {chunk_size // (1024 * 1024)} MiB {'mmap' if use_mmap else 'reads'}
 """)
 
-    rename_files(directory, delete_dupes, extensions, method, global_dupes, trim_name)
+    journal = '--journal' in flags or any(flag.startswith('--journal=') for flag in flags)
+    options = dict(cache=None, workers=workers, chunk_size=chunk_size, use_mmap=use_mmap, rename=rename,
+                   dry_run=dry_run)
+    run = rename_files
+    if journal:
+        run = rename_files_journaled
+        options.update(journal_path=flag_value(flags, '--journal', None), fresh='--fresh' in flags)
 
+    if use_cache:
+        with ScanCache(rebuild=rebuild_cache) as cache:
+            options['cache'] = cache
+            run(directory, delete_dupes, extensions, method, global_dupes, trim_name, **options)
+    else:
+        run(directory, delete_dupes, extensions, method, global_dupes, trim_name, **options)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,29 +1,34 @@
 import os
 import sys
 
+from rename_planner import execute_plan, plan_renames, rename_flags, report_plan
+
 def crop_filename(name, max_len):
     name_only, ext = os.path.splitext(name)
     cropped_name = name_only[:max_len]
     return cropped_name + ext
 
-def crop_filenames_in_folder(folder_path, max_len=16):
+def crop_filenames_in_folder(folder_path, max_len=16, dry_run=False, undo_log=None):
     if not os.path.isdir(folder_path):
         print(f"Error: Folder not found - {folder_path}")
         return
 
+    renames = {}
     for filename in os.listdir(folder_path):
         old_path = os.path.join(folder_path, filename)
         if os.path.isfile(old_path):
-            new_name = crop_filename(filename, max_len)
-            new_path = os.path.join(folder_path, new_name)
-            if old_path != new_path:
-                print(f"Renaming: {filename} -> {new_name}")
-                os.rename(old_path, new_path)
+            renames[old_path] = os.path.join(folder_path, crop_filename(filename, max_len))
+
+    # Names sharing their first max_len characters would crop to the same name; those are reported, not overwritten
+    plan = plan_renames(renames)
+    execute_plan(plan, dry_run, undo_log)
+    report_plan(plan, dry_run, folder_path)
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python crop_filenames.py <folder_path> [max_length]")
+    args, dry_run, undo_log = rename_flags(sys.argv[1:])
+    if len(args) < 1:
+        print("Usage: python crop_filenames.py <folder_path> [max_length] [--dry-run] [--undo-log=PATH]")
     else:
-        folder = sys.argv[1]
-        max_length = int(sys.argv[2]) if len(sys.argv) >= 3 else 16
-        crop_filenames_in_folder(folder, max_length)
\ No newline at end of file
+        folder = args[0]
+        max_length = int(args[1]) if len(args) >= 2 else 16
+        crop_filenames_in_folder(folder, max_length, dry_run, undo_log)
\ No newline at end of file
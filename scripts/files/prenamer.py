@@ -1,7 +1,9 @@
 import os
 import sys
 
-def prepend_prefix_to_files(folder_path, prefix):
+from rename_planner import execute_plan, plan_renames, rename_flags, report_plan
+
+def prepend_prefix_to_files(folder_path, prefix, dry_run=False, undo_log=None):
     try:
         # Check if the provided path is a directory
         if not os.path.isdir(folder_path):
@@ -11,26 +13,26 @@ def prepend_prefix_to_files(folder_path, prefix):
         # Get a list of all files in the directory
         files = os.listdir(folder_path)
         
-        for file_name in files:
-            # Create the new file name with the prefix
-            new_file_name = prefix + file_name
-            
-            # Get the full paths for the old and new file names
-            old_file_path = os.path.join(folder_path, file_name)
-            new_file_path = os.path.join(folder_path, new_file_name)
-            
-            # Rename the file
-            os.rename(old_file_path, new_file_path)
-            print(f"Renamed '{file_name}' to '{new_file_name}'")
+        # Map each file to its new name with the prefix; the planner orders the renames so that
+        # a file whose new name is another file's current name (e.g. 'x' -> 'px', 'px' -> 'ppx') waits for it
+        renames = {os.path.join(folder_path, file_name): os.path.join(folder_path, prefix + file_name)
+                   for file_name in files}
+        plan = plan_renames(renames)
+        execute_plan(plan, dry_run, undo_log)
+        report_plan(plan, dry_run, folder_path)
         
-        print("All files have been successfully renamed.")
+        if plan.conflicts:
+            print(f"{len(plan.conflicts)} file(s) were not renamed because their new name is taken.")
+        elif not dry_run:
+            print("All files have been successfully renamed.")
     except Exception as e:
         print(f"An error occurred: {e}")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python script.py <folder_path> <prefix>")
+    args, dry_run, undo_log = rename_flags(sys.argv[1:])
+    if len(args) != 2:
+        print("Usage: python script.py <folder_path> <prefix> [--dry-run] [--undo-log=PATH]")
     else:
-        folder_path = sys.argv[1]
-        prefix = sys.argv[2]
-        prepend_prefix_to_files(folder_path, prefix)
\ No newline at end of file
+        folder_path = args[0]
+        prefix = args[1]
+        prepend_prefix_to_files(folder_path, prefix, dry_run, undo_log)
@@ -2,42 +2,151 @@
 
 # python remove_by_extension.py --dir "/path/to/directory" --ext "txt" --recursive
 # Replace remove_by_extension.py with the name of your script, "/path/to/directory" with the path of your directory, "txt" with your file extension. Use --recursive flag if you want to delete files recursively.
+#
+# More options:
+# --ext "tmp,bak" --ext log      Several extensions, comma-separated and/or repeated; multi-part ones like tar.gz work too
+# --pattern "~$*" --pattern "*.part"  Shell-style name patterns, matched in addition to the extensions
+# --min-age 7d                   Only files last modified at least this long ago (s, m, h, d or w; plain numbers are days)
+# --dry-run                      Only list and count what would be deleted
+# --threads 4                    Threads unlinking files; more help on NFS/SMB shares
+#
+# Files are deleted while the directory is still being walked, in small batches spread over the threads, so
+# purging hundreds of thousands of files never holds the full list of paths in memory.
 
 # Caution: As before, please be careful as this script deletes files permanently. Always ensure that you have a backup of your files before running this script.
 
 
 import os
-import glob
+import re
+import time
 import argparse
+import fnmatch
 
+from fastwalk import has_extension, walk_files
+from hash_engine import ordered_map
 
-def delete_files(folder_path, extension, recursive):
-    if recursive:
-        files = glob.glob(f"{folder_path}/**/*.{extension}", recursive=True)
-    else:
-        files = glob.glob(f"{folder_path}/*.{extension}")
+DELETE_BATCH = 256  # Paths per unlink task
+AGE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
 
-    for file in files:
+
+def parse_age(text):
+    """Seconds from '90s', '30m', '12h', '7d', '2w' or a plain number of days"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*', text.lower())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid age '{text}', use e.g. 90s, 30m, 12h, 7d or 2w")
+    return float(match.group(1)) * AGE_UNITS[match.group(2) or 'd']
+
+
+def parse_extensions(values):
+    """{'.tmp', '.bak'} from --ext values such as 'tmp,.BAK'; blanks and lone dots are dropped"""
+    return {'.' + ext.strip().lower().lstrip('.')
+            for value in ([values] if isinstance(values, str) else values or [])
+            for ext in value.split(',') if ext.strip().lstrip('.')}
+
+
+def matching_files(folder_path, extensions, patterns, recursive, min_age=None):
+    """Stream (path, size) of the files to delete, straight from the walk"""
+    # walk_files() reads an empty extension set as "every file"; on a deletion path that must never happen
+    if not extensions and not patterns:
+        raise ValueError('no extensions or patterns to match')
+    # Extensions are filtered while listing unless name patterns need to see every file
+    compiled = re.compile('|'.join(fnmatch.translate(pattern) for pattern in patterns)) if patterns else None
+    listed = None if compiled else extensions
+    cutoff = time.time() - min_age if min_age else None
+
+    # Hidden files and folders are left alone, as glob did
+    for entry in walk_files(folder_path, extensions=listed, recursive=recursive, skip_hidden=True, workers=None):
+        if compiled:
+            ext_match = has_extension(entry.name, extensions)
+            if not ext_match and not compiled.match(entry.name):
+                continue
         try:
-            os.remove(file)
-            print(f"File {file} has been deleted")
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        if cutoff is not None and st.st_mtime > cutoff:
+            continue
+        yield entry.path, st.st_size
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def unlink_batch(batch):
+    """Delete a batch of (path, size); returns (path, size, error or None) for each"""
+    results = []
+    for path, size in batch:
+        try:
+            os.remove(path)
+            results.append((path, size, None))
         except OSError as e:
-            print(f"Error: {e.filename} - {e.strerror}.")
+            results.append((path, size, e))
+    return results
+
+
+def delete_files(folder_path, extension, recursive, patterns=None, dry_run=False, min_age=None, threads=4):
+    extensions = parse_extensions(extension)
+    patterns = patterns or []
+    files = matching_files(folder_path, extensions, patterns, recursive, min_age)
+
+    deleted = failed = 0
+    freed = 0
+    if dry_run:
+        for file, size in files:
+            print(f"Would delete {file}")
+            deleted += 1
+            freed += size
+        print(f"\nDry run: {deleted} file(s), {freed / (1024 * 1024):.2f} MiB would be deleted")
+        return
+
+    # Batches are unlinked on the pool while the walk keeps producing the next ones
+    for _, results in ordered_map(unlink_batch, batched(files, DELETE_BATCH), workers=threads):
+        for file, size, error in results:
+            if error is None:
+                deleted += 1
+                freed += size
+                print(f"File {file} has been deleted")
+            else:
+                failed += 1
+                print(f"Error: {error.filename} - {error.strerror}.")
+    print(f"\nDeleted {deleted} file(s), freed {freed / (1024 * 1024):.2f} MiB, {failed} error(s)")
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description='Delete files with a specific extension in a directory.')
+        description='Delete files with specific extensions or name patterns in a directory.')
     parser.add_argument('-d', '--dir', required=True,
                         help='Directory to delete files from')
-    parser.add_argument('-e', '--ext', required=True,
-                        help='File extension to delete')
+    parser.add_argument('-e', '--ext', action='append', default=[],
+                        help='File extension(s) to delete, comma-separated; may be repeated')
+    parser.add_argument('-p', '--pattern', action='append', default=[],
+                        help='Shell-style file name pattern to delete (e.g. "*.tmp", "~$*"); may be repeated')
     parser.add_argument('-r', '--recursive', action='store_true',
                         help='Recursively delete files in subdirectories')
+    parser.add_argument('--min-age', type=parse_age,
+                        help='Only delete files not modified for this long (e.g. 30m, 12h, 7d; plain numbers are days)')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='List and count matching files without deleting them')
+    parser.add_argument('-t', '--threads', type=int, default=4,
+                        help='Threads unlinking files (default: 4)')
 
     args = parser.parse_args()
+    if not args.ext and not args.pattern:
+        parser.error('at least one --ext or --pattern is required')
+    if args.ext and not parse_extensions(args.ext):
+        parser.error('--ext was given, but without any extension')
+    if args.pattern and not all(pattern.strip() for pattern in args.pattern):
+        parser.error('--pattern must not be empty')
 
-    delete_files(args.dir, args.ext, args.recursive)
+    delete_files(args.dir, args.ext, args.recursive, args.pattern, args.dry_run, args.min_age, args.threads)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,185 @@
+"""
+Rename Planner
+
+Turns a mapping of old path -> new path into a safe sequence of os.rename calls, shared by the renaming
+scripts (prenamer.py, snake_namer.py, name_cropper.py, rename_substitute_in_folder.py, rhashnamer.py and
+images/ordered_hexnamer.py).
+
+- Renames whose target is another file being renamed away are ordered so the target is freed first
+  (a -> b, b -> c runs as b -> c, then a -> b), with no temporary names.
+- Only cycles (a -> b, b -> a) go through one temporary name each: a cycle of n files costs n + 1 renames.
+- Two files mapped to the same name, or a target that exists and is not being renamed away, are collisions:
+  those renames, and any rename waiting on them, are skipped and reported instead of overwriting a file.
+- A dry run prints the plan without touching the disk. An undo log records every rename as it happens
+  (JSON lines), and `python rename_planner.py undo <log>` reverses it.
+
+Usage:
+    plan = plan_renames({old_path: new_path, ...})
+    for src, dst, reason in plan.conflicts:
+        print(f"Skipping {src} -> {dst}: {reason}")
+    execute_plan(plan, dry_run=False, undo_log='renames.jsonl')
+"""
+
+import json
+import os
+import sys
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class RenamePlan:
+    """Ordered rename steps plus the requested renames that could not be planned"""
+
+    def __init__(self):
+        self.renames: Dict[str, str] = {}  # Requested renames that will happen, old -> new
+        self.steps: List[Tuple[str, str]] = []  # os.rename calls in order, including temporary names
+        self.conflicts: List[Tuple[str, str, str]] = []  # (old, new, reason)
+        self.cycles = 0
+
+
+def _occupied(src: str, dst: str) -> bool:
+    """Whether dst is a different existing file, so renaming src onto it would overwrite it"""
+    try:
+        dst_stat = os.lstat(dst)
+    except FileNotFoundError:
+        return False
+    try:
+        src_stat = os.lstat(src)
+    except FileNotFoundError:
+        return True
+    # A case-only rename on a case-insensitive filesystem finds the file itself at the target
+    return (src_stat.st_dev, src_stat.st_ino) != (dst_stat.st_dev, dst_stat.st_ino)
+
+
+def _temp_name(path: str, taken: Iterable[str]) -> str:
+    """Unused temporary name next to path"""
+    folder, name = os.path.split(path)
+    while True:
+        candidate = os.path.join(folder, f".{name}.rename-{uuid.uuid4().hex[:8]}")
+        if candidate not in taken and not os.path.lexists(candidate):
+            return candidate
+
+
+def plan_renames(mapping: Dict[str, str]) -> RenamePlan:
+    """Plan the renames of `mapping` (old path -> new path); unchanged entries are ignored"""
+    plan = RenamePlan()
+    mapping = {src: dst for src, dst in mapping.items() if src != dst}
+    for src in [src for src in mapping if not os.path.lexists(src)]:
+        plan.conflicts.append((src, mapping.pop(src), "source missing"))
+
+    # Several sources for one target: the first keeps it
+    claimed: Dict[str, str] = {}
+    for src, dst in mapping.items():
+        if dst in claimed:
+            plan.conflicts.append((src, dst, f"target also wanted by '{claimed[dst]}'"))
+        else:
+            claimed[dst] = src
+    moves = {src: dst for dst, src in claimed.items()}
+
+    # A target is free if nothing is there or its current file is moved away; a skipped rename keeps its
+    # source in place, which can block the rename waiting for that name in turn
+    blocked = {src for src, dst in moves.items() if dst not in moves and _occupied(src, dst)}
+    while blocked:
+        for src in blocked:
+            dst = moves.pop(src)
+            plan.conflicts.append((src, dst, "target exists"))
+        blocked = {src for src, dst in moves.items() if dst not in moves and _occupied(src, dst)}
+
+    plan.renames = dict(moves)
+    source_of = {dst: src for src, dst in moves.items()}
+
+    # Chains: start at each rename whose target is not being renamed away, then walk back to the sources
+    # that wait for the name it frees
+    done = set()
+    for src, dst in moves.items():
+        if dst in moves:
+            continue
+        current = src
+        plan.steps.append((current, dst))
+        done.add(current)
+        while current in source_of:
+            previous = source_of[current]
+            plan.steps.append((previous, current))
+            done.add(previous)
+            current = previous
+
+    # Whatever is left forms cycles: park one file under a temporary name, rotate the rest, then unpark
+    taken = set(moves) | set(moves.values())
+    for start in moves:
+        if start in done:
+            continue
+        temp = _temp_name(start, taken)
+        taken.add(temp)
+        plan.steps.append((start, temp))
+        done.add(start)
+        current = start
+        while source_of[current] != start:
+            previous = source_of[current]
+            plan.steps.append((previous, current))
+            done.add(previous)
+            current = previous
+        plan.steps.append((temp, current))
+        plan.cycles += 1
+
+    return plan
+
+
+def execute_plan(plan: RenamePlan, dry_run: bool = False, undo_log: Optional[str] = None) -> int:
+    """
+    Run the planned os.rename calls in order and return how many were made. Each call is appended to
+    `undo_log` before the next one starts, so an interrupted run can still be undone.
+    """
+    if dry_run:
+        return 0
+    log = open(undo_log, 'a', encoding='utf-8') if undo_log else None
+    try:
+        for src, dst in plan.steps:
+            os.rename(src, dst)
+            if log:
+                log.write(json.dumps({'src': src, 'dst': dst}) + '\n')
+                log.flush()
+        return len(plan.steps)
+    finally:
+        if log:
+            os.fsync(log.fileno())
+            log.close()
+
+
+def undo_renames(undo_log: str, dry_run: bool = False) -> int:
+    """Reverse the renames recorded in an undo log, newest first, and return how many were reverted"""
+    with open(undo_log, encoding='utf-8') as f:
+        steps = [json.loads(line) for line in f if line.strip()]
+    for step in reversed(steps):
+        if dry_run:
+            print(f"Would rename '{step['dst']}' back to '{step['src']}'")
+        else:
+            if os.path.lexists(step['src']):
+                raise FileExistsError(f"Cannot undo '{step['dst']}': '{step['src']}' exists")
+            os.rename(step['dst'], step['src'])
+    return len(steps)
+
+
+def rename_flags(argv: List[str]) -> Tuple[List[str], bool, Optional[str]]:
+    """Split --dry-run and --undo-log=PATH from a script's arguments: (remaining args, dry_run, undo_log)"""
+    dry_run = '--dry-run' in argv
+    undo_log = next((arg.split('=', 1)[1] for arg in argv if arg.startswith('--undo-log=')), None)
+    remaining = [arg for arg in argv if arg != '--dry-run' and not arg.startswith('--undo-log=')]
+    return remaining, dry_run, undo_log
+
+
+def report_plan(plan: RenamePlan, dry_run: bool = False, base: Optional[str] = None) -> None:
+    """Print the requested renames and skipped collisions; names are shown relative to `base` if given"""
+    show = (lambda path: os.path.relpath(path, base)) if base else (lambda path: path)
+    verb = "Would rename" if dry_run else "Renamed"
+    for src, dst in plan.renames.items():
+        print(f"{verb}: {show(src)} -> {show(dst)}")
+    for src, dst, reason in plan.conflicts:
+        print(f"Skipped: {show(src)} -> {show(dst)} ({reason})")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != 'undo':
+        print("Usage: python rename_planner.py undo <undo_log> [--dry-run]")
+        sys.exit(1)
+    reverted = undo_renames(sys.argv[2], dry_run='--dry-run' in sys.argv)
+    print(f"Reverted {reverted} rename(s)")
@@ -1,38 +1,44 @@
 # useage: rename_substitute_in_folder.py "path/to/folder" "old_string" "new_string"
 # example: rename_substitute_in_folder.py "c:/my/lovely/dir" "lol" "kek"
 # example: rename_substitute_in_folder.py "c:/my/lovely/dir" "(Copy)" ""
+# flags: --dry-run (print the renames only), --undo-log=PATH (record renames; undo with rename_planner.py undo PATH)
 
 
 import os
 import sys
 
-def rename_files_in_folder(folder_path, to_replace, replacement=""):
+from rename_planner import execute_plan, plan_renames, rename_flags, report_plan
+
+def rename_files_in_folder(folder_path, to_replace, replacement="", dry_run=False, undo_log=None):
     try:
+        renames = {}
         for filename in os.listdir(folder_path):
             new_filename = filename.replace(to_replace, replacement)
             if new_filename != filename:
-                os.rename(
-                    os.path.join(folder_path, filename),
-                    os.path.join(folder_path, new_filename)
-                )
-                print(f'Renamed: {filename} -> {new_filename}')
+                renames[os.path.join(folder_path, filename)] = os.path.join(folder_path, new_filename)
             else:
                 print(f'No change: {filename}')
+
+        # "a (Copy).txt" -> "a.txt" next to an existing "a.txt" is reported instead of overwriting it
+        plan = plan_renames(renames)
+        execute_plan(plan, dry_run, undo_log)
+        report_plan(plan, dry_run, folder_path)
     except Exception as e:
         print(f'Error: {e}')
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python script.py path/to/folder what_to_replace [replacement]")
+    args, dry_run, undo_log = rename_flags(sys.argv[1:])
+    if len(args) < 2:
+        print("Usage: python script.py path/to/folder what_to_replace [replacement] [--dry-run] [--undo-log=PATH]")
         print(f"Arguments received: {sys.argv}")
         sys.exit(1)
 
-    folder_path = sys.argv[1]
-    to_replace = sys.argv[2]
-    replacement = sys.argv[3] if len(sys.argv) > 3 else ""
+    folder_path = args[0]
+    to_replace = args[1]
+    replacement = args[2] if len(args) > 2 else ""
 
     print(f"Folder path: {folder_path}")
     print(f"String to replace: '{to_replace}'")
     print(f"Replacement string: '{replacement}'")
 
-    rename_files_in_folder(folder_path, to_replace, replacement)
\ No newline at end of file
+    rename_files_in_folder(folder_path, to_replace, replacement, dry_run, undo_log)
\ No newline at end of file
@@ -3,38 +3,48 @@ import sys
 import random
 import string
 
+from rename_planner import execute_plan, plan_renames, rename_flags, report_plan
+
 
 def generate_random_string(length):
     """Generate a random alphanumeric string of specified length."""
     return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
 
 
-def rename_files(directory, length):
+def rename_files(directory, length, dry_run=False, undo_log=None):
     """Recursively rename all files in a directory to random alphanumeric strings while preserving extensions."""
+    renames = {}
     for root, _, files in os.walk(directory):
+        taken = set(files)
         for file_name in files:
             file_path = os.path.join(root, file_name)
             file_base, file_ext = os.path.splitext(file_name)
-            new_file_name = generate_random_string(length)
-            new_file_name_with_ext = new_file_name + file_ext
-            new_file_path = os.path.join(root, new_file_name_with_ext)
-            os.rename(file_path, new_file_path)
-            print(f"Renamed '{file_path}' to '{new_file_path}'")
+            # Draw again if the random name is already used in this folder (likely with short lengths)
+            new_file_name_with_ext = generate_random_string(length) + file_ext
+            while new_file_name_with_ext in taken:
+                new_file_name_with_ext = generate_random_string(length) + file_ext
+            taken.add(new_file_name_with_ext)
+            renames[file_path] = os.path.join(root, new_file_name_with_ext)
+
+    plan = plan_renames(renames)
+    execute_plan(plan, dry_run, undo_log)
+    report_plan(plan, dry_run)
 
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python hashnamer.py <directory_path> <length>")
+    args, dry_run, undo_log = rename_flags(sys.argv[1:])
+    if len(args) != 2:
+        print("Usage: python hashnamer.py <directory_path> <length> [--dry-run] [--undo-log=PATH]")
         sys.exit(1)
 
-    directory = sys.argv[1]
-    length = int(sys.argv[2])
+    directory = args[0]
+    length = int(args[1])
 
     if not os.path.isdir(directory):
         print(f"Error: '{directory}' is not a valid directory.")
         sys.exit(1)
 
-    rename_files(directory, length)
+    rename_files(directory, length, dry_run, undo_log)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+"""
+Scan Cache
+
+Persistent cache of per-file scan results (content hashes, perceptual hashes) shared by dupe_finder.py and
+hashnamer.py, so reruns over an unchanged tree do not read file content again.
+
+Entries live in an SQLite database (default: ~/.cache/useful-scripts/scan_cache.sqlite3, or under
+$XDG_CACHE_HOME) and are keyed by (device, inode). Each entry also records the file's size and mtime_ns, and a
+lookup only returns a value when both still match, so an edited file is re-read. Renaming or moving a file
+within the same filesystem keeps its cached hashes.
+
+Invalidation is explicit:
+    ScanCache(rebuild=True)   ignores existing entries and overwrites them as files are re-read
+    cache.invalidate(path)    drops the entries of one file (cache.forget(key) once it is deleted)
+    cache.clear()             drops everything
+
+Usage:
+    with ScanCache() as cache:
+        key = stat_key(path)
+        digest = cache.get(key, 'sha256')
+        if digest is None:
+            digest = compute(path)
+            cache.put(key, path, 'sha256', digest)
+"""
+
+import os
+import sqlite3
+from typing import Optional, Tuple
+
+StatKey = Tuple[int, int, int, int]  # (st_dev, st_ino, st_size, st_mtime_ns)
+
+COMMIT_EVERY = 1000  # Writes buffered per transaction
+
+
+def default_cache_path() -> str:
+    """Location of the shared cache database"""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'useful-scripts', 'scan_cache.sqlite3')
+
+
+def stat_key(path: str, stat_result: Optional[os.stat_result] = None) -> StatKey:
+    """Cache key of a file, reusing a stat result the caller already has"""
+    st = stat_result if stat_result is not None else os.stat(path)
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class ScanCache:
+    """SQLite-backed store of per-file values such as content and perceptual hashes"""
+
+    def __init__(self, path: Optional[str] = None, rebuild: bool = False):
+        self.path = path or default_cache_path()
+        self.rebuild = rebuild
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                device INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                base_name TEXT NOT NULL,
+                PRIMARY KEY (device, inode)
+            );
+            CREATE TABLE IF NOT EXISTS values_by_kind (
+                device INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (device, inode, kind)
+            );
+        """)
+
+    def get(self, key: StatKey, kind: str) -> Optional[str]:
+        """Cached value of the given kind, or None if missing, stale or rebuilding"""
+        if self.rebuild:
+            self.misses += 1
+            return None
+        device, inode, size, mtime_ns = key
+        row = self.db.execute(
+            "SELECT v.value FROM values_by_kind v JOIN files f USING (device, inode) "
+            "WHERE v.device = ? AND v.inode = ? AND v.kind = ? AND f.size = ? AND f.mtime_ns = ?",
+            (device, inode, kind, size, mtime_ns),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: StatKey, path: str, kind: str, value: str) -> None:
+        """Store a value for a file, dropping values recorded for an older version of it"""
+        device, inode, size, mtime_ns = key
+        row = self.db.execute(
+            "SELECT size, mtime_ns FROM files WHERE device = ? AND inode = ?", (device, inode)
+        ).fetchone()
+        if row is not None and tuple(row) != (size, mtime_ns):
+            self.db.execute("DELETE FROM values_by_kind WHERE device = ? AND inode = ?", (device, inode))
+        self.db.execute(
+            "INSERT OR REPLACE INTO files (device, inode, size, mtime_ns, path, base_name) VALUES (?, ?, ?, ?, ?, ?)",
+            (device, inode, size, mtime_ns, os.path.abspath(path), os.path.basename(path)),
+        )
+        self.db.execute(
+            "INSERT OR REPLACE INTO values_by_kind (device, inode, kind, value) VALUES (?, ?, ?, ?)",
+            (device, inode, kind, value),
+        )
+        self._wrote()
+
+    def moved(self, key: StatKey, new_path: str) -> None:
+        """Record a file's new name after a rename; its cached values stay valid"""
+        device, inode, _, _ = key
+        self.db.execute(
+            "UPDATE files SET path = ?, base_name = ? WHERE device = ? AND inode = ?",
+            (os.path.abspath(new_path), os.path.basename(new_path), device, inode),
+        )
+        self._wrote()
+
+    def invalidate(self, path: str) -> None:
+        """Drop every cached value of one file"""
+        self.forget(stat_key(path))
+
+    def forget(self, key: StatKey) -> None:
+        """Drop every cached value of the file with this key, e.g. right after deleting it"""
+        device, inode, _, _ = key
+        self.db.execute("DELETE FROM values_by_kind WHERE device = ? AND inode = ?", (device, inode))
+        self.db.execute("DELETE FROM files WHERE device = ? AND inode = ?", (device, inode))
+        self._wrote()
+
+    def clear(self) -> None:
+        """Drop the whole cache"""
+        self.db.execute("DELETE FROM values_by_kind")
+        self.db.execute("DELETE FROM files")
+        self.db.commit()
+        self._pending = 0
+
+    def _wrote(self) -> None:
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.db.commit()
+            self._pending = 0
+
+    def close(self) -> None:
+        """Commit buffered writes and close the database"""
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self) -> "ScanCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
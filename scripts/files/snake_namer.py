@@ -2,30 +2,36 @@ import os
 import re
 import sys
 
+from rename_planner import execute_plan, plan_renames, rename_flags, report_plan
+
 def to_snake_case(name):
     name_without_ext = os.path.splitext(name)[0]
     name_snake = re.sub(r'[\W_]+', ' ', name_without_ext)
     name_snake = re.sub(r'\s+', '_', name_snake).lower()
     return name_snake
 
-def rename_files_in_folder(folder_path):
+def rename_files_in_folder(folder_path, dry_run=False, undo_log=None):
     if not os.path.isdir(folder_path):
         print(f"Error: Folder not found - {folder_path}")
         return
 
+    renames = {}
     for filename in os.listdir(folder_path):
         old_path = os.path.join(folder_path, filename)
         if os.path.isfile(old_path):
             name, ext = os.path.splitext(filename)
             new_name = to_snake_case(name) + ext.lower()
-            new_path = os.path.join(folder_path, new_name)
-            if old_path != new_path:
-                print(f'Renaming: {filename} -> {new_name}')
-                os.rename(old_path, new_path)
+            renames[old_path] = os.path.join(folder_path, new_name)
+
+    # Names that snake-case to the same result are reported instead of overwriting each other
+    plan = plan_renames(renames)
+    execute_plan(plan, dry_run, undo_log)
+    report_plan(plan, dry_run, folder_path)
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python snake_namer.py <folder_path>")
+    args, dry_run, undo_log = rename_flags(sys.argv[1:])
+    if len(args) < 1:
+        print("Usage: python snake_namer.py <folder_path> [--dry-run] [--undo-log=PATH]")
     else:
-        folder = sys.argv[1]
-        rename_files_in_folder(folder)
\ No newline at end of file
+        folder = args[0]
+        rename_files_in_folder(folder, dry_run, undo_log)
\ No newline at end of file
@@ -17,64 +17,473 @@ config.yaml example
 
 """
 usage:
-python symlinker.py path/to/config.yaml
+python symlinker.py path/to/config.yaml [--full] [--state PATH] [--watch]
+
+All patterns of an entry are compiled into one matcher and each source_dir is walked once, however many
+patterns and entries use it. The links created are recorded in a state file (default: under
+~/.cache/useful-scripts/symlinker), so a rerun only creates links for new matches and removes the links it made
+for files that are gone or no longer match. --full re-checks every link on disk, as the first run does.
+
+--watch (Linux) keeps running after the sync and follows the source_dirs with inotify: links are created and
+removed as matching files appear and disappear. Bursts of events are coalesced, and only the changed paths
+are looked at.
 """
 
 import os
+import re
+import sys
+import json
+import time
 import yaml
-import glob
+import ctypes
+import ctypes.util
+import select
+import struct
+import hashlib
 import argparse
 
+from fastwalk import scan_tree
+from scan_cache import default_cache_path
+
+
+def default_state_path(config_path):
+    """State file location for a config, next to the scan cache"""
+    digest = hashlib.sha1(os.path.abspath(config_path).encode()).hexdigest()[:16]
+    return os.path.join(os.path.dirname(default_cache_path()), 'symlinker', f"{digest}.json")
+
+
+def load_state(state_path):
+    """Links created by earlier runs, target path -> source path; None if there is no state yet"""
+    try:
+        with open(state_path, 'r', encoding='utf-8') as file:
+            return json.load(file)['links']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_state(state_path, config_path, links):
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    temp_path = state_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump({'config': os.path.abspath(config_path), 'links': links}, file, indent=1, sort_keys=True)
+    os.replace(temp_path, state_path)
+
+
+def glob_regex(pattern):
+    """Regex for one glob pattern on '/'-separated paths: wildcards stay within a path segment and, as with
+    glob, only match names starting with '.' when the pattern segment does too"""
+    segments = []
+    for segment in pattern.split('/'):
+        regex = '' if segment.startswith('.') else r'(?!\.)'
+        i = 0
+        while i < len(segment):
+            char = segment[i]
+            i += 1
+            if char == '*':
+                regex += '[^/]*'
+            elif char == '?':
+                regex += '[^/]'
+            elif char == '[':
+                j = i + 1 if segment[i:i + 1] == '!' else i
+                close = segment.find(']', j + 1 if segment[j:j + 1] == ']' else j)
+                if close < 0:
+                    regex += r'\['
+                    continue
+                body = segment[i:close].replace('\\', r'\\')
+                i = close + 1
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                elif body.startswith('^'):
+                    body = '\\' + body
+                regex += '[' + body + ']'
+            else:
+                regex += re.escape(char)
+        segments.append(regex)
+    return '/'.join(segments)
+
+
+def compile_matcher(patterns, include_nested):
+    """
+    One regex for all of an entry's glob patterns, matched against paths relative to source_dir. Patterns
+    match at the top level, or at any depth with include_nested. Returns (matcher, depth), where depth is how
+    many folder levels the patterns can reach (None for any).
+    """
+    regexes = []
+    depth = 0
+    for pattern in patterns:
+        pattern = os.path.normcase(pattern).replace(os.sep, '/').strip('/')
+        regexes.append(('(?:[^/]+/)*' if include_nested else '') + glob_regex(pattern))
+        depth = max(depth, pattern.count('/'))
+    compiled = re.compile('(?:' + '|'.join(regexes) + r')\Z')
+    return (lambda relative_path: bool(compiled.match(os.path.normcase(relative_path)))), (None if include_nested else depth)
+
+
+def load_config(config_path):
+    with open(config_path, 'r', encoding='utf-8') as file:
+        config = yaml.safe_load(file)
+
+    entries = []
+    for entry in config:
+        matcher, depth = compile_matcher(entry['match'], entry.get('include_nested', False))
+        entries.append({
+            'source_dir': os.path.abspath(entry['source_dir']),
+            'target_dir': os.path.abspath(entry['target_dir']),
+            'matcher': matcher,
+            'depth': depth,
+        })
+    return entries
+
+
+def matching_paths(source_dir, entries):
+    """Walk source_dir once and return, for each entry using it, the matching paths in walk order"""
+    matches = [[] for _ in entries]
+    depths = [entry['depth'] for entry in entries]
+    max_depth = None if None in depths else max(depths)
+
+    for dirpath, dirs, files in scan_tree(source_dir, recursive=max_depth != 0, follow_symlinks=True,
+                                          sort_key=lambda item: item.name):
+        relative_dir = os.path.relpath(dirpath, source_dir).replace(os.sep, '/')
+        prefix = '' if relative_dir == os.curdir else relative_dir + '/'
+        for item in dirs + files:
+            for entry, found in zip(entries, matches):
+                if entry['matcher'](prefix + item.name):
+                    found.append(item.path)
+        # Folders below what any pattern can reach, and hidden folders (as with '**'), are not entered
+        level = prefix.count('/')
+        dirs[:] = [item for item in dirs
+                   if not item.name.startswith('.') and (max_depth is None or level < max_depth)]
+    return matches
+
+
+def desired_links(entries):
+    """Target path -> source path for every link the config asks for; the first entry to claim a name wins"""
+    by_source = {}
+    for index, entry in enumerate(entries):
+        by_source.setdefault(entry['source_dir'], []).append(index)
+
+    found = [None] * len(entries)
+    for source_dir, indexes in by_source.items():
+        if not os.path.isdir(source_dir):
+            print(f"Source directory not found: {source_dir}")
+            found_lists = [[] for _ in indexes]
+        else:
+            found_lists = matching_paths(source_dir, [entries[index] for index in indexes])
+        for index, paths in zip(indexes, found_lists):
+            found[index] = paths
+
+    links = {}
+    for entry, paths in zip(entries, found):
+        for file_path in paths:
+            links.setdefault(os.path.join(entry['target_dir'], os.path.basename(file_path)), file_path)
+    return links
+
+
 def remove_invalid_symlinks(target_dir):
     if not os.path.exists(target_dir):
         return
-    
+
     for item in os.listdir(target_dir):
         item_path = os.path.join(target_dir, item)
         if os.path.islink(item_path) and not os.path.exists(os.readlink(item_path)):
             print(f"Removing invalid symlink: {item_path}")
             os.unlink(item_path)
 
-def create_symlinks(config_path):
-    # Load YAML config
-    with open(config_path, 'r', encoding='utf-8') as file:
-        config = yaml.safe_load(file)
-    
-    for entry in config:
-        source_dir = os.path.abspath(entry['source_dir'])
-        target_dir = os.path.abspath(entry['target_dir'])
-        patterns = entry['match']
-        include_nested = entry.get('include_nested', False)
-        
+
+def points_to(link_path, file_path):
+    try:
+        return os.readlink(link_path) == file_path
+    except OSError:
+        return False
+
+
+def sync_link(target_path, file_path, state, counts, full=False):
+    """
+    Bring one target in line: a link to file_path, or no link made by this script if file_path is None.
+    `state` (target path -> source path of the links made) is updated in place and the outcome is counted in
+    `counts`; with full the link on disk is checked even if the state records it.
+    """
+    recorded = state.get(target_path)
+    if recorded is not None and recorded != file_path:
+        # A link made earlier whose file is gone or no longer matches
+        del state[target_path]
+        if os.path.islink(target_path) and points_to(target_path, recorded):
+            print(f"Removing stale symlink: {target_path}")
+            os.unlink(target_path)
+            counts['removed'] += 1
+    if file_path is None:
+        return
+
+    if recorded == file_path and (not full or points_to(target_path, file_path)):
+        counts['unchanged'] += 1
+        return
+    state.pop(target_path, None)
+
+    if os.path.lexists(target_path):
+        if points_to(target_path, file_path):
+            state[target_path] = file_path  # Made by an earlier run without state
+            counts['unchanged'] += 1
+        else:
+            print(f"Skipping existing file: {target_path}")
+        return
+
+    try:
+        os.symlink(file_path, target_path)
+        state[target_path] = file_path
+        counts['created'] += 1
+        print(f"Created symlink: {target_path} -> {file_path}")
+    except OSError as e:
+        print(f"Failed to create symlink: {e}")
+
+
+def sync_links(desired, state, full=False):
+    """
+    Bring the targets in line with `desired`, given the links recorded in `state` (None forces a full check).
+    Returns the new state and the created/removed/unchanged counts.
+    """
+    full = full or state is None
+    state = dict(state or {})
+    counts = {'created': 0, 'removed': 0, 'unchanged': 0}
+    for target_path in list(state):
+        if target_path not in desired:
+            sync_link(target_path, None, state, counts)
+    for target_path, file_path in desired.items():
+        sync_link(target_path, file_path, state, counts, full)
+    return state, counts
+
+
+def print_counts(counts):
+    print(f"Created {counts['created']}, removed {counts['removed']}, unchanged {counts['unchanged']} symlink(s)")
+
+
+# inotify constants, from <sys/inotify.h>
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len; followed by the name
+
+QUIET_SECONDS = 0.5  # A burst of events is handled once no new event came for this long
+MAX_DELAY_SECONDS = 5  # ...or once it has lasted this long
+
+
+class Inotify:
+    """Minimal ctypes wrapper around the Linux inotify API"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify is not available on this system")
+        self.libc = libc
+        self.fd = self._check(libc.inotify_init1(IN_CLOEXEC))
+
+    def _check(self, result, path=None):
+        if result < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return result
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        return self._check(self.libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask)), path)
+
+    def remove_watch(self, wd):
+        self.libc.inotify_rm_watch(self.fd, wd)  # Fails harmlessly if the folder is already gone
+
+    def wait(self, timeout=None):
+        """Whether events arrived within timeout seconds (None waits for ever)"""
+        return bool(select.select([self.fd], [], [], timeout)[0])
+
+    def read(self):
+        """Pending events as (wd, mask, name)"""
+        data = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class SourceWatcher:
+    """
+    Follows the source_dirs of a config with inotify and keeps the links in line, one changed path at a time.
+    Only the folders the patterns can reach are watched: the source_dir itself, and with include_nested (or
+    patterns containing a '/') its non-hidden subfolders, including ones created later.
+    """
+
+    def __init__(self, entries):
+        self.inotify = Inotify()
+        self.entries_by_source = {}
+        for entry in entries:
+            self.entries_by_source.setdefault(entry['source_dir'], []).append(entry)
+        self.watches = {}  # wd -> (source_dir, folder path)
+        # Watches are added before the initial sync walks the trees, so nothing created meanwhile is missed
+        for source_dir in self.entries_by_source:
+            if os.path.isdir(source_dir):
+                self.watch_tree(source_dir, source_dir)
+
+    def max_depth(self, source_dir):
+        depths = [entry['depth'] for entry in self.entries_by_source[source_dir]]
+        return None if None in depths else max(depths)
+
+    def relative(self, source_dir, path):
+        relative_path = os.path.relpath(path, source_dir).replace(os.sep, '/')
+        return '' if relative_path == os.curdir else relative_path
+
+    def level(self, source_dir, folder):
+        """How many folders below source_dir a folder is"""
+        relative_path = self.relative(source_dir, folder)
+        return relative_path.count('/') + 1 if relative_path else 0
+
+    def watch_tree(self, source_dir, folder):
+        """Watch folder and the subfolders below it that patterns can reach; returns the paths found in them"""
+        max_depth = self.max_depth(source_dir)
+        if max_depth is not None and self.level(source_dir, folder) > max_depth:
+            return []
+        found = []
+        for dirpath, dirs, files in scan_tree(folder, follow_symlinks=True):
+            try:
+                self.watches[self.inotify.add_watch(dirpath)] = (source_dir, dirpath)
+            except OSError as e:
+                print(f"Cannot watch {dirpath}: {e}")
+            found.extend(item.path for item in dirs + files)
+            # Same folders as the walk in matching_paths()
+            level = self.level(source_dir, dirpath)
+            dirs[:] = [item for item in dirs
+                       if not item.name.startswith('.') and (max_depth is None or level < max_depth)]
+        return found
+
+    def unwatch_tree(self, folder):
+        prefix = folder + os.sep
+        for wd, (_, path) in list(self.watches.items()):
+            if path == folder or path.startswith(prefix):
+                del self.watches[wd]
+                self.inotify.remove_watch(wd)
+
+    def collect(self):
+        """Wait for a burst of events and return the changed paths, as {path: (source_dir, was a folder)}"""
+        changed = {}
+        self.inotify.wait()
+        started = time.monotonic()
+        while True:
+            for wd, mask, name in self.inotify.read():
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if wd not in self.watches:
+                    continue
+                source_dir, folder = self.watches[wd]
+                if mask & IN_IGNORED:
+                    del self.watches[wd]
+                    continue
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF) or not name:
+                    continue  # Reported as a change in the parent folder
+                path = os.path.join(folder, name)
+                previous = changed.get(path, (source_dir, False))[1]
+                changed[path] = (source_dir, previous or bool(mask & IN_ISDIR))
+            remaining = MAX_DELAY_SECONDS - (time.monotonic() - started)
+            if remaining <= 0 or not self.inotify.wait(min(QUIET_SECONDS, remaining)):
+                return changed
+
+    def apply(self, changed, desired, state, counts):
+        """Re-evaluate the changed paths against the patterns and update the affected links only"""
+        for path, (source_dir, was_folder) in changed.items():
+            # inotify does not flag links to folders as folders, but they were watched like any other
+            was_folder = was_folder or any(folder == path for _, folder in self.watches.values())
+            if was_folder and not os.path.isdir(path):
+                # A folder went away: so did everything that was linked from below it
+                self.unwatch_tree(path)
+                prefix = path + os.sep
+                for target_path, file_path in list(desired.items()):
+                    if file_path.startswith(prefix):
+                        del desired[target_path]
+                        sync_link(target_path, None, state, counts)
+
+            paths = [path]
+            if os.path.isdir(path) and not os.path.basename(path).startswith('.'):
+                # A new or moved-in folder: its contents appeared too
+                self.unwatch_tree(path)
+                paths += self.watch_tree(source_dir, path)
+
+            for file_path in paths:
+                exists = os.path.lexists(file_path)
+                relative_path = self.relative(source_dir, file_path)
+                for entry in self.entries_by_source[source_dir]:
+                    if not entry['matcher'](relative_path):
+                        continue
+                    target_path = os.path.join(entry['target_dir'], os.path.basename(file_path))
+                    if exists and target_path not in desired:
+                        desired[target_path] = file_path
+                        sync_link(target_path, file_path, state, counts)
+                    elif not exists and desired.get(target_path) == file_path:
+                        del desired[target_path]
+                        sync_link(target_path, None, state, counts)
+
+    def run(self, entries, desired, state, save):
+        """Handle events until interrupted; `save(state)` is called after each burst"""
+        print(f"Watching {len(self.watches)} folder(s), press Ctrl+C to stop")
+        try:
+            while True:
+                changed = self.collect()
+                if changed is None:
+                    # The kernel queue overflowed and events were lost: fall back to a full rescan
+                    print("Event queue overflowed, rescanning")
+                    desired.clear()
+                    desired.update(desired_links(entries))
+                    state, counts = sync_links(desired, state)
+                else:
+                    counts = {'created': 0, 'removed': 0, 'unchanged': 0}
+                    self.apply(changed, desired, state, counts)
+                if counts['created'] or counts['removed']:
+                    save(state)
+        except KeyboardInterrupt:
+            save(state)
+            print("Stopped watching")
+        finally:
+            self.inotify.close()
+
+
+def create_symlinks(config_path, state_path=None, full=False, watch=False):
+    entries = load_config(config_path)
+    state_path = state_path or default_state_path(config_path)
+    state = load_state(state_path)
+
+    for target_dir in dict.fromkeys(entry['target_dir'] for entry in entries):
         if not os.path.exists(target_dir):
             os.makedirs(target_dir)
-        
-        # Remove invalid symlinks before processing
-        remove_invalid_symlinks(target_dir)
-        
-        for pattern in patterns:
-            if include_nested:
-                matched_files = glob.glob(os.path.join(source_dir, '**', pattern), recursive=True)
-            else:
-                matched_files = glob.glob(os.path.join(source_dir, pattern))
-            
-            for file_path in matched_files:
-                file_name = os.path.basename(file_path)
-                target_path = os.path.join(target_dir, file_name)
-                
-                if os.path.exists(target_path):
-                    print(f"Skipping existing file: {target_path}")
-                    continue
-                
-                try:
-                    os.symlink(file_path, target_path)
-                    print(f"Created symlink: {target_path} -> {file_path}")
-                except OSError as e:
-                    print(f"Failed to create symlink: {e}")
+        # Broken links not recorded in the state are only looked for on full runs
+        if full or state is None:
+            remove_invalid_symlinks(target_dir)
+
+    watcher = SourceWatcher(entries) if watch else None
+    desired = desired_links(entries)
+    state, counts = sync_links(desired, state, full)
+    save_state(state_path, config_path, state)
+    print_counts(counts)
+
+    if watcher:
+        watcher.run(entries, desired, state, lambda links: save_state(state_path, config_path, links))
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Create symbolic links based on YAML config.")
     parser.add_argument("config", help="Path to the YAML configuration file.")
+    parser.add_argument("--full", action="store_true", help="Re-check every link on disk instead of trusting the state file.")
+    parser.add_argument("--state", help="State file recording the links created (default: under ~/.cache/useful-scripts).")
+    parser.add_argument("--watch", action="store_true", help="Keep running and follow changes in the source folders (Linux, inotify).")
     args = parser.parse_args()
-    
-    create_symlinks(args.config)
+
+    if args.watch and not sys.platform.startswith('linux'):
+        parser.error("--watch needs Linux inotify")
+    create_symlinks(args.config, args.state, args.full, args.watch)
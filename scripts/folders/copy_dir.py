@@ -1,47 +1,103 @@
 import os
-import shutil
 import sys
 
-def copy_directory(source_dir, target_dir):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "files"))
+from copy_engine import DEDUP_MODES, RESUME_ABOVE, copy_tree, copy_tree_dedup  # noqa: E402
+from hash_engine import HASH_METHODS  # noqa: E402
+
+
+def checksum_manifest_path(target_dir, method):
+    """Checksum file next to the target folder, e.g. /backup/photos.sha256 for /backup/photos"""
+    return os.path.normpath(os.path.abspath(target_dir)) + '.' + method
+
+
+def write_checksum_manifest(target_dir, method, digests):
+    """Write digests in `sha256sum` format, with paths relative to the target folder"""
+    manifest_path = checksum_manifest_path(target_dir, method)
+    with open(manifest_path, 'w', encoding='utf-8') as file:
+        for target_path, digest in digests:
+            relative_path = os.path.relpath(target_path, target_dir).replace(os.sep, '/')
+            file.write(f"{digest}  {relative_path}\n")
+    return manifest_path
+
+
+def copy_directory(source_dir, target_dir, workers=None, verify=None, readback=False, resume_above=RESUME_ABOVE,
+                   dedup=None, use_cache=True):
     """
     Copies the contents of the source directory to the target directory recursively.
 
+    The tree is walked once and files are copied on a thread pool sized for the storage (see
+    files/copy_engine.py), with kernel-side copies (copy_file_range/sendfile) where available.
+
     Args:
     source_dir (str): The path to the source directory.
     target_dir (str): The path to the target directory.
+    workers (int): Copy threads (default: picked from the source and target storage).
+    verify (str): Hash method; files are hashed while being copied and the digests written to a checksum
+        manifest next to the target folder.
+    readback (bool): Also read every copied file back and compare it with its digest.
+    resume_above (int): Files of this many bytes or more are copied in chunks that survive an interruption;
+        running the copy again resumes them (None: never).
+    dedup (str): 'reflink' or 'hardlink': files whose content is already in the target are linked to it instead
+        of being copied again (see copy_engine.copy_tree_dedup()).
+    use_cache (bool): Keep the hashes of the dedup index in the shared scan cache.
     """
     if not os.path.exists(source_dir):
         print(f"Source directory '{source_dir}' does not exist.")
         return
 
-    if not os.path.exists(target_dir):
-        os.makedirs(target_dir)
-    
-    total_files = sum([len(files) for _, _, files in os.walk(source_dir)])
-    copied_files = 0
-
-    for root, dirs, files in os.walk(source_dir):
-        for dir_ in dirs:
-            source_path = os.path.join(root, dir_)
-            target_path = os.path.join(target_dir, os.path.relpath(source_path, source_dir))
-            if not os.path.exists(target_path):
-                os.makedirs(target_path)
+    if dedup:
+        stats = copy_tree_dedup(source_dir, target_dir, dedup, workers=workers, use_cache=use_cache,
+                                resume_above=resume_above)
+    else:
+        stats = copy_tree(source_dir, target_dir, workers=workers, verify=verify, readback=readback,
+                          resume_above=resume_above)
 
-        for file_ in files:
-            source_path = os.path.join(root, file_)
-            target_path = os.path.join(target_dir, os.path.relpath(source_path, source_dir))
-            shutil.copy2(source_path, target_path)
-            copied_files += 1
-            print(f"Copied {copied_files}/{total_files} files...", end='\r')
+    for source_path, error in stats.errors:
+        print(f"Failed to copy '{source_path}': {error}")
+    print(f"Copying completed. {stats.files} files copied ({stats.bytes / (1024 * 1024):.1f} MiB).")
+    if dedup:
+        print(f"{stats.linked} files {dedup}ed to identical content, {stats.skipped} already in place.")
 
-    print(f"\nCopying completed. {copied_files} files copied.")
+    if verify:
+        manifest_path = write_checksum_manifest(target_dir, verify, stats.digests)
+        print(f"Checksums written to '{manifest_path}'.")
+    if readback:
+        for target_path, message in stats.mismatches:
+            print(f"Verification failed for '{target_path}': {message}")
+        print(f"Read-back check: {len(stats.digests) - len(stats.mismatches)} files verified, "
+              f"{len(stats.mismatches)} failed.")
+    return not stats.errors and not stats.mismatches
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python copy_directory.py <source_directory> <target_directory>")
+    flags = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) != 2:
+        print("Usage: python copy_dir.py <source_directory> <target_directory> [--workers=N] [--verify] [--readback]"
+              " [--hash=METHOD] [--resume-above=MIB] [--dedup=reflink|hardlink] [--no-cache]")
+        sys.exit(1)
+
+    workers = next((int(flag.split('=', 1)[1]) for flag in flags if flag.startswith('--workers=')), None)
+    method = next((flag.split('=', 1)[1].lower() for flag in flags if flag.startswith('--hash=')), 'sha256')
+    if method not in HASH_METHODS:
+        print(f"Unknown hash method '{method}'; choose from {', '.join(HASH_METHODS)}")
+        sys.exit(1)
+    readback = '--readback' in flags
+    resume_mib = next((int(flag.split('=', 1)[1]) for flag in flags if flag.startswith('--resume-above=')), None)
+    resume_above = RESUME_ABOVE if resume_mib is None else (resume_mib * 1024 * 1024 or None)
+    verify = method if readback or '--verify' in flags else None
+
+    dedup = next((flag.split('=', 1)[1].lower() for flag in flags if flag.startswith('--dedup=')), None)
+    if dedup is not None and dedup not in DEDUP_MODES:
+        print(f"Unknown dedup mode '{dedup}'; choose from {', '.join(DEDUP_MODES)}")
+        sys.exit(1)
+    if dedup and verify:
+        print("--dedup cannot be combined with --verify or --readback")
+        sys.exit(1)
+
+    source_directory = args[0]
+    target_directory = args[1]
+
+    if not copy_directory(source_directory, target_directory, workers, verify, readback, resume_above, dedup,
+                          '--no-cache' not in flags):
         sys.exit(1)
-    
-    source_directory = sys.argv[1]
-    target_directory = sys.argv[2]
-    
-    copy_directory(source_directory, target_directory)
\ No newline at end of file
@@ -1,55 +1,226 @@
 import os
-import shutil
 import sys
+import json
+import shutil
+import hashlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "files"))
+from copy_engine import Progress, copy_file, copy_tree, copy_workers, run_jobs  # noqa: E402
+from hash_engine import hash_file  # noqa: E402
+from scan_cache import default_cache_path  # noqa: E402
+
+MODIFY_WINDOW = 0.000001  # Seconds two mtimes may differ and still count as equal (100 ns NTFS rounding)
+
 
-def copy_directory(source_dir, target_dir):
+def copy_directory(source_dir, target_dir, workers=None):
     """
     Copies the contents of the source directory to the target directory recursively.
 
     Args:
     source_dir (str): The path to the source directory.
     target_dir (str): The path to the target directory.
+    workers (int): Copy threads (default: picked from the source and target storage).
     """
     if not os.path.exists(source_dir):
         print(f"Source directory '{source_dir}' does not exist.")
         return
 
-    if not os.path.exists(target_dir):
-        os.makedirs(target_dir)
-    
-    total_files = sum([len(files) for _, _, files in os.walk(source_dir)])
-    copied_files = 0
-    skipped_files = 0
-
-    for root, dirs, files in os.walk(source_dir):
-        for dir_ in dirs:
-            source_path = os.path.join(root, dir_)
-            target_path = os.path.join(target_dir, os.path.relpath(source_path, source_dir))
-
-            print(f"Dir: {target_path}")
-
-            if not os.path.exists(target_path):
-                os.makedirs(target_path)
-
-        for file_ in files:
-            source_path = os.path.join(root, file_)
-            target_path = os.path.join(target_dir, os.path.relpath(source_path, source_dir))
-            if not os.path.exists(target_path):
-                shutil.copy2(source_path, target_path)
-                copied_files += 1
-                print(f"Copied {copied_files}/{total_files} files...", end='\r')
+    stats = copy_tree(source_dir, target_dir, workers=workers,
+                      select=lambda entry, target_path: not os.path.exists(target_path))
+
+    for source_path, error in stats.errors:
+        print(f"Failed to copy '{source_path}': {error}")
+    print(f"Copying completed. {stats.files} files copied, {stats.skipped} skipped.")
+
+
+def default_manifest_path(source_dir, target_dir):
+    """Manifest location for a source/target pair, next to the scan cache"""
+    pair = f"{os.path.abspath(source_dir)}\n{os.path.abspath(target_dir)}"
+    digest = hashlib.sha1(pair.encode()).hexdigest()[:16]
+    return os.path.join(os.path.dirname(default_cache_path()), 'copy_manifests', f"{digest}.json")
+
+
+def load_manifest(manifest_path):
+    """
+    Folders of the last sync, by path relative to the source:
+    {'mtime_ns': folder mtime, 'subdirs': [names], 'files': {name: [size, mtime_ns]}}
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            return json.load(file)['dirs']
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def save_manifest(manifest_path, source_dir, target_dir, dirs):
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump({'source': os.path.abspath(source_dir), 'target': os.path.abspath(target_dir), 'dirs': dirs},
+                  file, separators=(',', ':'))
+    os.replace(temp_path, manifest_path)
+
+
+def same_mtime(a_ns, b_ns, window):
+    return abs(a_ns - b_ns) <= window * 1e9
+
+
+def sync_directory(source_dir, target_dir, workers=None, checksum=False, quick=False, full=False,
+                   manifest_path=None, modify_window=MODIFY_WINDOW):
+    """
+    Rsync-like copy: copies files that are missing in the target or differ in size or mtime, and keeps a
+    manifest of what the last sync left in place.
+
+    - A file whose size and mtime match the manifest is up to date without looking at the target (full=True
+      checks the target anyway).
+    - checksum=True compares the content hashes of files with the same size instead of trusting mtimes.
+    - quick=True does not list folders whose mtime is unchanged since the last sync, only their subfolders,
+      so an unchanged tree costs one stat per folder. Files edited in place (without being re-created) do not
+      change their folder's mtime and are missed in this mode.
+    Files are never deleted from the target.
+    """
+    if not os.path.exists(source_dir):
+        print(f"Source directory '{source_dir}' does not exist.")
+        return
+
+    manifest_path = manifest_path or default_manifest_path(source_dir, target_dir)
+    old_dirs = {} if full else load_manifest(manifest_path)
+    new_dirs = {}
+    pending = {}  # Folder -> files still being copied; a folder is only saved in the manifest once all made it
+    failed = set()
+    up_to_date = 0
+    progress = Progress()
+    workers = workers or copy_workers(source_dir, target_dir)
+
+    def jobs():
+        nonlocal up_to_date
+        stack = ['']
+        while stack:
+            relative_dir = stack.pop()
+            source_path = os.path.join(source_dir, relative_dir)
+            target_path = os.path.join(target_dir, relative_dir)
+            old = old_dirs.get(relative_dir)
+            try:
+                mtime_ns = os.stat(source_path).st_mtime_ns
+                if quick and old and old['mtime_ns'] == mtime_ns:
+                    new_dirs[relative_dir] = old
+                    up_to_date += len(old['files'])
+                    stack.extend(os.path.join(relative_dir, name) for name in reversed(old['subdirs']))
+                    continue
+                with os.scandir(source_path) as listing:
+                    entries = sorted(listing, key=lambda entry: entry.name)
+            except OSError as e:
+                print(f"Cannot read '{source_path}': {e.strerror}")
+                continue
+
+            record = {'mtime_ns': mtime_ns, 'subdirs': [], 'files': {}}
+            new_dirs[relative_dir] = record
+            pending[relative_dir] = 0
+            os.makedirs(target_path, exist_ok=True)
+            old_files = old['files'] if old else {}
+
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        record['subdirs'].append(entry.name)
+                        continue
+                    linked_dir = entry.is_dir()
+                    stat = None if linked_dir else entry.stat()
+                except OSError as e:
+                    print(f"Cannot read '{entry.path}': {e.strerror}")
+                    failed.add(relative_dir)
+                    continue
+                if linked_dir:
+                    # A link to a folder is not followed, as in copy_directory(): only the folder is made
+                    try:
+                        os.makedirs(os.path.join(target_path, entry.name), exist_ok=True)
+                    except OSError as e:
+                        print(f"Cannot create '{os.path.join(target_path, entry.name)}': {e.strerror}")
+                        failed.add(relative_dir)
+                    continue
+                size, file_mtime = stat.st_size, stat.st_mtime_ns
+
+                if not checksum and old_files.get(entry.name) == [size, file_mtime]:
+                    record['files'][entry.name] = [size, file_mtime]
+                    up_to_date += 1
+                    continue
+
+                file_target = os.path.join(target_path, entry.name)
+                try:
+                    target_stat = os.stat(file_target)
+                except OSError:
+                    target_stat = None
+                same_size = target_stat is not None and target_stat.st_size == size
+                if same_size and not checksum and same_mtime(target_stat.st_mtime_ns, file_mtime, modify_window):
+                    record['files'][entry.name] = [size, file_mtime]
+                    up_to_date += 1
+                    continue
+
+                pending[relative_dir] += 1
+                progress.found(size)
+                yield entry.path, file_target, relative_dir, entry.name, size, file_mtime, same_size and checksum
+
+            stack.extend(os.path.join(relative_dir, name) for name in reversed(record['subdirs']))
+
+    def sync_job(job):
+        """'same' if the hashes showed the target already matches, otherwise the bytes copied"""
+        src, dst, _, _, size, _, compare = job
+        if compare and hash_file(src, ('sha256',)) == hash_file(dst, ('sha256',)):
+            shutil.copystat(src, dst)
+            progress.add(size)
+            return 'same'
+        return copy_file(src, dst, progress)
+
+    copied = copied_bytes = 0
+    errors = []
+    try:
+        for job, result, error in run_jobs(sync_job, jobs(), workers, progress):
+            src, _, relative_dir, name, size, mtime_ns, _ = job
+            if error is not None:
+                errors.append((src, error))
+                failed.add(relative_dir)
+                continue
+            new_dirs[relative_dir]['files'][name] = [size, mtime_ns]
+            pending[relative_dir] -= 1
+            if result == 'same':
+                up_to_date += 1
             else:
-                skipped_files +=1
-                print(f"Skipped {skipped_files}/{total_files} files...", end='\r')
+                copied += 1
+                copied_bytes += result
+    finally:
+        # Folders with failed or unfinished copies are listed again next time
+        complete = {relative_dir: record for relative_dir, record in new_dirs.items()
+                    if relative_dir not in failed and not pending.get(relative_dir)}
+        save_manifest(manifest_path, source_dir, target_dir, complete)
+
+    for source_path, error in errors:
+        print(f"Failed to copy '{source_path}': {error}")
+    print(f"Sync completed. {copied} files copied ({copied_bytes / (1024 * 1024):.1f} MiB), "
+          f"{up_to_date} up to date, {len(errors)} failed.")
+
+
+def flag_value(flags, name, default=None):
+    return next((flag.split('=', 1)[1] for flag in flags if flag.startswith(name + '=')), default)
 
-    print(f"\nCopying completed. {copied_files} files copied.")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python copy_directory.py <source_directory> <target_directory>")
+    flags = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) != 2:
+        print("Usage: python copy_dir_skip_exist_files.py <source_directory> <target_directory> [--workers=N]\n"
+              "       [--sync] [--checksum] [--quick] [--full] [--manifest=PATH] [--modify-window=SECONDS]")
         sys.exit(1)
-    
-    source_directory = sys.argv[1]
-    target_directory = sys.argv[2]
-    
-    copy_directory(source_directory, target_directory)
\ No newline at end of file
+
+    source_directory = args[0]
+    target_directory = args[1]
+    workers = int(flag_value(flags, '--workers', 0)) or None
+
+    if {'--sync', '--checksum', '--quick', '--full'} & set(flags):
+        sync_directory(source_directory, target_directory, workers,
+                       checksum='--checksum' in flags,
+                       quick='--quick' in flags,
+                       full='--full' in flags,
+                       manifest_path=flag_value(flags, '--manifest'),
+                       modify_window=float(flag_value(flags, '--modify-window', MODIFY_WINDOW)))
+    else:
+        copy_directory(source_directory, target_directory, workers)
@@ -2,26 +2,28 @@ import os
 import sys
 from PIL import Image
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "files"))
+from fastwalk import walk_files  # noqa: E402
+
 def convert_images(source_format, dest_format, folder_path):
     num_files = 0
     orig_size = 0
     new_size = 0
 
-    for dirpath, _, filenames in os.walk(folder_path):
-        for file_name in filenames:
-            if file_name.lower().endswith(f'.{source_format}'):
-                num_files += 1
-                file_path = os.path.join(dirpath, file_name)
-                with Image.open(file_path) as img:
-                    file_root, _ = os.path.splitext(file_name)
-                    new_file_path = os.path.join(dirpath, f'{file_root}.{dest_format}')
-                    try:
-                        img.save(new_file_path)
-                        orig_size += os.path.getsize(file_path)
-                        new_size += os.path.getsize(new_file_path)
-                        os.remove(file_path)
-                    except:
-                        print(f"failed to save {new_file_path}")
+    # Files of other formats are filtered out while the directories are listed
+    for entry in walk_files(folder_path, extensions=[source_format], workers=None):
+        num_files += 1
+        file_path = entry.path
+        with Image.open(file_path) as img:
+            file_root, _ = os.path.splitext(file_path)
+            new_file_path = f'{file_root}.{dest_format}'
+            try:
+                img.save(new_file_path)
+                orig_size += entry.stat().st_size
+                new_size += os.path.getsize(new_file_path)
+                os.remove(file_path)
+            except:
+                print(f"failed to save {new_file_path}")
 
     print(f"Converted {num_files} {source_format} files to {dest_format}.")
     print(f"Total size before conversion: {orig_size / 1024:.2f} KB")
@@ -1,9 +1,11 @@
 import os
 import sys
 import random
-import uuid
 
-def rename_images_hex(folder_path, shuffle=False):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "files"))
+from rename_planner import execute_plan, plan_renames, rename_flags  # noqa: E402
+
+def rename_images_hex(folder_path, shuffle=False, dry_run=False, undo_log=None):
     if not os.path.isdir(folder_path):
         print(f"Error: '{folder_path}' is not a valid directory.")
         return
@@ -15,38 +17,31 @@ def rename_images_hex(folder_path, shuffle=False):
     else:
         images.sort()  # Sort to maintain order before renaming
     
-    temp_names = {}
-    for filename in images:
-        temp_name = str(uuid.uuid4()) + os.path.splitext(filename)[1].lower()
-        temp_path = os.path.join(folder_path, temp_name)
-        old_path = os.path.join(folder_path, filename)
-        
-        try:
-            os.rename(old_path, temp_path)
-            temp_names[temp_name] = filename
-        except Exception as e:
-            print(f"Failed to temporarily rename {filename}: {e}")
+    # Target names often overlap current ones (rerunning on an already numbered folder); the planner
+    # renames each file once and only uses a temporary name to break a cycle
+    renames = {}
+    for i, filename in enumerate(images):
+        hex_name = format(i + 1, 'x')  # Convert index to hex (starting from 1)
+        ext = os.path.splitext(filename)[1].lower()
+        renames[os.path.join(folder_path, filename)] = os.path.join(folder_path, f"{hex_name}{ext}")
     
-    images = list(temp_names.keys())  # Get the new temporary names
+    plan = plan_renames(renames)
+    try:
+        execute_plan(plan, dry_run, undo_log)
+    except OSError as e:
+        print(f"Failed to rename: {e}")
+        return
     
-    for i, temp_name in enumerate(images):
-        hex_name = format(i + 1, 'x')  # Convert index to hex (starting from 1)
-        ext = os.path.splitext(temp_name)[1].lower()
-        new_filename = f"{hex_name}{ext}"
-        
-        temp_path = os.path.join(folder_path, temp_name)
-        new_path = os.path.join(folder_path, new_filename)
-        
-        try:
-            os.rename(temp_path, new_path)
-            print(f"Renamed: {temp_names[temp_name]} -> {new_filename}")
-        except Exception as e:
-            print(f"Failed to rename {temp_names[temp_name]}: {e}")
+    for old_path, new_path in plan.renames.items():
+        print(f"{'Would rename' if dry_run else 'Renamed'}: {os.path.basename(old_path)} -> {os.path.basename(new_path)}")
+    for old_path, new_path, reason in plan.conflicts:
+        print(f"Failed to rename {os.path.basename(old_path)}: {reason}")
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2 or len(sys.argv) > 3:
-        print("Usage: python rename_images_hex.py <folder_path> [shuffle]")
+    args, dry_run, undo_log = rename_flags(sys.argv[1:])
+    if len(args) < 1 or len(args) > 2:
+        print("Usage: python rename_images_hex.py <folder_path> [shuffle] [--dry-run] [--undo-log=PATH]")
     else:
-        folder = sys.argv[1]
-        shuffle = sys.argv[2].lower() == 'shuffle' if len(sys.argv) == 3 else False
-        rename_images_hex(folder, shuffle)
+        folder = args[0]
+        shuffle = args[1].lower() == 'shuffle' if len(args) == 2 else False
+        rename_images_hex(folder, shuffle, dry_run, undo_log)
@@ -26,20 +26,26 @@ from pathlib import Path
 import shutil
 import sys
 import signal
-import mimetypes
 from PIL import Image
 import lmstudio as lms
 from pydantic import BaseModel
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "files"))
+from fastwalk import mime_extensions, walk_files  # noqa: E402
 
 
 class ImageDescription(BaseModel):
     description: str
 
 
+# Extensions mimetypes maps to image/*, looked up once instead of per file
+IMAGE_EXTENSIONS = mime_extensions("image/")
+
+
 def is_image_file(file_path):
     """Check if a file is an image based on its MIME type."""
-    mime, _ = mimetypes.guess_type(file_path)
-    return mime is not None and mime.startswith("image")
+    return os.path.splitext(str(file_path))[1].lower() in IMAGE_EXTENSIONS
 
 
 def convert_to_jpg(image_path, output_path, height=None):
@@ -174,10 +180,10 @@ def main():
     
     if args.recursive:
         print(f"🔍 Searching recursively through all nested folders")
-        image_files = [f for f in input_folder.rglob("*") if f.is_file() and is_image_file(f)]
+        image_files = [Path(entry.path) for entry in walk_files(input_folder, extensions=IMAGE_EXTENSIONS, workers=None) if entry.is_file()]
     else:
         print(f"🔍 Searching only in the top-level folder")
-        image_files = [f for f in input_folder.glob("*") if f.is_file() and is_image_file(f)]
+        image_files = [Path(entry.path) for entry in walk_files(input_folder, extensions=IMAGE_EXTENSIONS, recursive=False) if entry.is_file()]
     
     total_images = len(image_files)
     
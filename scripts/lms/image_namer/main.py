@@ -21,10 +21,13 @@ import argparse
 from pathlib import Path
 import lmstudio as lms
 from pydantic import BaseModel
-import mimetypes
 from PIL import Image, PngImagePlugin, ImageSequence
 import signal
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "files"))
+from fastwalk import mime_extensions, walk_files  # noqa: E402
 
 
 class ImageDescription(BaseModel):
@@ -33,9 +36,13 @@ class ImageDescription(BaseModel):
     suggested_name_descriptiveness: float
 
 
+# Extensions mimetypes maps to image/*, looked up once instead of per file
+IMAGE_EXTENSIONS = mime_extensions("image/")
+
+
 def is_image_file(file_path):
-    mime, _ = mimetypes.guess_type(file_path)
-    return mime is not None and mime.startswith("image")
+    """Check if a file is an image based on its MIME type."""
+    return os.path.splitext(str(file_path))[1].lower() in IMAGE_EXTENSIONS
 
 
 def get_processed_name(image_path: Path):
@@ -149,13 +156,13 @@ def main():
             
         print(f"📂 Scanning folder: {folder.resolve()}")
         
-        # Use glob or rglob based on the recursive flag
+        # List images with the shared walker, recursively or not
         if args.recursive:
             print(f"🔍 Searching recursively through all nested folders")
-            image_files = [f for f in folder.rglob("*") if f.is_file() and is_image_file(f)]
+            image_files = [Path(entry.path) for entry in walk_files(folder, extensions=IMAGE_EXTENSIONS, workers=None) if entry.is_file()]
         else:
             print(f"🔍 Searching only in the top-level folder")
-            image_files = [f for f in folder.glob("*") if f.is_file() and is_image_file(f)]
+            image_files = [Path(entry.path) for entry in walk_files(folder, extensions=IMAGE_EXTENSIONS, recursive=False) if entry.is_file()]
     else:  # args.file
         file_path = Path(args.file)
         if not file_path.exists() or not file_path.is_file():
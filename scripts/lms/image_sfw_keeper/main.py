@@ -15,19 +15,25 @@ import argparse
 from pathlib import Path
 import lmstudio as lms
 from pydantic import BaseModel
-import mimetypes
 import os
 import signal
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "files"))
+from fastwalk import mime_extensions, walk_files  # noqa: E402
+
 
 class NSFWCheck(BaseModel):
     nsfw_score: float
 
 
+# Extensions mimetypes maps to image/*, looked up once instead of per file
+IMAGE_EXTENSIONS = mime_extensions("image/")
+
+
 def is_image_file(file_path):
-    mime, _ = mimetypes.guess_type(file_path)
-    return mime is not None and mime.startswith("image")
+    """Check if a file is an image based on its MIME type."""
+    return os.path.splitext(str(file_path))[1].lower() in IMAGE_EXTENSIONS
 
 
 def signal_handler(sig, frame):
@@ -65,13 +71,13 @@ def main():
     print(f"📂 Scanning folder: {folder.resolve()}")
     print(f"🎚️ NSFW threshold set to: {args.threshold} ({get_threshold_description(args.threshold)})")
 
-    # Use glob or rglob based on the recursive flag
+    # List images with the shared walker, recursively or not
     if args.recursive:
         print(f"🔍 Searching recursively through all nested folders")
-        image_files = [f for f in folder.rglob("*") if f.is_file() and is_image_file(f)]
+        image_files = [Path(entry.path) for entry in walk_files(folder, extensions=IMAGE_EXTENSIONS, workers=None) if entry.is_file()]
     else:
         print(f"🔍 Searching only in the top-level folder")
-        image_files = [f for f in folder.glob("*") if f.is_file() and is_image_file(f)]
+        image_files = [Path(entry.path) for entry in walk_files(folder, extensions=IMAGE_EXTENSIONS, recursive=False) if entry.is_file()]
     
     total_images = len(image_files)
 
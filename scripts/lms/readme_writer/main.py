@@ -8,10 +8,15 @@ a detailed README for each one. It mirrors the input folder structure in the out
 """
 
 import argparse
+import os
+import sys
 from pathlib import Path
 import lmstudio as lms
 from pydantic import BaseModel
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "files"))
+from fastwalk import walk_files  # noqa: E402
+
 SCRIPT_EXTENSIONS = {".ts", ".js", ".py", ".bat", ".sh"}
 
 class ScriptDescription(BaseModel):
@@ -45,7 +50,8 @@ def main():
     print(f"📂 Output folder: {output_folder.resolve()}")
     print("🔍 Scanning for script files...\n")
 
-    script_files = [f for f in input_folder.rglob("*") if is_script_file(f)]
+    script_files = [Path(entry.path) for entry in walk_files(input_folder, extensions=SCRIPT_EXTENSIONS, workers=None)
+                    if entry.is_file()]
     total_scripts = len(script_files)
 
     if total_scripts == 0:
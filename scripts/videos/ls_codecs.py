@@ -39,8 +39,12 @@ Examples:
 
 import os
 import subprocess
+import sys
 import argparse
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "files"))
+from fastwalk import walk_files  # noqa: E402
+
 # ANSI escape codes for color printing
 RED = '\033[91m'
 GREEN = '\033[92m'
@@ -66,6 +70,8 @@ codec_color_table = {
     # Add more codecs and corresponding colors as needed
 }
 
+VIDEO_EXTENSIONS = ['.mp4', '.mkv', '.avi', '.mov', '.flv', '.wmv', '.mpeg']
+
 def print_separator():
     print("-------------------------------------------")
 
@@ -91,30 +97,23 @@ def list_video_files(folder_path, recursive, filter_codec=None):
     print(f"Listing files in `{colorize(folder_path, GREEN)}`. recursively: {colorize(str(recursive), GREEN)}. filter codec: {colorize(str(filter_codec), GREEN)}")
     print_separator()
     count = 0
-    for root, dirs, files in os.walk(folder_path):
-        if not recursive:
-            dirs.clear()
-        
-        for file in files:
-            filepath = os.path.join(root, file)
-            _, ext = os.path.splitext(filepath)
-            ext = ext.lower()
-            
-            # Check if the file is a video file
-            if ext in ['.mp4', '.mkv', '.avi', '.mov', '.flv', '.wmv', '.mpeg']:
-                codec = get_video_info(filepath)
-
-                if filter_codec:
-                    if codec == filter_codec:
-                        print(f"{file} - {colorize(codec_color_table.get(codec, RED), codec)}")
-                        count += 1
-                else:
-                    if codec:
-                        print(f"{file} - {colorize(codec_color_table.get(codec, RED), codec)}")
-                        count += 1
-                    else:
-                        print(f"{file} - Unknown codec")
-                        count += 1
+    # Only video files are picked up while listing directories
+    for entry in walk_files(folder_path, extensions=VIDEO_EXTENSIONS, recursive=recursive, workers=None):
+        file = entry.name
+        filepath = entry.path
+        codec = get_video_info(filepath)
+
+        if filter_codec:
+            if codec == filter_codec:
+                print(f"{file} - {colorize(codec_color_table.get(codec, RED), codec)}")
+                count += 1
+        else:
+            if codec:
+                print(f"{file} - {colorize(codec_color_table.get(codec, RED), codec)}")
+                count += 1
+            else:
+                print(f"{file} - Unknown codec")
+                count += 1
 
     print_separator()
     print(f"Total files printed: {colorize(GREEN, str(count))}")
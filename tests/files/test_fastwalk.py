@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "scripts", "files"))
+from fastwalk import has_extension, normalize_extensions, walk_files  # noqa: E402
+
+
+class ExtensionFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.root = self.temp.name
+        for name in ('a.tar.gz', 'b.gz', 'c.JPG', '.jpg', 'd.txt'):
+            open(os.path.join(self.root, name), 'w').close()
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def names(self, extensions):
+        return sorted(entry.name for entry in walk_files(self.root, extensions=extensions))
+
+    def test_multi_part_extension(self):
+        self.assertEqual(self.names(['tar.gz']), ['a.tar.gz'])
+        self.assertEqual(self.names(['.TAR.GZ', 'txt']), ['a.tar.gz', 'd.txt'])
+
+    def test_last_suffix_still_matches(self):
+        self.assertEqual(self.names(['gz']), ['a.tar.gz', 'b.gz'])
+        self.assertEqual(self.names(['jpg']), ['c.JPG'])
+
+    def test_hidden_name_is_not_an_extension(self):
+        self.assertFalse(has_extension('.jpg', normalize_extensions(['jpg'])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "scripts", "files"))
+from remove_by_extension import matching_files, parse_extensions  # noqa: E402
+
+
+class MatchingFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.root = self.temp.name
+        for name in ('a.tar.gz', 'b.gz', 'c.txt'):
+            open(os.path.join(self.root, name), 'w').close()
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def names(self, extensions, patterns=()):
+        return sorted(os.path.basename(path)
+                      for path, _ in matching_files(self.root, parse_extensions(extensions), list(patterns), False))
+
+    def test_multi_part_extension(self):
+        self.assertEqual(self.names(['tar.gz']), ['a.tar.gz'])
+        self.assertEqual(self.names(['tar.gz'], ['*.txt']), ['a.tar.gz', 'c.txt'])
+
+    def test_empty_extension_list_matches_nothing(self):
+        self.assertEqual(parse_extensions([' , ', '.']), set())
+        with self.assertRaises(ValueError):
+            self.names([' , '])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "scripts", "files"))
+from symlinker import compile_matcher, matching_paths  # noqa: E402
+
+
+class MatchingPathsTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.temp.name, 'src')
+        elsewhere = os.path.join(self.temp.name, 'elsewhere')
+        for folder in (os.path.join(self.source, 'deep'), elsewhere):
+            os.makedirs(folder)
+        for path in (os.path.join(self.source, 'a.ckpt'), os.path.join(self.source, 'deep', 'c.ckpt'),
+                     os.path.join(elsewhere, 'd.ckpt')):
+            open(path, 'w').close()
+        os.symlink(elsewhere, os.path.join(self.source, 'linked'))
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def found(self, patterns, include_nested):
+        matcher, depth = compile_matcher(patterns, include_nested)
+        paths = matching_paths(self.source, [{'matcher': matcher, 'depth': depth}])[0]
+        return sorted(os.path.relpath(path, self.source).replace(os.sep, '/') for path in paths)
+
+    def test_symlinked_subfolder_is_searched(self):
+        self.assertEqual(self.found(['*.ckpt'], True), ['a.ckpt', 'deep/c.ckpt', 'linked/d.ckpt'])
+        self.assertEqual(self.found(['linked/*.ckpt'], False), ['linked/d.ckpt'])
+
+    def test_symlink_loop_ends(self):
+        os.symlink(self.source, os.path.join(self.source, 'deep', 'back'))
+        self.assertEqual(self.found(['*.ckpt'], True), ['a.ckpt', 'deep/c.ckpt', 'linked/d.ckpt'])
+
+
+if __name__ == '__main__':
+    unittest.main()